@@ -1,23 +1,69 @@
+import asyncio
+import functools
 import os
 
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 
 from app import constants
 from app.models.models import LLMRequest
 from app.utils import Utils
 from src.cache.cache_factory import CacheFactory
-from src.docs.docs_summarizer import DocsSummarizer
-from src.query_helpers.happy_response_generator import HappyResponseGenerator
-from src.query_helpers.question_validator import QuestionValidator
-from src.query_helpers.yaml_generator import YamlGenerator
+from utils.log_policy import HISTORY, PROMPT, RESPONSE, log_payload, log_request
 from utils.logger import Logger
-from utils.model_context import get_watsonx_predictor
+from utils.prompt_budget import PromptTooLongError
+from utils.stage_executor import StageExecutor
+
+# The query helpers pull in llama_index, langchain and genai, which take
+# seconds to import: the handlers import them, and `import_helpers` imports
+# them at startup, so that the app starts serving health checks early.
 
 router = APIRouter(prefix="/ols", tags=["ols"])
 
 
+def import_helpers():
+    """
+    Import the query helpers used by the handlers, ahead of the first request.
+    """
+    import src.docs.docs_summarizer  # noqa: F401
+    import src.query_helpers.happy_response_generator  # noqa: F401
+    import src.query_helpers.question_validator  # noqa: F401
+    import src.query_helpers.yaml_generator  # noqa: F401
+    import utils.model_context  # noqa: F401
+
+
+def reject_prompts_too_long(handler):
+    """
+    Answer the requests whose prompts do not fit the context window of the
+    model with a 413 error, instead of an internal server error.
+
+    Args:
+        handler: The async request handler.
+
+    Returns:
+        The wrapped handler.
+    """
+
+    @functools.wraps(handler)
+    async def wrapper(*args, **kwargs):
+        try:
+            return await handler(*args, **kwargs)
+        except PromptTooLongError as e:
+            Logger("ols_endpoint").logger.info(f"Rejecting request: {e}")
+            raise HTTPException(
+                status_code=413,
+                detail={
+                    "response": "The question is too long for the model. "
+                    "Please shorten it and try again."
+                },
+            )
+
+    return wrapper
+
+
 @router.post("")
-def ols_request(llm_request: LLMRequest):
+@reject_prompts_too_long
+async def ols_request(llm_request: LLMRequest):
     """
     Handle requests for the OLS endpoint.
 
@@ -27,6 +73,11 @@ def ols_request(llm_request: LLMRequest):
     Returns:
         dict: Response containing the processed information.
     """
+    from src.docs.docs_summarizer import DocsSummarizer
+    from src.query_helpers.happy_response_generator import HappyResponseGenerator
+    from src.query_helpers.question_validator import QuestionValidator
+    from src.query_helpers.yaml_generator import YamlGenerator
+
     conversation_cache = CacheFactory.conversation_cache()
     logger = Logger("ols_endpoint").logger
 
@@ -39,88 +90,281 @@ def ols_request(llm_request: LLMRequest):
         conversation = Utils.get_suid()
         logger.info(f"{conversation} New conversation")
     else:
-        previous_input = conversation_cache.get(conversation)
-        logger.info(f"{conversation} Previous conversation input: {previous_input}")
+        previous_input = await conversation_cache.aget_history(conversation)
+        log_payload(
+            logger, HISTORY, conversation, "Previous conversation input", previous_input
+        )
 
     llm_response = LLMRequest(query=llm_request.query, conversation_id=conversation)
 
-    # Log incoming request
-    logger.info(f"{conversation} Incoming request: {llm_request.query}")
+    # Log incoming request, the full query only for the sampled conversations
+    log_request(logger, conversation, "Incoming request", llm_request.query)
+    log_payload(logger, PROMPT, conversation, "Request query", llm_request.query)
 
-    # Validate the query
-    question_validator = QuestionValidator()
-    validation_result = question_validator.validate_question(
-        conversation, llm_request.query
+    # Validate the query, optionally retrieving the documentation while
+    # the validation is still in flight
+    speculative_retrieval = (
+        os.getenv("OLS_SPECULATIVE_RETRIEVAL", "False").lower() == "true"
     )
+    docs_summarizer = DocsSummarizer()
 
-    if validation_result[0] == constants.INVALID:
-        logger.info(f"{conversation} Question is not about k8s/ocp, rejecting")
-        raise HTTPException(
-            status_code=422,
-            detail={
-                "response": "Sorry, I can only answer questions about "
-                "OpenShift and Kubernetes. This does not look "
-                "like something I know how to handle."
-            },
+    async with StageExecutor(conversation, logger=logger) as stages:
+        question_validator = QuestionValidator()
+        stages.submit(
+            "validation",
+            question_validator.avalidate_question(conversation, llm_request.query),
         )
+        if speculative_retrieval:
+            stages.submit(
+                "retrieval", docs_summarizer.aretrieve(conversation, llm_request.query)
+            )
 
-    if validation_result[0] == constants.VALID:
-        logger.info(f"{conversation} Question is about k8s/ocp")
+        validation_result = await stages.result("validation")
 
-        # Generate a user-friendly response wrapper
-        response_wrapper = HappyResponseGenerator()
-        wrapper = response_wrapper.generate(conversation, llm_request.query)
+        if validation_result[0] == constants.INVALID:
+            stages.cancel("retrieval")
+            logger.info(f"{conversation} Question is not about k8s/ocp, rejecting")
+            raise HTTPException(
+                status_code=422,
+                detail={
+                    "response": "Sorry, I can only answer questions about "
+                    "OpenShift and Kubernetes. This does not look "
+                    "like something I know how to handle."
+                },
+            )
 
-        if validation_result[1] == constants.NOYAML:
-            logger.info(
-                f"{conversation} Question is not about yaml, sending for generic info"
+        if validation_result[0] == constants.VALID:
+            logger.info(f"{conversation} Question is about k8s/ocp")
+
+            # Generate a user-friendly response wrapper alongside the answer
+            response_wrapper = HappyResponseGenerator()
+            stages.submit(
+                "wrapper", response_wrapper.agenerate(conversation, llm_request.query)
             )
 
-            # Summarize documentation
-            docs_summarizer = DocsSummarizer()
-            summary, _ = docs_summarizer.summarize(conversation, llm_request.query)
+            if validation_result[1] == constants.NOYAML:
+                logger.info(
+                    f"{conversation} Question is not about yaml, sending for generic info"
+                )
 
-            llm_response.response = wrapper + "\n" + summary
-            return llm_response
+                # Summarize documentation
+                nodes = (
+                    await stages.result("retrieval")
+                    if stages.submitted("retrieval")
+                    else None
+                )
+                summary, _ = await docs_summarizer.asummarize(
+                    conversation, llm_request.query, nodes=nodes
+                )
 
-        elif validation_result[1] == constants.YAML:
-            logger.info(
-                f"{conversation} Question is about yaml, sending to the YAML generator"
-            )
-            yaml_generator = YamlGenerator()
-            generated_yaml = yaml_generator.generate_yaml(
-                conversation, llm_request.query, previous_input
-            )
+                llm_response.response = await stages.result("wrapper") + "\n" + summary
+                logger.info(f"{conversation} Stage timings: {stages.timings()}")
+                return llm_response
 
-            if generated_yaml == constants.SOME_FAILURE:
-                raise HTTPException(
-                    status_code=500,
-                    detail={"response": "Internal server error. Please try again."},
+            elif validation_result[1] == constants.YAML:
+                stages.cancel("retrieval")
+                logger.info(
+                    f"{conversation} Question is about yaml, sending to the YAML generator"
+                )
+                yaml_generator = YamlGenerator()
+                generated_yaml = await yaml_generator.agenerate_yaml(
+                    conversation, llm_request.query, previous_input
                 )
 
-            # Further processing of YAML response (filtering, cleaning, linting, RAG, etc.)
+                if generated_yaml == constants.SOME_FAILURE:
+                    raise HTTPException(
+                        status_code=500,
+                        detail={"response": "Internal server error. Please try again."},
+                    )
 
-            llm_response.response = wrapper + "\n" + generated_yaml
-            conversation_cache.insert_or_append(
-                conversation, llm_request.query + "\n\n" + llm_response.response
-            )
-            return llm_response
+                # Further processing of YAML response (filtering, cleaning, linting, RAG, etc.)
+
+                llm_response.response = (
+                    await stages.result("wrapper") + "\n" + generated_yaml
+                )
+                logger.info(f"{conversation} Stage timings: {stages.timings()}")
+                await conversation_cache.ainsert_or_append(
+                    conversation, llm_request.query + "\n\n" + llm_response.response
+                )
+                return llm_response
 
+            else:
+                raise HTTPException(
+                    status_code=500,
+                    detail={"response": "Internal server error. Please try again."},
+                )
         else:
             raise HTTPException(
                 status_code=500,
                 detail={"response": "Internal server error. Please try again."},
             )
+
+
+@router.post("/stream")
+@reject_prompts_too_long
+async def ols_stream_request(llm_request: LLMRequest):
+    """
+    Handle requests for the OLS endpoint, streaming the response as server-sent events.
+
+    The events are sent in the following order: `conversation_id`, `wrapper`
+    with the happy response wrapper, the `summary` or `yaml` chunks as the LLM
+    generates them, `referenced_documents` (summaries only) and finally `done`.
+    A failure after the stream has started is reported as an `error` event.
+
+    Args:
+        llm_request (LLMRequest): The request containing a query and conversation ID.
+
+    Returns:
+        StreamingResponse: The stream of server-sent events.
+    """
+    from src.query_helpers.question_validator import QuestionValidator
+
+    conversation_cache = CacheFactory.conversation_cache()
+    logger = Logger("ols_stream_endpoint").logger
+
+    # Initialize variables
+    previous_input = None
+    conversation = llm_request.conversation_id
+
+    # Generate a new conversation ID if not provided
+    if conversation is None:
+        conversation = Utils.get_suid()
+        logger.info(f"{conversation} New conversation")
     else:
+        previous_input = await conversation_cache.aget_history(conversation)
+        log_payload(
+            logger, HISTORY, conversation, "Previous conversation input", previous_input
+        )
+
+    # Log incoming request, the full query only for the sampled conversations
+    log_request(logger, conversation, "Incoming streaming request", llm_request.query)
+    log_payload(logger, PROMPT, conversation, "Request query", llm_request.query)
+
+    # Validate the query before the response status is sent
+    question_validator = QuestionValidator()
+    validation_result = await question_validator.avalidate_question(
+        conversation, llm_request.query
+    )
+
+    if validation_result[0] == constants.INVALID:
+        logger.info(f"{conversation} Question is not about k8s/ocp, rejecting")
+        raise HTTPException(
+            status_code=422,
+            detail={
+                "response": "Sorry, I can only answer questions about "
+                "OpenShift and Kubernetes. This does not look "
+                "like something I know how to handle."
+            },
+        )
+
+    if validation_result[0] != constants.VALID or validation_result[1] not in (
+        constants.NOYAML,
+        constants.YAML,
+    ):
         raise HTTPException(
             status_code=500,
             detail={"response": "Internal server error. Please try again."},
         )
 
+    logger.info(f"{conversation} Question is about k8s/ocp")
+    return StreamingResponse(
+        _stream_ols_response(
+            conversation,
+            llm_request.query,
+            validation_result[1],
+            previous_input,
+            conversation_cache,
+            logger,
+        ),
+        media_type="text/event-stream",
+    )
+
+
+async def _stream_ols_response(
+    conversation, query, yaml_result, previous_input, conversation_cache, logger
+):
+    """
+    Produce the server-sent events of a validated /ols/stream request.
+
+    The answer starts generating alongside the happy response wrapper; its
+    chunks are queued until the wrapper has been sent.
+
+    Args:
+        conversation (str): The conversation ID.
+        query (str): The validated query.
+        yaml_result (str): Either `constants.YAML` or `constants.NOYAML`.
+        previous_input (str): The conversation history, if any.
+        conversation_cache (Cache): The conversation cache.
+        logger: The endpoint logger.
+
+    Yields:
+        str: The formatted server-sent events.
+    """
+    from src.docs.docs_summarizer import DocsSummarizer
+    from src.query_helpers.happy_response_generator import HappyResponseGenerator
+    from src.query_helpers.yaml_generator import YamlGenerator
+
+    chunks = asyncio.Queue()
+
+    async def generate_answer():
+        try:
+            if yaml_result == constants.NOYAML:
+                logger.info(
+                    f"{conversation} Question is not about yaml, sending for generic info"
+                )
+                docs_summarizer = DocsSummarizer()
+                summary_chunks, referenced_documents = (
+                    await docs_summarizer.astream_summary(conversation, query)
+                )
+                async for chunk in summary_chunks:
+                    await chunks.put(("summary", chunk))
+                await chunks.put(("referenced_documents", referenced_documents))
+            else:
+                logger.info(
+                    f"{conversation} Question is about yaml, sending to the YAML generator"
+                )
+                yaml_generator = YamlGenerator()
+                generated_yaml = []
+                async for chunk in yaml_generator.astream_yaml(
+                    conversation, query, previous_input
+                ):
+                    generated_yaml.append(chunk)
+                    await chunks.put(("yaml", chunk))
+                return "".join(generated_yaml)
+        finally:
+            # always unblock the consumer, even when the generation failed
+            await chunks.put(None)
+
+    async with StageExecutor(conversation, logger=logger) as stages:
+        response_wrapper = HappyResponseGenerator()
+        stages.submit("wrapper", response_wrapper.agenerate(conversation, query))
+        stages.submit("answer", generate_answer())
+
+        yield Utils.format_sse("conversation_id", conversation)
+        try:
+            wrapper = await stages.result("wrapper")
+            yield Utils.format_sse("wrapper", wrapper)
+
+            while (chunk := await chunks.get()) is not None:
+                yield Utils.format_sse(*chunk)
+
+            generated_yaml = await stages.result("answer")
+        except Exception as e:
+            logger.error(f"{conversation} Streaming response failed: {e}")
+            yield Utils.format_sse("error", "Internal server error. Please try again.")
+            return
+
+        logger.info(f"{conversation} Stage timings: {stages.timings()}")
+        if generated_yaml is not None:
+            await conversation_cache.ainsert_or_append(
+                conversation, query + "\n\n" + wrapper + "\n" + generated_yaml
+            )
+        yield Utils.format_sse("done", "")
+
 
 @router.post("/raw_prompt")
 @router.post("/base_llm_completion")
-def base_llm_completion(llm_request: LLMRequest):
+async def base_llm_completion(llm_request: LLMRequest):
     """
     Handle requests for the base LLM completion endpoint.
 
@@ -130,6 +374,8 @@ def base_llm_completion(llm_request: LLMRequest):
     Returns:
         dict: Response containing the processed information.
     """
+    from utils.model_context import get_watsonx_predictor
+
     base_completion_model = os.getenv(
         "BASE_COMPLETION_MODEL", "ibm/granite-20b-instruct-v1"
     )
@@ -143,15 +389,16 @@ def base_llm_completion(llm_request: LLMRequest):
     llm_response.conversation_id = conversation
 
     logger.info(f"{conversation} New conversation")
-    logger.info(f"{conversation} Incoming request: {llm_request.query}")
+    log_request(logger, conversation, "Incoming request", llm_request.query)
+    log_payload(logger, PROMPT, conversation, "Request query", llm_request.query)
 
     bare_llm = get_watsonx_predictor(model=base_completion_model)
-    response = bare_llm(llm_request.query)
+    response = await bare_llm.apredict(llm_request.query)
 
     # TODO: Make the removal of endoftext some kind of function
     clean_response = response.split("<|endoftext|>")[0]
     llm_response.response = clean_response
 
-    logger.info(f"{conversation} Model returned: {llm_response.response}")
+    log_payload(logger, RESPONSE, conversation, "Model returned", llm_response.response)
 
     return llm_response
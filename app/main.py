@@ -1,8 +1,14 @@
+import asyncio
+import os
+
 from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 
 from app.endpoints import feedback, ols
-from src.ui.gradio_ui import gradioUI
+from src import constants
 from utils.config import Config
+from utils.stage_executor import get_executor
+from utils.warmup import SKIPPED, Warmup
 
 app = FastAPI()
 
@@ -10,6 +16,9 @@ config = Config()
 logger = config.logger
 
 if config.enable_ui:
+    # gradio takes seconds to import, only import it when the UI is enabled
+    from src.ui.gradio_ui import gradioUI
+
     app = gradioUI(logger=logger).mount_ui(app)
 else:
     logger.info("Embedded Gradio UI is disabled. To enable set OLS_ENABLE_UI=True")
@@ -29,14 +38,153 @@ def include_routers(app: FastAPI):
 include_routers(app)
 
 
+@app.on_event("startup")
+async def set_default_executor():
+    """
+    Run the blocking calls awaited through the event loop default executor
+    (e.g. LangChain async fallbacks) on the shared, sized thread pool.
+    """
+    asyncio.get_running_loop().set_default_executor(get_executor())
+
+
+def warm_embed_model():
+    """
+    Load the local embedding model, when no TEI server is configured.
+    """
+    if os.getenv("TEI_SERVER_URL"):
+        return SKIPPED
+    from utils.model_context import get_local_embed_model, local_embed_model_precision
+
+    get_local_embed_model(precision=local_embed_model_precision())
+
+
+def warm_indexes():
+    """
+    Load the shared vector and BM25 indexes.
+    """
+    from src.docs.index_registry import IndexRegistry
+
+    IndexRegistry().load_all()
+
+
+def warm_retrieval():
+    """
+    Load the reranker, when one is configured.
+    """
+    from src.retrieval.postprocessors import retrieval_postprocessors
+
+    retrieval_postprocessors()
+
+
+def models_in_use():
+    """
+    Get the models the query helpers answering the requests are set to use.
+
+    Returns:
+        set: The model ids.
+    """
+    return {
+        os.getenv("QUESTION_VALIDATOR_MODEL", constants.GRANITE_20B_CODE_INSTRUCT_V1),
+        os.getenv("YAML_MODEL", constants.GRANITE_20B_CODE_INSTRUCT_V1),
+        os.getenv("DOC_SUMMARIZER_MODEL", constants.GRANITE_13B_CHAT_V1),
+        os.getenv("HAPPY_RESPONSE_GENERATOR_MODEL", constants.GRANITE_13B_CHAT_V1),
+    }
+
+
+def warm_templates():
+    """
+    Load the tokenizers the prompts of the models in use are fitted with.
+    """
+    from utils.prompt_budget import get_tokenizer
+
+    for model in models_in_use():
+        get_tokenizer(model)
+
+
+def warm_llm_clients():
+    """
+    Create the clients of the models in use, with the default generation
+    parameters most query helpers use.
+    """
+    from utils.model_context import get_watsonx_predictor
+
+    for model in models_in_use():
+        get_watsonx_predictor(model=model)
+
+
+def warm_query():
+    """
+    Retrieve the documentation for `OLS_WARMUP_QUERY`, when set, which
+    runs the query embedding, the searches and the postprocessors once.
+    """
+    query = os.getenv("OLS_WARMUP_QUERY")
+    if not query:
+        return SKIPPED
+    from src.docs.docs_summarizer import DocsSummarizer
+
+    DocsSummarizer().retrieve("warmup", query)
+
+
+@app.on_event("startup")
+def start_warmup():
+    """
+    Warm up the components the requests need in the background; /readyz
+    reports the app as not ready until the warmup finished, and while the
+    imports, embedding model or indexes failed to load. The warmup can
+    be disabled by setting `OLS_WARMUP` to false.
+    """
+    warmup = Warmup()
+    if os.getenv("OLS_WARMUP", "True").lower() == "true":
+        # no request can be answered without these
+        warmup.add("imports", ols.import_helpers, required=True)
+        warmup.add("embed_model", warm_embed_model, required=True)
+        warmup.add("indexes", warm_indexes, required=True)
+        warmup.add("retrieval", warm_retrieval)
+        warmup.add("templates", warm_templates)
+        warmup.add("llm_clients", warm_llm_clients)
+        warmup.add("query", warm_query)
+    warmup.start()
+
+
+@app.on_event("shutdown")
+def save_query_embeddings():
+    """
+    Save the cached query embeddings when OLS_QUERY_EMBEDDING_CACHE_PATH is
+    set, so they are reused after a restart.
+    """
+    from utils.embedding_cache import QueryEmbeddingCache
+
+    cache = QueryEmbeddingCache()
+    logger.info(f"Query embedding cache: {cache.stats()}")
+    try:
+        cache.save()
+    except Exception as e:
+        logger.error(f"Failed to save the query embedding cache: {e}")
+
+
 # TODO
 # Still to be decided on their functionality
 @app.get("/healthz")
-@app.get("/readyz")
 def read_root():
     return {"status": "1"}
 
 
+@app.get("/readyz")
+def read_ready():
+    """
+    Report whether the app is ready to serve requests, with the status and
+    duration of the warmup of every component.
+
+    Returns:
+        JSONResponse: The warmup status, with the 503 status code until the
+        warmup finished and while a required component failed.
+    """
+    warmup = Warmup().status()
+    if not warmup["ready"]:
+        return JSONResponse(status_code=503, content={"status": "0", "warmup": warmup})
+    return {"status": "1", "warmup": warmup}
+
+
 # TODO
 # Still to be decided on their functionality
 @app.get("/")
@@ -15,3 +15,18 @@ class Utils:
             str: A unique session ID.
         """
         return str(uuid.uuid4().hex)
+
+    @staticmethod
+    def format_sse(event: str, data: str) -> str:
+        """
+        Format a message as a server-sent event.
+
+        Args:
+            event (str): The event name.
+            data (str): The event payload, which may span several lines.
+
+        Returns:
+            str: The event, ready to be written to the response stream.
+        """
+        lines = "".join(f"data: {line}\n" for line in data.split("\n"))
+        return f"event: {event}\n{lines}\n"
@@ -0,0 +1,63 @@
+"""Measure the recall and latency of the IVF index against exact search.
+
+Usage: PYTHONPATH=. python scripts/benchmark_ann.py [vectors] [dimensions]
+
+The vectors are random points around a few thousand cluster centers, a rough
+stand-in for chunk embeddings. For every `nprobe` the script reports the
+recall@k of the approximate search compared to the exact one and the mean
+query latency.
+"""
+
+import sys
+import time
+
+import numpy as np
+
+from src.retrieval.ivf_index import IVFIndex
+from src.retrieval.mmap_vector_store import MmapVectorStore
+
+QUERIES = 200
+TOP_K = 4
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    dimensions = int(sys.argv[2]) if len(sys.argv) > 2 else 768
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((max(1, count // 50), dimensions))
+    vectors = centers[rng.integers(len(centers), size=count)]
+    vectors += 0.5 * rng.standard_normal((count, dimensions))
+    vectors = MmapVectorStore.normalize_rows(vectors)
+    queries = vectors[rng.choice(count, QUERIES, replace=False)]
+    queries += 0.1 * rng.standard_normal(queries.shape).astype(np.float32)
+
+    start = time.perf_counter()
+    index = IVFIndex.build(vectors)
+    print(
+        f"{count} vectors of {dimensions} dimensions, {index.nlist} lists "
+        f"built in {time.perf_counter() - start:.1f}s"
+    )
+
+    def search(query, positions=None):
+        scores = vectors @ query if positions is None else vectors[positions] @ query
+        top = MmapVectorStore.top_k(scores, TOP_K)
+        return set(top if positions is None else positions[top])
+
+    start = time.perf_counter()
+    exact = [search(query) for query in queries]
+    exact_ms = (time.perf_counter() - start) / QUERIES * 1000
+    print(f"{'nprobe':>8} {'recall@' + str(TOP_K):>10} {'query (ms)':>11}")
+    print(f"{'exact':>8} {1.0:>10.3f} {exact_ms:>11.2f}")
+
+    for nprobe in (1, 2, 4, 8, 16, 32, 64):
+        if nprobe > index.nlist:
+            break
+        start = time.perf_counter()
+        found = [search(query, index.candidates(query, nprobe)) for query in queries]
+        query_ms = (time.perf_counter() - start) / QUERIES * 1000
+        recall = np.mean([len(f & e) / TOP_K for f, e in zip(found, exact)])
+        print(f"{nprobe:>8} {recall:>10.3f} {query_ms:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Compare the latency and the retrieval agreement of the local embedding model variants.
+
+Usage: PYTHONPATH=. python scripts/benchmark_embed_model.py [docs dir] [variants]
+
+The chunks of the documentation directory (data/summary-docs by default)
+are embedded with every variant (fp32,int8 by default, onnx needs
+optimum[exporters] and onnxruntime), and the first line of every chunk is
+used as a query. The agreement is the share of the fp32 top 4 chunks a
+variant also retrieves, the cosine the similarity of the query embeddings.
+"""
+
+import sys
+import time
+
+import numpy as np
+from llama_index import SimpleDirectoryReader
+from llama_index.node_parser import SentenceSplitter
+
+from src import constants
+from utils.model_context import load_local_embed_model
+
+TOP_K = 4
+MAX_CHUNKS = 500
+MAX_QUERIES = 100
+
+
+def normalized(embeddings):
+    rows = np.asarray(embeddings, dtype=np.float32)
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+
+def top_k(queries, chunks):
+    scores = queries @ chunks.T
+    return np.argsort(-scores, axis=1)[:, :TOP_K]
+
+
+def main():
+    input_dir = sys.argv[1] if len(sys.argv) > 1 else "data/summary-docs"
+    variants = (sys.argv[2] if len(sys.argv) > 2 else "fp32,int8").split(",")
+    if variants[0] != "fp32":
+        variants.insert(0, "fp32")
+
+    documents = SimpleDirectoryReader(input_dir).load_data()
+    chunks = [
+        node.get_content()
+        for node in SentenceSplitter(chunk_size=1024).get_nodes_from_documents(
+            documents
+        )
+    ][:MAX_CHUNKS]
+    queries = [chunk.strip().split("\n")[0][:200] for chunk in chunks][:MAX_QUERIES]
+    print(f"{len(chunks)} chunks, {len(queries)} queries from {input_dir}")
+
+    print(
+        f"{'variant':>8} {'load (s)':>9} {'query p50 (ms)':>15} "
+        f"{'query p95 (ms)':>15} {'chunks/s':>9} {'top-4 agreement':>16} {'cosine':>7}"
+    )
+    reference = None
+    for variant in variants:
+        start = time.perf_counter()
+        embed_model = load_local_embed_model(constants.LOCAL_EMBED_MODEL, variant)
+        load_seconds = time.perf_counter() - start
+
+        latencies = []
+        query_embeddings = []
+        for query in queries:
+            start = time.perf_counter()
+            query_embeddings.append(embed_model.get_query_embedding(query))
+            latencies.append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        chunk_embeddings = embed_model.get_text_embedding_batch(chunks)
+        chunks_per_second = len(chunks) / (time.perf_counter() - start)
+
+        query_embeddings = normalized(query_embeddings)
+        retrieved = top_k(query_embeddings, normalized(chunk_embeddings))
+        if reference is None:
+            reference = (query_embeddings, retrieved)
+        agreement = np.mean(
+            [
+                len(set(expected) & set(actual)) / TOP_K
+                for expected, actual in zip(reference[1], retrieved)
+            ]
+        )
+        cosine = np.mean(np.sum(reference[0] * query_embeddings, axis=1))
+        print(
+            f"{variant:>8} {load_seconds:>9.1f} {np.percentile(latencies, 50):>15.1f} "
+            f"{np.percentile(latencies, 95):>15.1f} {chunks_per_second:>9.1f} "
+            f"{agreement:>16.3f} {cosine:>7.4f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Report the import time of the service modules, as `python -X importtime` does.
+
+Usage: PYTHONPATH=. python scripts/benchmark_imports.py [modules] [--top N]
+           [--json report.json] [--max-seconds S]
+
+Every module (app.main by default, comma separated) is imported in a fresh
+interpreter run with `-X importtime`, so nothing is cached between them.
+The report lists the total import time and the modules with the largest
+cumulative import time, those of the service first. `--json` saves the
+report to track it over time, and `--max-seconds` exits with an error when
+a module takes longer to import, e.g. to guard cold starts in CI.
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+# "import time:  self [us] | cumulative | imported package" lines
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+SERVICE_PACKAGES = ("app", "src", "utils")
+
+
+def import_times(module):
+    """
+    Import a module in a fresh interpreter and parse its import times.
+
+    Args:
+    - module (str): The module to import.
+
+    Returns:
+    - list: (module, self seconds, cumulative seconds, depth) of every
+      imported module, in import order.
+    """
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        # the UI is mounted at import time when enabled
+        env={"OLS_ENABLE_UI": "False", **os.environ},
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+    times = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            times.append(
+                (name, int(self_us) / 1e6, int(cumulative_us) / 1e6, len(indent) // 2)
+            )
+    return times
+
+
+def report(module, times, top):
+    """
+    Summarize the import times of a module.
+
+    Args:
+    - module (str): The imported module.
+    - times (list): The import times, see `import_times`.
+    - top (int): The number of modules to list.
+
+    Returns:
+    - dict: The total time, and the slowest service and other modules.
+    """
+    total = next(
+        (cumulative for name, _, cumulative, _ in times if name == module), 0.0
+    )
+    slowest = sorted(times, key=lambda t: -t[2])
+    service = [t for t in slowest if t[0].split(".")[0] in SERVICE_PACKAGES]
+    return {
+        "module": module,
+        "total_seconds": round(total, 3),
+        "modules": len(times),
+        "service_modules": [
+            {"module": name, "self": round(s, 3), "cumulative": round(c, 3)}
+            for name, s, c, _ in service[:top]
+        ],
+        "top_modules": [
+            {"module": name, "self": round(s, 3), "cumulative": round(c, 3)}
+            for name, s, c, _ in slowest[:top]
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("modules", nargs="?", default="app.main")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--json", help="save the report to this file")
+    parser.add_argument("--max-seconds", type=float)
+    args = parser.parse_args()
+
+    reports = []
+    for module in args.modules.split(","):
+        summary = report(module, import_times(module), args.top)
+        reports.append(summary)
+
+        print(
+            f"{module}: {summary['total_seconds']:.3f}s, "
+            f"{summary['modules']} modules imported"
+        )
+        for title, rows in (
+            ("service modules", summary["service_modules"]),
+            ("all modules", summary["top_modules"]),
+        ):
+            print(f"  slowest {title}:")
+            print(f"  {'cumulative (s)':>15} {'self (s)':>9}  module")
+            for row in rows:
+                print(
+                    f"  {row['cumulative']:>15.3f} {row['self']:>9.3f}  {row['module']}"
+                )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reports, f, indent=2)
+
+    if args.max_seconds is not None:
+        slow = [r for r in reports if r["total_seconds"] > args.max_seconds]
+        if slow:
+            names = ", ".join(f"{r['module']} ({r['total_seconds']}s)" for r in slow)
+            raise RuntimeError(f"Imports slower than {args.max_seconds}s: {names}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Benchmark InMemoryCache latency as the cache fills up.
+
+Usage: PYTHONPATH=. python scripts/benchmark_in_memory_cache.py [capacity]
+
+The per-operation latency of `get` and `insert_or_append` should stay flat
+from an empty to a full cache, and once the cache is full evictions should
+not make inserts slower.
+"""
+
+import sys
+import time
+
+from src.cache.in_memory_cache import InMemoryCache
+
+OPERATIONS = 1000
+
+
+def measure(operation, keys):
+    start = time.perf_counter()
+    for key in keys:
+        operation(key)
+    return (time.perf_counter() - start) / len(keys) * 1e6
+
+
+def main():
+    capacity = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    cache = InMemoryCache()
+    cache.max_bytes = sys.maxsize
+    cache.capacity = capacity
+
+    print(f"capacity={capacity} segments={cache.stats()['segments']}")
+    print(f"{'fill':>6} {'entries':>9} {'get (us)':>10} {'insert (us)':>12}")
+    inserted = 0
+    for step in range(1, 12):
+        # fill up by another 10%, the last steps overflow and evict
+        target = capacity * step // 10
+        while inserted < target or cache.stats()["entries"] < min(target, capacity):
+            cache.insert_or_append(f"conversation-{inserted}", "question and answer")
+            inserted += 1
+
+        hot_keys = [f"conversation-{inserted - 1 - i % 100}" for i in range(OPERATIONS)]
+        get_latency = measure(cache.get, hot_keys)
+        new_keys = [f"benchmark-{step}-{i}" for i in range(OPERATIONS)]
+        insert_latency = measure(
+            lambda key: cache.insert_or_append(key, "question and answer"), new_keys
+        )
+        entries = cache.stats()["entries"]
+        print(
+            f"{entries * 100 // capacity:>5}% {entries:>9} "
+            f"{get_latency:>10.2f} {insert_latency:>12.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Compare loading and querying the JSON and the memory-mapped vector stores.
+
+Usage: PYTHONPATH=. python scripts/benchmark_vector_store.py [vectors] [dimensions]
+
+Both stores are filled with the same random embeddings and persisted to a
+temporary directory, then loaded back and queried.
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from llama_index.schema import TextNode
+from llama_index.vector_stores import SimpleVectorStore
+from llama_index.vector_stores.types import VectorStoreQuery
+
+from src.retrieval.mmap_vector_store import MmapVectorStore
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    dimensions = int(sys.argv[2]) if len(sys.argv) > 2 else 768
+    embeddings = np.random.default_rng(0).standard_normal((count, dimensions))
+    nodes = [
+        TextNode(id_=str(i), text="", embedding=embedding.tolist())
+        for i, embedding in enumerate(embeddings)
+    ]
+    query = VectorStoreQuery(query_embedding=embeddings[0].tolist(), similarity_top_k=4)
+
+    print(f"{count} vectors of {dimensions} dimensions")
+    print(f"{'store':>16} {'disk (MB)':>10} {'load (ms)':>10} {'query (ms)':>11}")
+    with tempfile.TemporaryDirectory() as directory:
+        stores = [
+            ("simple", SimpleVectorStore, SimpleVectorStore.from_persist_path),
+            ("mmap float32", MmapVectorStore, MmapVectorStore.from_persist_dir),
+            (
+                "mmap float16",
+                lambda: MmapVectorStore(dtype="float16"),
+                MmapVectorStore.from_persist_dir,
+            ),
+        ]
+        for name, create, load in stores:
+            persist_dir = os.path.join(directory, name.replace(" ", "-"))
+            os.makedirs(persist_dir)
+            persist_path = os.path.join(persist_dir, "default__vector_store.json")
+            store = create()
+            store.add(nodes)
+            store.persist(persist_path)
+
+            disk = sum(
+                os.path.getsize(os.path.join(persist_dir, f))
+                for f in os.listdir(persist_dir)
+            )
+            source = persist_path if name == "simple" else persist_dir
+            store, load_ms = timed(lambda: load(source))
+            result, query_ms = timed(lambda: store.query(query))
+            if result.ids[0] != "0":
+                raise RuntimeError(f"{name} did not find the query vector")
+            print(
+                f"{name:>16} {disk / 2**20:>10.1f} {load_ms:>10.1f} {query_ms:>11.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
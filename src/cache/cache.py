@@ -1,8 +1,45 @@
+import os
 from abc import ABC, abstractmethod
-from typing import Union
+from typing import List, Tuple, Union
+
+from src import constants
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheaply estimate the number of tokens of a text, about four characters each.
+
+    Args:
+        text (str): The text to measure.
+
+    Returns:
+        int: The estimated number of tokens.
+    """
+    return len(text) // 4 + 1
+
+
+def history_max_tokens() -> int:
+    """Get the configured token budget for the history put into prompts.
+
+    Returns:
+        int: The maximum number of history tokens.
+    """
+    return int(
+        os.getenv(
+            "CONVERSATION_HISTORY_MAX_TOKENS",
+            constants.CONVERSATION_HISTORY_MAX_TOKENS,
+        )
+    )
 
 
 class Cache(ABC):
+    """Conversation history store.
+
+    Every call to `insert_or_append` records one turn of the conversation.
+    `get` returns the whole history joined by newlines, while `get_history`
+    returns only the most recent turns fitting a token budget and should be
+    preferred when building prompts.
+    """
+
     @abstractmethod
     def get(self, key: str) -> Union[str, None]:
         """Abstract method to retrieve a value from the cache.
@@ -27,3 +64,122 @@ class Cache(ABC):
             None
         """
         pass
+
+    def insert_or_append_many(self, items: List[Tuple[str, str]]) -> None:
+        """Store several values, as `insert_or_append` does for each of them.
+
+        Caches that can batch their updates should override this.
+
+        Args:
+            items (List[Tuple[str, str]]): The keys and the values to be stored.
+
+        Returns:
+            None
+        """
+        for key, value in items:
+            self.insert_or_append(key, value)
+
+    @abstractmethod
+    def get_turns(self, key: str, last: Union[int, None] = None) -> List[str]:
+        """Abstract method to retrieve the recorded turns of a conversation.
+
+        Args:
+            key (str): The key associated with the conversation.
+            last (int): Only return this many most recent turns, all if None.
+
+        Returns:
+            List[str]: The turns, oldest first; empty if the key is not found.
+        """
+        pass
+
+    def get_history(
+        self, key: str, max_tokens: Union[int, None] = None
+    ) -> Union[str, None]:
+        """Retrieve the most recent turns of a conversation fitting a token budget.
+
+        Args:
+            key (str): The key associated with the conversation.
+            max_tokens (int): The token budget, the configured one if None.
+
+        Returns:
+            Union[str, None]: The turns joined by newlines, or None if no turn fits.
+        """
+        return self.window(self.get_turns(key), max_tokens)
+
+    async def aget_turns(self, key: str, last: Union[int, None] = None) -> List[str]:
+        """Asynchronous version of `get_turns`.
+
+        Args:
+            key (str): The key associated with the conversation.
+            last (int): Only return this many most recent turns, all if None.
+
+        Returns:
+            List[str]: The turns, oldest first; empty if the key is not found.
+        """
+        return self.get_turns(key, last)
+
+    async def aget_history(
+        self, key: str, max_tokens: Union[int, None] = None
+    ) -> Union[str, None]:
+        """Asynchronous version of `get_history`.
+
+        Args:
+            key (str): The key associated with the conversation.
+            max_tokens (int): The token budget, the configured one if None.
+
+        Returns:
+            Union[str, None]: The turns joined by newlines, or None if no turn fits.
+        """
+        return self.window(await self.aget_turns(key), max_tokens)
+
+    @staticmethod
+    def window(turns: List[str], max_tokens: Union[int, None]) -> Union[str, None]:
+        """Join the most recent turns whose estimated size fits the token budget.
+
+        Args:
+            turns (List[str]): The turns, oldest first.
+            max_tokens (int): The token budget, the configured one if None.
+
+        Returns:
+            Union[str, None]: The turns joined by newlines, or None if no turn fits.
+        """
+        if max_tokens is None:
+            max_tokens = history_max_tokens()
+        start = len(turns)
+        used = 0
+        while start > 0:
+            used += estimate_tokens(turns[start - 1])
+            if used > max_tokens:
+                break
+            start -= 1
+        turns = turns[start:]
+        return "\n".join(turns) if turns else None
+
+    async def aget(self, key: str) -> Union[str, None]:
+        """Asynchronous version of `get`.
+
+        Caches whose lookups do not block can rely on this default, which
+        simply calls `get`.
+
+        Args:
+            key (str): The key associated with the value.
+
+        Returns:
+            Union[str, None]: The value associated with the key, or None if not found.
+        """
+        return self.get(key)
+
+    async def ainsert_or_append(self, key: str, value: str) -> None:
+        """Asynchronous version of `insert_or_append`.
+
+        Caches whose updates do not block can rely on this default, which
+        simply calls `insert_or_append`.
+
+        Args:
+            key (str): The key to associate with the value.
+            value (str): The value to be stored in the cache.
+
+        Returns:
+            None
+        """
+        self.insert_or_append(key, value)
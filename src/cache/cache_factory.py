@@ -5,7 +5,6 @@ import os
 from src import constants
 from src.cache.cache import Cache
 from src.cache.in_memory_cache import InMemoryCache
-from src.cache.redis_cache import RedisCache
 
 
 class CacheFactory:
@@ -21,6 +20,9 @@ class CacheFactory:
         ).lower()
 
         if cache_type == constants.REDIS_CACHE:
+            # the redis client is only imported when it is used
+            from src.cache.redis_cache import RedisCache
+
             return RedisCache()
         elif cache_type == constants.IN_MEMORY_CACHE:
             return InMemoryCache()
@@ -1,13 +1,115 @@
+import os
+import sys
 import threading
-from collections import deque
-from typing import Union
+import time
+from collections import OrderedDict
+from typing import List, Union
 
 from src import constants
 from src.cache.cache import Cache
 
 
+class CacheSegment:
+    """One stripe of the InMemoryCache: an LRU ordered dict with its own lock."""
+
+    def __init__(self):
+        """
+        Initialize the CacheSegment.
+        """
+        self.lock = threading.Lock()
+        # key -> (turns, size, expiry time or None), least recently used first
+        self.entries = OrderedDict()
+        self.bytes = 0
+
+    def get_turns(self, key: str, last: Union[int, None]) -> Union[List[str], None]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[2] is not None and entry[2] <= time.monotonic():
+                self._remove(key)
+                return None
+            self.entries.move_to_end(key)
+            return entry[0][-last:] if last else list(entry[0])
+
+    def insert_or_append(
+        self,
+        key: str,
+        value: str,
+        ttl: Union[float, None],
+        max_turns: int,
+        max_bytes: int,
+    ) -> bool:
+        """
+        Set or append to the entry of a key, dropping its oldest turns while
+        it is larger than the whole cache.
+
+        Returns:
+        - bool: False if the entry was dropped, its newest turn alone being
+          larger than the cache.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[2] is not None:
+                if entry[2] <= time.monotonic():
+                    self._remove(key)
+                    entry = None
+            if entry is None:
+                turns, size = [], sys.getsizeof(key)
+            else:
+                turns, size, _ = entry
+                self.entries.move_to_end(key)
+
+            # appending a turn only accounts for the new turn, never the history
+            turns.append(value)
+            size += sys.getsizeof(value)
+            while len(turns) > max_turns > 0:
+                size -= sys.getsizeof(turns.pop(0))
+            while size > max_bytes and len(turns) > 1:
+                size -= sys.getsizeof(turns.pop(0))
+            if size > max_bytes:
+                if entry is not None:
+                    self._remove(key)
+                return False
+
+            expires_at = time.monotonic() + ttl if ttl else None
+            self.bytes += size - (entry[1] if entry is not None else 0)
+            self.entries[key] = (turns, size, expires_at)
+            return True
+
+    def evict(self, keep: Union[str, None] = None) -> bool:
+        """
+        Evict the least recently used entry, unless it is the one to keep.
+
+        Returns:
+        - bool: True if an entry was evicted.
+        """
+        with self.lock:
+            if not self.entries:
+                return False
+            oldest = next(iter(self.entries))
+            if oldest == keep:
+                return False
+            self._remove(oldest)
+            return True
+
+    def _remove(self, key: str) -> None:
+        """Remove an entry, must be called with the lock held."""
+        _, size, _ = self.entries.pop(key)
+        self.bytes -= size
+
+
 class InMemoryCache(Cache):
-    """An in-memory LRU cache implementation in O(1) time."""
+    """
+    An in-memory LRU cache implementation in O(1) time.
+
+    The cache is bounded both by number of entries and by total size in bytes,
+    and entries can expire after a TTL. Keys are spread over independently
+    locked segments so that concurrent requests for different conversations
+    do not serialize on one lock. Recency is tracked per segment, so a full
+    cache evicts the least recently used entry of a segment rather than of
+    the whole cache; small caches use a single segment and are exact LRU.
+    """
 
     _instance = None
     _lock = threading.Lock()
@@ -24,9 +126,37 @@ class InMemoryCache(Cache):
         """
         Initialize the InMemoryCache.
         """
+        self.max_bytes = int(
+            os.getenv("IN_MEMORY_CACHE_MAX_BYTES", constants.IN_MEMORY_CACHE_MAX_BYTES)
+        )
+        self.ttl = float(
+            os.getenv("IN_MEMORY_CACHE_TTL", constants.IN_MEMORY_CACHE_TTL)
+        )
+        self.max_turns = int(
+            os.getenv(
+                "CONVERSATION_HISTORY_MAX_TURNS",
+                constants.CONVERSATION_HISTORY_MAX_TURNS,
+            )
+        )
         self.capacity = constants.IN_MEMORY_CACHE_MAX_ENTRIES
-        self.deque = deque()
-        self.cache = {}
+
+    @property
+    def capacity(self) -> int:
+        """The maximum number of entries in the cache."""
+        return self._capacity
+
+    @capacity.setter
+    def capacity(self, capacity: int) -> None:
+        """Resize the cache, dropping all its entries."""
+        self._capacity = capacity
+        stripes = max(
+            1,
+            min(
+                constants.IN_MEMORY_CACHE_STRIPES,
+                capacity // constants.IN_MEMORY_CACHE_MIN_ENTRIES_PER_STRIPE,
+            ),
+        )
+        self.segments = [CacheSegment() for _ in range(stripes)]
 
     def get(self, key: str) -> Union[str, None]:
         """
@@ -38,33 +168,75 @@ class InMemoryCache(Cache):
         Returns:
         - Union[str, None]: The value associated with the key, or None if the key is not present.
         """
-        if key not in self.cache:
-            return None
+        turns = self._segment(key).get_turns(key, None)
+        return "\n".join(turns) if turns else None
+
+    def get_turns(self, key: str, last: Union[int, None] = None) -> List[str]:
+        """
+        Get the turns recorded for the given key.
+
+        Args:
+        - key (str): The key to look up in the cache.
+        - last (int): Only return this many most recent turns, all if None.
 
-        self.deque.remove(key)
-        self.deque.appendleft(key)
-        value = self.cache[key]
-        return value
+        Returns:
+        - List[str]: The turns, oldest first; empty if the key is not present.
+        """
+        return self._segment(key).get_turns(key, last) or []
 
-    def insert_or_append(self, key: str, value: str) -> None:
+    def insert_or_append(
+        self, key: str, value: str, ttl: Union[float, None] = None
+    ) -> None:
         """
-        sets the value if a key is not present or else simply appends.
+        sets the value if a key is not present or else appends it as a new turn.
+
+        An entry larger than `max_bytes` loses its oldest turns, or is not
+        stored at all when the new turn alone is larger, rather than
+        evicting every other entry.
 
         Args:
         - key (str): The key to set in the cache.
         - value (str): The value to associate with the key.
+        - ttl (float): Seconds after which the entry expires, the cache default if None.
 
         Returns:
         - None
         """
-        with self._lock:
-            if key not in self.cache:
-                if len(self.deque) == self.capacity:
-                    oldest = self.deque.pop()
-                    del self.cache[oldest]
-                self.cache[key] = value
-            else:
-                self.deque.remove(key)
-                oldValue = self.cache[key]
-                self.cache[key] = oldValue + "\n" + value
-            self.deque.appendleft(key)
+        segment = self._segment(key)
+        if not segment.insert_or_append(
+            key, value, self.ttl if ttl is None else ttl, self.max_turns, self.max_bytes
+        ):
+            return
+
+        # the totals are read without the other segments' locks, so they can
+        # be briefly off by the inserts running concurrently
+        while self._entries() > self.capacity or self._bytes() > self.max_bytes:
+            # evict from the segment we inserted into, never the new entry
+            if segment.evict(keep=key):
+                continue
+            others = [s for s in self.segments if s is not segment]
+            if not others or not max(others, key=lambda s: len(s.entries)).evict():
+                break
+
+    def stats(self) -> dict:
+        """
+        Report the cache usage.
+
+        Returns:
+        - dict: Number of entries, their total size in bytes and the number of segments.
+        """
+        return {
+            "entries": self._entries(),
+            "bytes": self._bytes(),
+            "segments": len(self.segments),
+        }
+
+    def _entries(self) -> int:
+        return sum(len(segment.entries) for segment in self.segments)
+
+    def _bytes(self) -> int:
+        return sum(segment.bytes for segment in self.segments)
+
+    def _segment(self, key: str) -> CacheSegment:
+        """Get the segment holding the given key."""
+        return self.segments[hash(key) % len(self.segments)]
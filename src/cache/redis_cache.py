@@ -1,8 +1,9 @@
 import os
 import threading
-from typing import Union
+from typing import List, Tuple, Union
 
 import redis
+import redis.asyncio
 from dotenv import load_dotenv
 
 from src import constants
@@ -10,6 +11,12 @@ from src.cache.cache import Cache
 
 load_dotenv()
 
+# conversations are stored as lists of turns under this prefix; the keys
+# without it hold the history strings of earlier versions, which the list
+# commands would fail on with WRONGTYPE. Such a string is moved over as the
+# oldest turn of its conversation when the conversation is first read.
+TURNS_KEY_PREFIX = "turns:"
+
 
 # TODO
 # Good for on-premise hosting for now
@@ -33,23 +40,81 @@ class RedisCache(Cache):
 
     def initialize_redis(self):
         """
-        Initialize the Redis client and logger.
+        Initialize the Redis clients.
 
-        This method sets up the Redis client with custom configuration parameters.
+        Both clients share the settings of an explicit connection pool. The
+        server memory limit and eviction policy are set unless
+        REDIS_CACHE_CONFIGURE is disabled, e.g. when the server is configured
+        by its deployment, and then only for the values that differ.
 
         Returns:
             None
         """
+        pool_options = {
+            "host": os.environ.get("REDIS_CACHE_HOST", constants.REDIS_CACHE_HOST),
+            "port": int(os.environ.get("REDIS_CACHE_PORT", constants.REDIS_CACHE_PORT)),
+            "max_connections": int(
+                os.environ.get(
+                    "REDIS_CACHE_MAX_CONNECTIONS", constants.REDIS_CACHE_MAX_CONNECTIONS
+                )
+            ),
+            "socket_timeout": float(
+                os.environ.get(
+                    "REDIS_CACHE_SOCKET_TIMEOUT", constants.REDIS_CACHE_SOCKET_TIMEOUT
+                )
+            ),
+            "socket_connect_timeout": float(
+                os.environ.get(
+                    "REDIS_CACHE_SOCKET_TIMEOUT", constants.REDIS_CACHE_SOCKET_TIMEOUT
+                )
+            ),
+            "socket_keepalive": True,
+            "health_check_interval": constants.REDIS_CACHE_HEALTH_CHECK_INTERVAL,
+            "decode_responses": True,
+        }
         self.redis_client = redis.StrictRedis(
-            host=os.environ.get("REDIS_CACHE_HOST", constants.REDIS_CACHE_HOST),
-            port=os.environ.get("REDIS_CACHE_PORT", constants.REDIS_CACHE_PORT),
-            decode_responses=True,
+            connection_pool=redis.ConnectionPool(**pool_options)
+        )
+        # used by the async request path, connects lazily on first use
+        self.async_redis_client = redis.asyncio.StrictRedis(
+            connection_pool=redis.asyncio.ConnectionPool(**pool_options)
         )
-        # Set custom configuration parameters
-        self.redis_client.config_set("maxmemory", constants.REDIS_CACHE_MAX_MEMORY)
-        self.redis_client.config_set(
-            "maxmemory-policy", constants.REDIS_CACHE_MAX_MEMORY_POLICY
+        self.max_turns = int(
+            os.getenv(
+                "CONVERSATION_HISTORY_MAX_TURNS",
+                constants.CONVERSATION_HISTORY_MAX_TURNS,
+            )
         )
+        # seconds since the last turn after which a conversation expires
+        self.ttl = int(os.getenv("REDIS_CACHE_TTL", constants.REDIS_CACHE_TTL))
+
+        if os.getenv("REDIS_CACHE_CONFIGURE", "True").lower() == "true":
+            self.configure_server(
+                {
+                    "maxmemory": os.getenv(
+                        "REDIS_CACHE_MAX_MEMORY", constants.REDIS_CACHE_MAX_MEMORY
+                    ),
+                    "maxmemory-policy": os.getenv(
+                        "REDIS_CACHE_MAX_MEMORY_POLICY",
+                        constants.REDIS_CACHE_MAX_MEMORY_POLICY,
+                    ),
+                }
+            )
+
+    def configure_server(self, parameters: dict) -> None:
+        """
+        Set the server configuration parameters that differ from the given ones.
+
+        Args:
+            parameters (dict): Configuration parameter names and their values.
+
+        Returns:
+            None
+        """
+        for name, value in parameters.items():
+            current = self.redis_client.config_get(name).get(name)
+            if current is None or not self._same_config_value(current, value):
+                self.redis_client.config_set(name, value)
 
     def get(self, key: str) -> Union[str, None]:
         """
@@ -61,11 +126,34 @@ class RedisCache(Cache):
         Returns:
             Union[str, None]: The value associated with the key, or None if not found.
         """
-        return self.redis_client.get(key)
+        turns = self.get_turns(key)
+        return "\n".join(turns) if turns else None
+
+    def get_turns(self, key: str, last: Union[int, None] = None) -> List[str]:
+        """
+        Get the turns recorded for the given key.
+
+        Args:
+            key (str): The key for the desired turns.
+            last (int): Only return this many most recent turns, all if None.
+
+        Returns:
+            List[str]: The turns, oldest first; empty if not found.
+        """
+        pipeline = self.redis_client.pipeline(transaction=True)
+        self._read(pipeline, key, last)
+        turns, legacy = pipeline.execute()
+        if legacy is None:
+            return turns
+
+        pipeline = self.redis_client.pipeline(transaction=True)
+        self._migrate(pipeline, key, legacy)
+        pipeline.execute()
+        return self._with_legacy(turns, legacy, last)
 
     def insert_or_append(self, key: str, value: str) -> None:
         """
-        Set the value associated with the given key.
+        Append the value as a new turn of the given key.
 
         Args:
             key (str): The key for the value.
@@ -74,9 +162,188 @@ class RedisCache(Cache):
         Returns:
             None
         """
-        oldValue = self.get(key)
-        with self._lock:
-            if oldValue:
-                self.redis_client.set(key, oldValue + "\n" + value)
-            else:
-                self.redis_client.set(key, value)
+        self.insert_or_append_many([(key, value)])
+
+    def insert_or_append_many(self, items: List[Tuple[str, str]]) -> None:
+        """
+        Append several turns in a single round trip, atomically.
+
+        Args:
+            items (List[Tuple[str, str]]): The keys and the values to append.
+
+        Returns:
+            None
+        """
+        # MULTI/EXEC, so no client sees a turn before it is trimmed and expires
+        pipeline = self.redis_client.pipeline(transaction=True)
+        for key, value in items:
+            self._append(pipeline, key, value)
+        pipeline.execute()
+
+    async def aget(self, key: str) -> Union[str, None]:
+        """
+        Asynchronous version of `get`.
+
+        Args:
+            key (str): The key for the desired value.
+
+        Returns:
+            Union[str, None]: The value associated with the key, or None if not found.
+        """
+        turns = await self.aget_turns(key)
+        return "\n".join(turns) if turns else None
+
+    async def aget_turns(self, key: str, last: Union[int, None] = None) -> List[str]:
+        """
+        Asynchronous version of `get_turns`.
+
+        Args:
+            key (str): The key for the desired turns.
+            last (int): Only return this many most recent turns, all if None.
+
+        Returns:
+            List[str]: The turns, oldest first; empty if not found.
+        """
+        async with self.async_redis_client.pipeline(transaction=True) as pipeline:
+            self._read(pipeline, key, last)
+            turns, legacy = await pipeline.execute()
+        if legacy is None:
+            return turns
+
+        async with self.async_redis_client.pipeline(transaction=True) as pipeline:
+            self._migrate(pipeline, key, legacy)
+            await pipeline.execute()
+        return self._with_legacy(turns, legacy, last)
+
+    async def ainsert_or_append(self, key: str, value: str) -> None:
+        """
+        Asynchronous version of `insert_or_append`.
+
+        Args:
+            key (str): The key for the value.
+            value (str): The value to set.
+
+        Returns:
+            None
+        """
+        async with self.async_redis_client.pipeline(transaction=True) as pipeline:
+            self._append(pipeline, key, value)
+            await pipeline.execute()
+
+    def _read(self, pipeline, key: str, last: Union[int, None]) -> None:
+        """
+        Queue the commands reading the turns of a conversation and taking
+        the history string an earlier version stored under its key, if any.
+
+        GETDEL hands that string to a single reader, which moves it over.
+
+        Args:
+            pipeline: The pipeline to queue the commands on.
+            key (str): The conversation key.
+            last (int): Only read this many most recent turns, all if None.
+
+        Returns:
+            None
+        """
+        pipeline.lrange(self._turns_key(key), -last if last else 0, -1)
+        pipeline.getdel(key)
+
+    def _migrate(self, pipeline, key: str, legacy: str) -> None:
+        """
+        Queue the commands moving the history string of an earlier version
+        in front of the turns of its conversation.
+
+        Args:
+            pipeline: The pipeline to queue the commands on.
+            key (str): The conversation key.
+            legacy (str): The history string.
+
+        Returns:
+            None
+        """
+        turns_key = self._turns_key(key)
+        pipeline.lpush(turns_key, legacy)
+        if self.max_turns > 0:
+            pipeline.ltrim(turns_key, -self.max_turns, -1)
+        if self.ttl > 0:
+            pipeline.expire(turns_key, self.ttl)
+
+    def _with_legacy(
+        self, turns: List[str], legacy: str, last: Union[int, None]
+    ) -> List[str]:
+        """
+        Get the turns of a conversation once its history string was moved over.
+
+        Args:
+            turns (List[str]): The turns read before the move.
+            legacy (str): The history string, now the oldest turn.
+            last (int): Only return this many most recent turns, all if None.
+
+        Returns:
+            List[str]: The turns, oldest first.
+        """
+        turns = [legacy, *turns]
+        if self.max_turns > 0:
+            turns = turns[-self.max_turns :]
+        return turns[-last:] if last else turns
+
+    def _append(self, pipeline, key: str, value: str) -> None:
+        """
+        Queue the commands appending a turn and refreshing the conversation TTL.
+
+        Args:
+            pipeline: The pipeline to queue the commands on.
+            key (str): The key for the value.
+            value (str): The value to append.
+
+        Returns:
+            None
+        """
+        key = self._turns_key(key)
+        pipeline.rpush(key, value)
+        if self.max_turns > 0:
+            pipeline.ltrim(key, -self.max_turns, -1)
+        if self.ttl > 0:
+            pipeline.expire(key, self.ttl)
+
+    @staticmethod
+    def _turns_key(key: str) -> str:
+        """
+        Get the Redis key of the list of turns of a conversation.
+
+        Args:
+            key (str): The conversation key.
+
+        Returns:
+            str: The Redis key.
+        """
+        return f"{TURNS_KEY_PREFIX}{key}"
+
+    @staticmethod
+    def _same_config_value(current: str, value) -> bool:
+        """
+        Compare a configuration value reported by the server with a wanted one,
+        allowing memory sizes to be given with units (e.g. "500mb").
+
+        Args:
+            current (str): The value reported by CONFIG GET.
+            value: The wanted value.
+
+        Returns:
+            bool: True if the values are the same.
+        """
+        value = str(value).lower()
+        units = {
+            "kb": 1024,
+            "mb": 1024**2,
+            "gb": 1024**3,
+            "k": 1000,
+            "m": 1000**2,
+            "g": 1000**3,
+        }
+        for unit, factor in units.items():
+            number = value[: -len(unit)]
+            if value.endswith(unit) and number.isdigit():
+                value = str(int(number) * factor)
+                break
+        return str(current).lower() == value
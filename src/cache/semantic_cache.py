@@ -0,0 +1,191 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Tuple, Union
+
+import numpy as np
+
+from src import constants
+
+
+class SemanticCache:
+    """
+    A cache of documentation summaries keyed by the query embedding and the
+    summarization model.
+
+    A lookup returns the stored answer of the most similar cached query
+    summarized by the same model when its cosine similarity reaches the
+    configured threshold. Entries expire
+    after a TTL, the least recently used entry is evicted when the cache is
+    full and the whole cache is dropped when the index version changes.
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        """Implement Singleton pattern with thread safety."""
+        with cls._lock:
+            if not cls._instance:
+                cls._instance = super(SemanticCache, cls).__new__(cls)
+                cls._instance.initialize_cache()
+        return cls._instance
+
+    def initialize_cache(self):
+        """
+        Initialize the SemanticCache.
+        """
+        self.capacity = int(
+            os.getenv(
+                "OLS_SEMANTIC_CACHE_MAX_ENTRIES",
+                constants.SEMANTIC_CACHE_MAX_ENTRIES,
+            )
+        )
+        self.threshold = float(
+            os.getenv(
+                "OLS_SEMANTIC_CACHE_THRESHOLD",
+                constants.SEMANTIC_CACHE_SIMILARITY_THRESHOLD,
+            )
+        )
+        self.ttl = float(
+            os.getenv("OLS_SEMANTIC_CACHE_TTL", constants.SEMANTIC_CACHE_TTL)
+        )
+        self.clear()
+
+    def clear(self, index_version=None):
+        """
+        Drop every cached entry.
+
+        Args:
+        - index_version: The index version the new entries will belong to.
+
+        Returns:
+        - None
+        """
+        self.index_version = index_version
+        # normalized embeddings, one row per slot; free slots are zero rows
+        self.vectors = None
+        # slot -> (summary, referenced documents, model, expiry time), in LRU order
+        self.entries = OrderedDict()
+        self.free_slots = list(range(self.capacity - 1, -1, -1))
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(
+        self, embedding: List[float], index_version, model: str = None
+    ) -> Union[Tuple[str, str], None]:
+        """
+        Find the answer of a cached query similar to the given one.
+
+        Args:
+        - embedding (List[float]): The query embedding.
+        - index_version: Version of the index the answer has to come from.
+        - model (str): The model the answer has to be summarized by.
+
+        Returns:
+        - Union[Tuple[str, str], None]: The summary and referenced documents,
+          or None if no cached query is similar enough.
+        """
+        query = self._normalize(embedding)
+        with self._lock:
+            if index_version != self.index_version or not self.entries:
+                self.misses += 1
+                return None
+
+            scores = self.vectors @ query
+            while True:
+                slot = int(np.argmax(scores))
+                if scores[slot] < self.threshold or slot not in self.entries:
+                    self.misses += 1
+                    return None
+                summary, referenced_documents, entry_model, expires_at = self.entries[
+                    slot
+                ]
+                if expires_at <= time.monotonic():
+                    # expired, try the next most similar query
+                    self._remove(slot)
+                elif entry_model == model:
+                    break
+                scores[slot] = -np.inf
+
+            self.entries.move_to_end(slot)
+            self.hits += 1
+            return summary, referenced_documents
+
+    def insert(
+        self,
+        embedding: List[float],
+        summary: str,
+        referenced_documents: str,
+        index_version,
+        model: str = None,
+    ) -> None:
+        """
+        Store the answer to a query.
+
+        Args:
+        - embedding (List[float]): The query embedding.
+        - summary (str): The summary generated for the query.
+        - referenced_documents (str): The documents the summary is based on.
+        - index_version: Version of the index the answer comes from.
+        - model (str): The model the summary was generated by.
+
+        Returns:
+        - None
+        """
+        if self.capacity <= 0:
+            return
+
+        vector = self._normalize(embedding)
+        with self._lock:
+            if index_version != self.index_version:
+                self.clear(index_version)
+            if self.vectors is None:
+                self.vectors = np.zeros(
+                    (self.capacity, vector.shape[0]), dtype=np.float32
+                )
+
+            if not self.free_slots:
+                oldest = next(iter(self.entries))
+                self._remove(oldest)
+
+            slot = self.free_slots.pop()
+            self.vectors[slot] = vector
+            self.entries[slot] = (
+                summary,
+                referenced_documents,
+                model,
+                time.monotonic() + self.ttl,
+            )
+
+    def stats(self) -> dict:
+        """
+        Report the cache usage.
+
+        Returns:
+        - dict: Number of entries, hits and misses.
+        """
+        with self._lock:
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def _remove(self, slot: int) -> None:
+        """
+        Free the given slot, must be called with the lock held.
+        """
+        del self.entries[slot]
+        self.vectors[slot] = 0
+        self.free_slots.append(slot)
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        """
+        Scale the embedding to unit length so a dot product is a cosine similarity.
+        """
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
@@ -98,6 +98,29 @@ Statement: {statement}
 Response:
 """
 
+YES_OR_NO_BATCH_CLASSIFIER_PROMPT_TEMPLATE = """
+Instructions:
+- determine if each of the numbered statements is a yes or a no
+- return a 1 if the statement is a yes statement
+- return a 0 if the statement is a no statement
+- return a 9 if you cannot determine if the statement is a yes or no
+- respond with one line per statement: its number, a colon and the result
+
+Examples:
+Statements:
+1. Yes, that sounds good.
+2. No, I don't think that is wise.
+3. Apples are red.
+Response:
+1: 1
+2: 0
+3: 9
+
+Statements:
+{statements}
+Response:
+"""
+
 QUESTION_VALIDATOR_PROMPT_TEMPLATE = """
 Instructions:
 - You are a question classifying tool
@@ -159,20 +182,135 @@ User Request: {query}
 
 # models
 TEI_EMBEDDING_MODEL = "BAAI/bge-base-en-v1.5"
+# embedding model run in process when no TEI server is configured
+LOCAL_EMBED_MODEL = "BAAI/bge-base-en"
+# "fp32", "int8" (dynamically quantized linear layers) or "onnx" (ONNX Runtime)
+LOCAL_EMBED_MODEL_PRECISIONS = ("fp32", "int8", "onnx")
+LOCAL_EMBED_MODEL_PRECISION = "fp32"
+# where the ONNX export of the local embedding model is saved
+LOCAL_EMBED_MODEL_ONNX_DIR = "./embed-model-onnx"
 GRANITE_13B_CHAT_V1 = "ibm/granite-13b-chat-v1"
 GRANITE_20B_CODE_INSTRUCT_V1 = "ibm/granite-20b-code-instruct-v1"
+# tokens accepted by the models, prompt and generated tokens together
+DEFAULT_MODEL_CONTEXT_WINDOW = 4096
+MODEL_CONTEXT_WINDOWS = {
+    GRANITE_13B_CHAT_V1: 8192,
+    GRANITE_20B_CODE_INSTRUCT_V1: 8192,
+    "gpt-3.5-turbo": 16385,
+    "gpt-4": 8192,
+    "gpt-4-turbo": 128000,
+}
+# Hugging Face tokenizer of the models whose id is not a Hugging Face model id;
+# the OpenAI ones are Hugging Face ports of their tiktoken encodings, which
+# tiktoken itself would download on first use
+MODEL_TOKENIZERS = {
+    GRANITE_13B_CHAT_V1: "ibm-granite/granite-13b-chat-v1",
+    GRANITE_20B_CODE_INSTRUCT_V1: "ibm-granite/granite-20b-code-instruct",
+    "gpt-3.5-turbo": "Xenova/gpt-3.5-turbo",
+    "gpt-4": "Xenova/gpt-4",
+    "gpt-4-turbo": "Xenova/gpt-4",
+}
 
 # indexing constants
 PRODUCT_INDEX = "product"
 PRODUCT_DOCS_PERSIST_DIR = "./vector-db/ocp-product-docs"
 SUMMARY_INDEX = "summary"
 SUMMARY_DOCS_PERSIST_DIR = "./vector-db/summary-docs"
+# seconds between the checks for a rebuilt index to reload, 0 never
+INDEX_RELOAD_SECONDS = 60
+# format the vectors of new indexes are persisted in
+SIMPLE_VECTOR_STORE = "simple"
+MMAP_VECTOR_STORE = "mmap"
+VECTOR_STORE_FORMAT = SIMPLE_VECTOR_STORE
+VECTOR_STORE_DTYPE = "float32"
+# approximate search index built for memory-mapped vector stores
+EXACT_VECTOR_INDEX = "exact"
+IVF_VECTOR_INDEX = "ivf"
+VECTOR_INDEX = EXACT_VECTOR_INDEX
+# IVF lists, 0 picks about 4 * sqrt(vectors)
+IVF_NLIST = 0
+# IVF lists searched per query
+IVF_NPROBE = 8
+# weight of the vector scores when fusing them with the BM25 scores
+HYBRID_RETRIEVAL_ALPHA = 0.5
+# nodes retrieved by each search before fusing
+HYBRID_RETRIEVAL_CANDIDATES = 20
+# nodes retrieved for a question before reranking and compression
+RETRIEVAL_TOP_K = 5
+# reranking of the retrieved nodes: "none" or "cross-encoder"
+NO_RERANKER = "none"
+CROSS_ENCODER_RERANKER = "cross-encoder"
+RERANKER = CROSS_ENCODER_RERANKER
+RERANKER_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+# nodes kept by the reranker
+RERANK_TOP_N = 3
+# tokens of documentation put into the summarization prompt, the size of the
+# single chunk the prompt got before retrieving several nodes
+CONTEXT_MAX_TOKENS = 1024
+# texts per embedding request and requests in flight when building indexes
+INDEXER_EMBED_BATCH_SIZE = 32
+INDEXER_EMBED_CONCURRENCY = 4
+
+# conversation history constants
+# turns kept per conversation, older turns are dropped
+CONVERSATION_HISTORY_MAX_TURNS = 100
+# tokens of history put into a prompt
+CONVERSATION_HISTORY_MAX_TOKENS = 1024
 
 # cache constants
 IN_MEMORY_CACHE = "in-memory"
 IN_MEMORY_CACHE_MAX_ENTRIES = 1000
+IN_MEMORY_CACHE_MAX_BYTES = 100 * 1024 * 1024
+# seconds, 0 means entries never expire
+IN_MEMORY_CACHE_TTL = 0
+IN_MEMORY_CACHE_STRIPES = 8
+IN_MEMORY_CACHE_MIN_ENTRIES_PER_STRIPE = 64
 REDIS_CACHE = "redis"
 REDIS_CACHE_HOST = "redis-stack.ols.svc"
 REDIS_CACHE_PORT = 6379
 REDIS_CACHE_MAX_MEMORY = "500mb"
 REDIS_CACHE_MAX_MEMORY_POLICY = "allkeys-lru"
+REDIS_CACHE_MAX_CONNECTIONS = 50
+# seconds
+REDIS_CACHE_SOCKET_TIMEOUT = 5
+REDIS_CACHE_HEALTH_CHECK_INTERVAL = 30
+# seconds since the last turn after which a conversation expires, 0 never
+REDIS_CACHE_TTL = 24 * 60 * 60
+
+# semantic cache constants
+SEMANTIC_CACHE_MAX_ENTRIES = 1000
+SEMANTIC_CACHE_SIMILARITY_THRESHOLD = 0.95
+SEMANTIC_CACHE_TTL = 24 * 60 * 60
+
+# query embedding cache constants
+QUERY_EMBEDDING_CACHE_MAX_ENTRIES = 10000
+
+# warmup constants
+# seconds between the attempts to warm up a failed required component
+WARMUP_RETRY_SECONDS = 30
+
+# stage executor constants
+# threads shared by all requests for blocking retrieval, embedding and
+# streaming calls, the LLM calls being asynchronous
+STAGE_WORKERS = 32
+
+# task processor constants
+# tasks processed concurrently for a request
+TASK_PROCESSOR_WORKERS = 4
+
+# logging constants
+# share of the conversations whose prompts, LLM responses and histories are logged
+LOG_SAMPLE_PROMPTS = 0.1
+LOG_SAMPLE_RESPONSES = 1.0
+LOG_SAMPLE_HISTORY = 0.1
+# characters of a prompt, response or history logged, 0 for no limit
+LOG_PAYLOAD_MAX_CHARS = 500
+# characters of the query of the always logged incoming request lines
+LOG_REQUEST_MAX_CHARS = 100
+
+# yes/no classifier constants
+# statements classified by a single LLM call
+YES_NO_BATCH_SIZE = 10
+
+# question classifier constants
+QUESTION_CLASSIFIER_CONFIDENCE_THRESHOLD = 0.9
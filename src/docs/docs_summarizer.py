@@ -2,12 +2,19 @@ import os
 
 import llama_index
 from dotenv import load_dotenv
-from llama_index import StorageContext, load_index_from_storage
 from llama_index.prompts import PromptTemplate
+from llama_index.schema import NodeWithScore, QueryBundle
 
 from src import constants
+from src.cache.cache import estimate_tokens
+from src.cache.semantic_cache import SemanticCache
+from src.docs.index_registry import IndexRegistry
+from src.retrieval.postprocessors import retrieval_postprocessors
+from utils.log_policy import RESPONSE, log_payload
 from utils.logger import Logger
 from utils.model_context import get_watsonx_context
+from utils.prompt_budget import KEEP_START, PromptBudget
+from utils.stage_executor import iterate_blocking, run_blocking
 
 load_dotenv()
 
@@ -23,27 +30,186 @@ class DocsSummarizer:
         """
         self.logger = Logger("docs_summarizer").logger
 
-    def summarize(self, conversation, query, **kwargs):
+    def retrieve(self, conversation, query):
+        """
+        Retrieve the documentation nodes relevant to the given query.
+
+        Retrieval does not involve the LLM, so it can start before the query
+        has been validated and its result be handed to `summarize` later.
+
+        The best `OLS_RETRIEVAL_TOP_K` nodes are retrieved, optionally
+        reranked, and trimmed to the sentences relevant to the query, see
+        `retrieval_postprocessors`.
+
+        Args:
+        - conversation: The unique identifier for the conversation.
+        - query: The query (str or QueryBundle) to retrieve documentation for.
+
+        Returns:
+        - List[NodeWithScore]: The retrieved documentation nodes.
+        """
+        self.logger.info(f"{conversation} Retrieving documentation nodes")
+        query_bundle = query if isinstance(query, QueryBundle) else QueryBundle(query)
+        retriever = IndexRegistry().get_retriever(
+            constants.PRODUCT_INDEX,
+            similarity_top_k=int(
+                os.getenv("OLS_RETRIEVAL_TOP_K", constants.RETRIEVAL_TOP_K)
+            ),
+        )
+        nodes = retriever.retrieve(query_bundle)
+        retrieved_tokens = sum(
+            estimate_tokens(node.node.get_content()) for node in nodes
+        )
+        for postprocessor in retrieval_postprocessors():
+            nodes = postprocessor.postprocess_nodes(nodes, query_bundle)
+        self.logger.info(
+            f"{conversation} Retrieved {len(nodes)} nodes, context of "
+            f"{sum(estimate_tokens(node.node.get_content()) for node in nodes)} "
+            f"tokens out of {retrieved_tokens}"
+        )
+        return nodes
+
+    async def aretrieve(self, conversation, query):
+        """
+        Asynchronous version of `retrieve`, run on the shared executor.
+
+        Args:
+        - conversation: The unique identifier for the conversation.
+        - query: The query to retrieve documentation for.
+
+        Returns:
+        - List[NodeWithScore]: The retrieved documentation nodes.
+        """
+        return await run_blocking(self.retrieve, conversation, query)
+
+    async def asummarize(self, conversation, query, nodes=None, **kwargs):
+        """
+        Asynchronous version of `summarize`, run on the shared executor.
+
+        Args:
+        - conversation: The unique identifier for the conversation.
+        - query: The query to be summarized.
+        - nodes: Documentation nodes already retrieved for the query, if any.
+        - kwargs: Additional keyword arguments for customization (model, verbose, etc.).
+
+        Returns:
+        - Tuple[str, str]: A tuple containing the summary as a string and referenced documents as a string.
+        """
+        return await run_blocking(
+            self.summarize, conversation, query, nodes=nodes, **kwargs
+        )
+
+    def summarize(self, conversation, query, nodes=None, **kwargs):
         """
         Summarize the given query based on the provided conversation context.
 
         Args:
         - conversation: The unique identifier for the conversation.
         - query: The query to be summarized.
+        - nodes: Documentation nodes already retrieved for the query, if any.
         - kwargs: Additional keyword arguments for customization (model, verbose, etc.).
 
         Returns:
         - Tuple[str, str]: A tuple containing the summary as a string and referenced documents as a string.
         """
-        model = kwargs.get(
-            "model", os.getenv("DOC_SUMMARIZER_MODEL", "ibm/granite-13b-chat-v1")
+        model = self._model(**kwargs)
+        query_bundle = self._query_bundle(query)
+        cached = self._cached_summary(conversation, query_bundle, model)
+        if cached is not None:
+            return cached
+
+        summary = self._query(
+            conversation, query_bundle, nodes, streaming=False, **kwargs
         )
+        referenced_documents = self._referenced_documents(summary)
+
+        log_payload(self.logger, RESPONSE, conversation, "Summary response", summary)
+        self.logger.info(f"{conversation} Referenced documents: {referenced_documents}")
+
+        self._cache_summary(query_bundle, model, str(summary), referenced_documents)
+        return str(summary), referenced_documents
+
+    def stream_summary(self, conversation, query, nodes=None, **kwargs):
+        """
+        Summarize the given query, producing the summary as it is generated.
+
+        Args:
+        - conversation: The unique identifier for the conversation.
+        - query: The query to be summarized.
+        - nodes: Documentation nodes already retrieved for the query, if any.
+        - kwargs: Additional keyword arguments for customization (model, verbose, etc.).
+
+        Returns:
+        - Tuple[Iterator[str], str]: A tuple containing an iterator over the summary
+          chunks and referenced documents as a string.
+        """
+        model = self._model(**kwargs)
+        query_bundle = self._query_bundle(query)
+        cached = self._cached_summary(conversation, query_bundle, model)
+        if cached is not None:
+            summary, referenced_documents = cached
+            return iter([summary]), referenced_documents
+
+        summary = self._query(
+            conversation, query_bundle, nodes, streaming=True, **kwargs
+        )
+        referenced_documents = self._referenced_documents(summary)
+
+        self.logger.info(f"{conversation} Referenced documents: {referenced_documents}")
+
+        def response_gen():
+            chunks = []
+            for chunk in summary.response_gen:
+                chunks.append(chunk)
+                yield chunk
+            # only complete summaries are cached
+            self._cache_summary(
+                query_bundle, model, "".join(chunks), referenced_documents
+            )
+
+        return response_gen(), referenced_documents
+
+    async def astream_summary(self, conversation, query, nodes=None, **kwargs):
+        """
+        Asynchronous version of `stream_summary`, run on the shared executor.
+
+        Args:
+        - conversation: The unique identifier for the conversation.
+        - query: The query to be summarized.
+        - nodes: Documentation nodes already retrieved for the query, if any.
+        - kwargs: Additional keyword arguments for customization (model, verbose, etc.).
+
+        Returns:
+        - Tuple[AsyncIterator[str], str]: A tuple containing an async iterator over
+          the summary chunks and referenced documents as a string.
+        """
+        response_gen, referenced_documents = await run_blocking(
+            self.stream_summary, conversation, query, nodes=nodes, **kwargs
+        )
+        return iterate_blocking(response_gen), referenced_documents
+
+    def _query(self, conversation, query_bundle, nodes, streaming, **kwargs):
+        """
+        Run the summarization query engine, retrieving nodes unless given.
+
+        Args:
+        - conversation: The unique identifier for the conversation.
+        - query_bundle: The query to be summarized.
+        - nodes: Documentation nodes already retrieved for the query, or None.
+        - streaming: Whether the summary should be generated as a stream.
+        - kwargs: Additional keyword arguments for customization (model, verbose, etc.).
+
+        Returns:
+        - Union[Response, StreamingResponse]: The query engine response.
+        """
+        model = self._model(**kwargs)
         verbose = kwargs.get("verbose", "").lower() == "true"
 
         # Set up llama index to show prompting if verbose is True
         if verbose:
             llama_index.set_global_handler("simple")
 
+        query = query_bundle.query_str
         settings_string = f"conversation: {conversation}, query: {query}, model: {model}, verbose: {verbose}"
         self.logger.info(f"{conversation} call settings: {settings_string}")
 
@@ -67,36 +233,175 @@ class DocsSummarizer:
             f"{conversation} using embed model: {str(service_context.embed_model)}"
         )
 
-        storage_context = StorageContext.from_defaults(
-            persist_dir=constants.PRODUCT_DOCS_PERSIST_DIR
-        )
-        self.logger.info(f"{conversation} Setting up index")
-        index = load_index_from_storage(
-            storage_context=storage_context,
-            index_id=constants.PRODUCT_INDEX,
-            service_context=service_context,
-            verbose=verbose,
-        )
+        self.logger.info(f"{conversation} Getting shared index")
+        index = IndexRegistry().get_index(constants.PRODUCT_INDEX)
 
         self.logger.info(f"{conversation} Setting up query engine")
         query_engine = index.as_query_engine(
+            service_context=service_context,
             text_qa_template=summarization_template,
             verbose=verbose,
-            streaming=False,
-            similarity_top_k=1,
+            streaming=streaming,
         )
 
-        self.logger.info(f"{conversation} Submitting summarization query")
-        summary = query_engine.query(query)
+        if nodes is None:
+            nodes = self.retrieve(conversation, query_bundle)
+        else:
+            self.logger.info(f"{conversation} Summarizing pre-retrieved nodes")
 
-        referenced_documents = "\n".join(
+        nodes = self._fit_context(conversation, model, query, nodes)
+        return query_engine.synthesize(query_bundle, nodes)
+
+    def _fit_context(self, conversation, model, query, nodes):
+        """
+        Truncate the documentation context to the tokens the summarization
+        prompt has left in the context window of the model.
+
+        Args:
+        - conversation: The unique identifier for the conversation.
+        - model: The summarization model.
+        - query: The query to be summarized.
+        - nodes: The documentation nodes, best first.
+
+        Returns:
+        - List[NodeWithScore]: The nodes fitting the prompt, the last one
+          possibly truncated.
+        """
+        separator = "\n\n"
+        texts = [node.node.get_content() for node in nodes]
+        context = separator.join(texts)
+        fitted = PromptBudget(model).fit(
+            "docs_summarizer",
+            constants.SUMMARIZATION_TEMPLATE,
+            truncatable={"context_str": KEEP_START},
+            context_str=context,
+            query_str=query,
+        )["context_str"]
+        if fitted == context:
+            return nodes
+
+        self.logger.info(
+            f"{conversation} Documentation context truncated to fit {model}"
+        )
+        # the truncated context is a prefix of the context, keep that prefix
+        fitted_nodes = []
+        remaining = len(fitted)
+        for node, text in zip(nodes, texts):
+            if remaining <= 0:
+                break
+            if len(text) > remaining:
+                # never modify the node, it belongs to the shared docstore
+                truncated = node.node.copy()
+                truncated.set_content(text[:remaining])
+                node = NodeWithScore(node=truncated, score=node.score)
+            fitted_nodes.append(node)
+            remaining -= len(text) + len(separator)
+        return fitted_nodes
+
+    @staticmethod
+    def _model(**kwargs):
+        """
+        Get the summarization model.
+
+        Args:
+        - kwargs: Additional keyword arguments for customization (model, verbose, etc.).
+
+        Returns:
+        - str: The model the summaries are generated by.
+        """
+        return kwargs.get(
+            "model", os.getenv("DOC_SUMMARIZER_MODEL", "ibm/granite-13b-chat-v1")
+        )
+
+    @staticmethod
+    def _semantic_cache_enabled():
+        """
+        Check whether summaries are cached by query embedding, which can be
+        disabled by setting `OLS_SEMANTIC_CACHE` to false.
+
+        Returns:
+        - bool: True if the semantic cache is enabled.
+        """
+        return os.getenv("OLS_SEMANTIC_CACHE", "True").lower() == "true"
+
+    def _query_bundle(self, query):
+        """
+        Build the query bundle, embedding the query when the semantic cache
+        needs it. The retriever then reuses that embedding.
+
+        Args:
+        - query: The query to be summarized.
+
+        Returns:
+        - QueryBundle: The query bundle.
+        """
+        if not self._semantic_cache_enabled():
+            return QueryBundle(query)
+        index = IndexRegistry().get_index(constants.PRODUCT_INDEX)
+        embedding = index.service_context.embed_model.get_query_embedding(query)
+        return QueryBundle(query, embedding=embedding)
+
+    def _cached_summary(self, conversation, query_bundle, model):
+        """
+        Look up the answer of a similar query in the semantic cache.
+
+        Args:
+        - conversation: The unique identifier for the conversation.
+        - query_bundle: The query to be summarized.
+        - model: The summarization model.
+
+        Returns:
+        - Union[Tuple[str, str], None]: The cached summary and referenced
+          documents, or None on a cache miss.
+        """
+        if query_bundle.embedding is None:
+            return None
+        cached = SemanticCache().lookup(
+            query_bundle.embedding,
+            IndexRegistry().index_version(constants.PRODUCT_INDEX),
+            model,
+        )
+        if cached is not None:
+            self.logger.info(f"{conversation} Semantic cache hit")
+        return cached
+
+    def _cache_summary(self, query_bundle, model, summary, referenced_documents):
+        """
+        Store the answer in the semantic cache.
+
+        Args:
+        - query_bundle: The summarized query.
+        - model: The summarization model.
+        - summary: The generated summary.
+        - referenced_documents: The documents the summary is based on.
+
+        Returns:
+        - None
+        """
+        if query_bundle.embedding is None:
+            return
+        SemanticCache().insert(
+            query_bundle.embedding,
+            summary,
+            referenced_documents,
+            IndexRegistry().index_version(constants.PRODUCT_INDEX),
+            model,
+        )
+
+    @staticmethod
+    def _referenced_documents(response):
+        """
+        List the documents the response is based on.
+
+        Args:
+        - response: The query engine response.
+
+        Returns:
+        - str: The referenced document file names, one per line.
+        """
+        return "\n".join(
             [
                 source_node.node.metadata["file_name"]
-                for source_node in summary.source_nodes
+                for source_node in response.source_nodes
             ]
         )
-
-        self.logger.info(f"{conversation} Summary response: {str(summary)}")
-        self.logger.info(f"{conversation} Referenced documents: {referenced_documents}")
-
-        return str(summary), referenced_documents
@@ -0,0 +1,326 @@
+import hashlib
+import os
+import threading
+import time
+import tracemalloc
+from typing import Union
+
+from dotenv import load_dotenv
+from llama_index import StorageContext, load_index_from_storage
+from llama_index.indices.base import BaseIndex
+from llama_index.retrievers import BaseRetriever
+
+from src import constants
+from src.retrieval.bm25_index import BM25Index
+from src.retrieval.hybrid_retriever import HybridRetriever
+from src.retrieval.vector_stores import load_vector_store
+from utils.logger import Logger
+from utils.model_context import get_embed_context
+
+load_dotenv()
+
+
+class IndexRegistry:
+    """
+    Process-wide registry of the persisted vector indexes.
+
+    Every index is parsed from disk once and then shared by all requests.
+    The returned indexes must be treated as read-only: callers build their
+    own query engines on top of them and never insert into them.
+
+    Every `OLS_INDEX_RELOAD_SECONDS` an index is checked against its persist
+    directory, and loaded again, with a new version, once it was rebuilt.
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+
+    # index id -> directory the index was persisted to by the indexer
+    persist_dirs = {
+        constants.PRODUCT_INDEX: constants.PRODUCT_DOCS_PERSIST_DIR,
+        constants.SUMMARY_INDEX: constants.SUMMARY_DOCS_PERSIST_DIR,
+    }
+
+    def __new__(cls):
+        """Implement Singleton pattern with thread safety."""
+        with cls._lock:
+            if not cls._instance:
+                cls._instance = super(IndexRegistry, cls).__new__(cls)
+                cls._instance.initialize_registry()
+        return cls._instance
+
+    def initialize_registry(self):
+        """
+        Initialize the IndexRegistry, dropping any index loaded so far.
+        """
+        self.logger = Logger("index_registry").logger
+        self.indexes = {}
+        self.bm25_indexes = {}
+        self.index_stats = {}
+        self.load_lock = threading.Lock()
+        self.reload_seconds = float(
+            os.getenv("OLS_INDEX_RELOAD_SECONDS", constants.INDEX_RELOAD_SECONDS)
+        )
+        # index id -> time its persist directory is checked next
+        self.next_check = {}
+        # tracing slows down the allocations of every thread, only opt in
+        # to measure the memory footprint of the indexes at startup
+        self.trace_memory = (
+            os.getenv("OLS_INDEX_TRACE_MEMORY", "False").lower() == "true"
+        )
+
+    def get_index(self, index_id: str) -> BaseIndex:
+        """
+        Get the shared index with the given id, loading it on first use.
+
+        Args:
+        - index_id (str): One of the ids in `persist_dirs`.
+
+        Returns:
+        - BaseIndex: The shared, read-only index.
+        """
+        index = self.indexes.get(index_id)
+        if index is not None and not self.check_due(index_id):
+            return index
+
+        with self.load_lock:
+            # another thread may have finished loading while we were waiting
+            if index_id not in self.indexes:
+                self.indexes[index_id] = self.load_index(index_id)
+            elif self.check_due(index_id):
+                self.reload_if_rebuilt(index_id)
+            return self.indexes[index_id]
+
+    def check_due(self, index_id: str) -> bool:
+        """
+        Check whether the persist directory of a loaded index is due to be
+        checked for a rebuild.
+
+        Args:
+        - index_id (str): One of the ids in `persist_dirs`.
+
+        Returns:
+        - bool: True if the directory should be checked.
+        """
+        if self.reload_seconds <= 0:
+            return False
+        return time.monotonic() >= self.next_check.get(index_id, 0)
+
+    def reload_if_rebuilt(self, index_id: str) -> None:
+        """
+        Load the index again when its persist directory changed since it
+        was loaded, must be called with the load lock held. The loaded
+        index keeps being used when the new one fails to load.
+
+        Args:
+        - index_id (str): One of the ids in `persist_dirs`.
+
+        Returns:
+        - None
+        """
+        self.next_check[index_id] = time.monotonic() + self.reload_seconds
+        version = self.directory_version(self.persist_dirs[index_id])
+        if version == self.index_stats[index_id]["version"]:
+            return
+        self.logger.info(f"Index {index_id} was rebuilt, reloading it")
+        try:
+            self.indexes[index_id] = self.load_index(index_id)
+        except Exception as e:
+            self.logger.error(f"Failed to reload index {index_id}: {e}")
+
+    def get_bm25_index(self, index_id: str) -> Union[BM25Index, None]:
+        """
+        Get the inverted index persisted with the index with the given id.
+
+        Args:
+        - index_id (str): One of the ids in `persist_dirs`.
+
+        Returns:
+        - Union[BM25Index, None]: The shared inverted index, or None if the
+          index was built without one.
+        """
+        self.get_index(index_id)
+        return self.bm25_indexes.get(index_id)
+
+    def get_retriever(self, index_id: str, similarity_top_k: int = 1) -> BaseRetriever:
+        """
+        Get a retriever over the shared index with the given id.
+
+        The retriever fuses lexical and vector search when the index was
+        built with an inverted index, unless `OLS_HYBRID_RETRIEVAL` is false.
+
+        Args:
+        - index_id (str): One of the ids in `persist_dirs`.
+        - similarity_top_k (int): The number of nodes to retrieve.
+
+        Returns:
+        - BaseRetriever: The retriever.
+        """
+        index = self.get_index(index_id)
+        bm25_index = self.get_bm25_index(index_id)
+        hybrid = os.getenv("OLS_HYBRID_RETRIEVAL", "True").lower() == "true"
+        if bm25_index is None or not hybrid:
+            return index.as_retriever(similarity_top_k=similarity_top_k)
+        return HybridRetriever(
+            index,
+            bm25_index,
+            similarity_top_k=similarity_top_k,
+            alpha=float(
+                os.getenv(
+                    "OLS_HYBRID_RETRIEVAL_ALPHA", constants.HYBRID_RETRIEVAL_ALPHA
+                )
+            ),
+            candidate_top_k=int(
+                os.getenv(
+                    "OLS_HYBRID_RETRIEVAL_CANDIDATES",
+                    constants.HYBRID_RETRIEVAL_CANDIDATES,
+                )
+            ),
+        )
+
+    def load_all(self) -> None:
+        """
+        Load every known index, typically once at application startup.
+
+        Returns:
+        - None
+        """
+        for index_id in self.persist_dirs:
+            self.get_index(index_id)
+
+    def load_index(self, index_id: str) -> BaseIndex:
+        """
+        Load an index from its persist directory and record its load stats.
+
+        The memory allocated by a first load is only measured when
+        `OLS_INDEX_TRACE_MEMORY` is true, `memory_bytes` is None otherwise.
+
+        Args:
+        - index_id (str): One of the ids in `persist_dirs`.
+
+        Returns:
+        - BaseIndex: The loaded index.
+        """
+        if index_id not in self.persist_dirs:
+            raise ValueError(f"Unknown index id: {index_id}")
+        persist_dir = self.persist_dirs[index_id]
+
+        self.logger.info(f"Loading index {index_id} from {persist_dir}")
+
+        # only measure the allocations of a first load, and only when nobody
+        # else is already tracing them, a reload runs alongside requests
+        trace_memory = (
+            self.trace_memory
+            and index_id not in self.indexes
+            and not tracemalloc.is_tracing()
+        )
+        memory_bytes = None
+        if trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+
+        try:
+            vector_store = load_vector_store(persist_dir)
+            storage_context = StorageContext.from_defaults(
+                persist_dir=persist_dir, vector_store=vector_store
+            )
+            index = load_index_from_storage(
+                storage_context=storage_context,
+                index_id=index_id,
+                service_context=get_embed_context(),
+            )
+            if BM25Index.exists(persist_dir):
+                self.bm25_indexes[index_id] = BM25Index.load(persist_dir)
+            else:
+                self.bm25_indexes.pop(index_id, None)
+            if trace_memory:
+                memory_bytes, _ = tracemalloc.get_traced_memory()
+        finally:
+            if trace_memory:
+                tracemalloc.stop()
+        load_time = time.perf_counter() - start
+
+        self.index_stats[index_id] = {
+            "persist_dir": persist_dir,
+            "load_time_seconds": round(load_time, 3),
+            "memory_bytes": memory_bytes,
+            "disk_bytes": self.directory_size(persist_dir),
+            "nodes": len(index.docstore.docs),
+            "vector_store": (
+                constants.MMAP_VECTOR_STORE
+                if vector_store is not None
+                else constants.SIMPLE_VECTOR_STORE
+            ),
+            "bm25_terms": (
+                len(self.bm25_indexes[index_id].terms)
+                if index_id in self.bm25_indexes
+                else None
+            ),
+            "version": self.directory_version(persist_dir),
+        }
+        self.next_check[index_id] = time.monotonic() + self.reload_seconds
+        self.logger.info(f"Loaded index {index_id}: {self.index_stats[index_id]}")
+        return index
+
+    def index_version(self, index_id: str) -> str:
+        """
+        Get the version of the loaded index, which changes whenever the
+        index is reloaded after its persist directory was rebuilt.
+
+        Args:
+        - index_id (str): One of the ids in `persist_dirs`.
+
+        Returns:
+        - str: The index version.
+        """
+        self.get_index(index_id)
+        return self.index_stats[index_id]["version"]
+
+    def stats(self) -> dict:
+        """
+        Report the load time and memory footprint of every loaded index.
+
+        Returns:
+        - dict: Index id mapped to its load statistics.
+        """
+        return {index_id: dict(stats) for index_id, stats in self.index_stats.items()}
+
+    @staticmethod
+    def directory_size(path: str) -> int:
+        """
+        Compute the total size of the files stored under the given directory.
+
+        Args:
+        - path (str): The directory to measure.
+
+        Returns:
+        - int: The size in bytes.
+        """
+        total = 0
+        for root, _, files in os.walk(path):
+            for name in files:
+                total += os.path.getsize(os.path.join(root, name))
+        return total
+
+    @staticmethod
+    def directory_version(path: str) -> str:
+        """
+        Compute a fingerprint of the files stored under the given directory
+        from their names, sizes and modification times.
+
+        Args:
+        - path (str): The directory to fingerprint.
+
+        Returns:
+        - str: The fingerprint as a hex digest.
+        """
+        fingerprint = hashlib.sha256()
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                file_path = os.path.join(root, name)
+                stat = os.stat(file_path)
+                fingerprint.update(
+                    f"{os.path.relpath(file_path, path)}:{stat.st_size}:{stat.st_mtime_ns}\n".encode()
+                )
+        return fingerprint.hexdigest()[:16]
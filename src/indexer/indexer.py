@@ -1,72 +1,240 @@
 import os
+import time
+from typing import Dict, List
 
 import llama_index
 from dotenv import load_dotenv
-from llama_index import ServiceContext, SimpleDirectoryReader, VectorStoreIndex
+from llama_index import ServiceContext, VectorStoreIndex, load_index_from_storage
 from llama_index.embeddings import TextEmbeddingsInference
+from llama_index.schema import BaseNode, MetadataMode
 from llama_index.storage.storage_context import StorageContext
 
 import src.constants as constants
+from src.indexer.manifest import IndexManifest
+from src.indexer.pipeline import embed_nodes, indexer_setting, parse_files
+from src.retrieval.bm25_index import BM25Index
+from src.retrieval.vector_stores import (
+    configure_vector_index,
+    load_vector_store,
+    new_vector_store,
+    remove_vector_store,
+    vector_store_settings,
+)
+
+CHUNK_SIZE = 1024
+
+
+def source_file_hashes(input_dir: str, recursive: bool) -> Dict[str, str]:
+    """
+    Hash the content of every file of the source documentation tree.
+
+    Args:
+    - input_dir (str): The documentation directory.
+    - recursive (bool): Whether to include the subdirectories.
+
+    Returns:
+    - Dict[str, str]: Path relative to `input_dir` mapped to the content hash.
+    """
+    file_hashes = {}
+    for root, dirs, files in os.walk(input_dir):
+        if not recursive:
+            dirs.clear()
+        # hidden files are skipped by SimpleDirectoryReader as well
+        dirs[:] = [d for d in dirs if not d.startswith(".")]
+        for name in files:
+            if name.startswith("."):
+                continue
+            path = os.path.join(root, name)
+            file_hashes[os.path.relpath(path, input_dir)] = IndexManifest.file_hash(
+                path
+            )
+    return file_hashes
+
+
+def build_index(
+    input_dir: str,
+    persist_dir: str,
+    index_id: str,
+    service_context: ServiceContext,
+    recursive: bool = False,
+) -> dict:
+    """
+    Build or incrementally update the index of a documentation tree.
+
+    Files are parsed and chunked in a pool of processes and the chunks are
+    embedded in concurrent batches, see `src.indexer.pipeline`. When the
+    persist directory holds an index built with the same settings,
+    only the new and changed files are parsed, only the chunks whose text
+    was not embedded before are sent to the embedding model, and the nodes
+    of changed and deleted files are dropped. Otherwise the whole tree is
+    indexed from scratch. A `BM25Index` of all the nodes is persisted next
+    to the vectors for lexical retrieval.
+
+    Args:
+    - input_dir (str): The documentation directory.
+    - persist_dir (str): The directory to persist the index to.
+    - index_id (str): The id of the index.
+    - service_context (ServiceContext): Provides the node parser and the embedding model.
+    - recursive (bool): Whether to include the subdirectories of `input_dir`.
+
+    Returns:
+    - dict: Numbers of changed and deleted files and of embedded and reused
+      chunks, the parsing and embedding throughput in chunks/second and
+      the size of the BM25 vocabulary.
+    """
+    start = time.perf_counter()
+    settings = {
+        "embed_model": service_context.embed_model.model_name,
+        "chunk_size": service_context.node_parser.chunk_size,
+        "chunk_overlap": service_context.node_parser.chunk_overlap,
+        **vector_store_settings(),
+    }
+    manifest = IndexManifest.load(persist_dir, settings)
+    file_hashes = source_file_hashes(input_dir, recursive)
+
+    if manifest is None:
+        print(f"Building index {index_id} from scratch")
+        manifest = IndexManifest(settings)
+        if os.path.isdir(persist_dir):
+            # the previous build may have used another vector store format
+            remove_vector_store(persist_dir)
+        storage_context = StorageContext.from_defaults(
+            vector_store=new_vector_store(settings)
+        )
+        index = VectorStoreIndex(
+            [], storage_context=storage_context, service_context=service_context
+        )
+        index.set_index_id(index_id)
+    else:
+        storage_context = StorageContext.from_defaults(
+            persist_dir=persist_dir, vector_store=load_vector_store(persist_dir)
+        )
+        index = load_index_from_storage(
+            storage_context, index_id=index_id, service_context=service_context
+        )
+
+    configure_vector_index(storage_context.vector_store)
+
+    changed = manifest.changed_files(file_hashes)
+    deleted = manifest.deleted_files(file_hashes)
+    parse_start = time.perf_counter()
+    parsed = parse_files(input_dir, changed, service_context.node_parser)
+    parse_seconds = time.perf_counter() - parse_start
 
-llama_index.set_global_handler("simple")
+    # reuse the embedding of every chunk whose text was embedded before,
+    # wherever it was
+    nodes: List[BaseNode] = []
+    chunk_hashes = {}
+    reused = 0
+    for path in changed:
+        for node in parsed[path][1]:
+            chunk_hash = IndexManifest.chunk_hash(
+                node.get_content(metadata_mode=MetadataMode.EMBED)
+            )
+            node_id = manifest.chunks.get(chunk_hash)
+            if node_id is not None:
+                node.embedding = storage_context.vector_store.get(node_id)
+                reused += 1
+            chunk_hashes[node.node_id] = chunk_hash
+            nodes.append(node)
 
-load_dotenv()
+    # drop the nodes of the files that changed or no longer exist
+    for path in changed + deleted:
+        for ref_doc_id in manifest.files.pop(path, {}).get("ref_doc_ids", []):
+            index.delete_ref_doc(ref_doc_id, delete_from_docstore=True)
 
-# Select Model
-## check if we are using remote embeddings via env
-url = os.getenv("TEI_SERVER_URL", "local")
-if url != "local":
-    embed_model = TextEmbeddingsInference(
-        model_name="BAAI/bge-base-en-v1.5",
-        base_url=url,
+    embed_stats = embed_nodes(nodes, service_context.embed_model)
+    index.insert_nodes(nodes)
+
+    for path in changed:
+        manifest.files[path] = {
+            "hash": file_hashes[path],
+            "ref_doc_ids": [document.doc_id for document in parsed[path][0]],
+        }
+    live_node_ids = set(index.index_struct.nodes_dict)
+    manifest.chunks = {
+        chunk_hash: node_id
+        for chunk_hash, node_id in manifest.chunks.items()
+        if node_id in live_node_ids
+    }
+    manifest.chunks.update(
+        {chunk_hash: node_id for node_id, chunk_hash in chunk_hashes.items()}
     )
-else:
-    embed_model = "local:BAAI/bge-base-en"
 
-service_context = ServiceContext.from_defaults(
-    chunk_size=1024, llm=None, embed_model=embed_model
-)
+    # the inverted index is rebuilt from every live node, tokenizing is cheap
+    bm25_start = time.perf_counter()
+    live_nodes = index.docstore.get_nodes(list(index.index_struct.nodes_dict.values()))
+    bm25_index = BM25Index.build(
+        [node.node_id for node in live_nodes],
+        [node.get_content(metadata_mode=MetadataMode.EMBED) for node in live_nodes],
+    )
+    bm25_seconds = time.perf_counter() - bm25_start
 
-print("Using embed model: " + str(service_context.embed_model))
+    storage_context.persist(persist_dir=persist_dir)
+    bm25_index.persist(persist_dir)
+    manifest.save(persist_dir)
 
+    stats = {
+        "changed_files": len(changed),
+        "deleted_files": len(deleted),
+        "reused_chunks": reused,
+        "parse_seconds": round(parse_seconds, 3),
+        "parse_chunks_per_second": (
+            round(len(nodes) / parse_seconds, 1) if parse_seconds else 0
+        ),
+        **embed_stats,
+        "bm25_terms": len(bm25_index.terms),
+        "bm25_seconds": round(bm25_seconds, 3),
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+    print(f"Indexed {index_id}: {stats}")
+    return stats
 
-# Load data
-def filename_fn(filename):
-    return {"file_name": filename}
 
+if __name__ == "__main__":
+    llama_index.set_global_handler("simple")
 
-storage_context = StorageContext.from_defaults()
+    load_dotenv()
 
-# index the summary documents
-# https://gitlab.cee.redhat.com/openshift/lightspeed-rag-documents/-/tree/main/summary-docs?ref_type=heads
-print("Indexing summary documents...")
-summary_documents = SimpleDirectoryReader(
-    "data/summary-docs", file_metadata=filename_fn
-).load_data()
-summary_index = VectorStoreIndex.from_documents(
-    summary_documents,
-    storage_context=storage_context,
-    service_context=service_context,
-    show_progress=True,
-)
-summary_index.set_index_id(constants.SUMMARY_INDEX)
-storage_context.persist(persist_dir=constants.SUMMARY_DOCS_PERSIST_DIR)
-
-# index the product documentation
-# https://gitlab.cee.redhat.com/openshift/lightspeed-rag-documents/-/tree/main/ocp-product-docs-plaintext?ref_type=heads
-print("Indexing product documents...")
-product_documents = SimpleDirectoryReader(
-    input_dir="data/ocp-product-docs-plaintext",
-    recursive=True,
-    file_metadata=filename_fn,
-).load_data()
-product_index = VectorStoreIndex.from_documents(
-    product_documents,
-    storage_context=storage_context,
-    service_context=service_context,
-    show_progress=True,
-)
-product_index.set_index_id(constants.PRODUCT_INDEX)
-storage_context.persist(persist_dir=constants.PRODUCT_DOCS_PERSIST_DIR)
+    # Select Model
+    ## check if we are using remote embeddings via env
+    url = os.getenv("TEI_SERVER_URL", "local")
+    if url != "local":
+        embed_model = TextEmbeddingsInference(
+            model_name="BAAI/bge-base-en-v1.5",
+            base_url=url,
+        )
+    else:
+        embed_model = "local:BAAI/bge-base-en"
+
+    service_context = ServiceContext.from_defaults(
+        chunk_size=CHUNK_SIZE, llm=None, embed_model=embed_model
+    )
+    service_context.embed_model.embed_batch_size = indexer_setting(
+        "INDEXER_EMBED_BATCH_SIZE", constants.INDEXER_EMBED_BATCH_SIZE
+    )
+
+    print("Using embed model: " + str(service_context.embed_model))
+
+    # index the summary documents
+    # https://gitlab.cee.redhat.com/openshift/lightspeed-rag-documents/-/tree/main/summary-docs?ref_type=heads
+    print("Indexing summary documents...")
+    build_index(
+        "data/summary-docs",
+        constants.SUMMARY_DOCS_PERSIST_DIR,
+        constants.SUMMARY_INDEX,
+        service_context,
+    )
+
+    # index the product documentation
+    # https://gitlab.cee.redhat.com/openshift/lightspeed-rag-documents/-/tree/main/ocp-product-docs-plaintext?ref_type=heads
+    print("Indexing product documents...")
+    build_index(
+        "data/ocp-product-docs-plaintext",
+        constants.PRODUCT_DOCS_PERSIST_DIR,
+        constants.PRODUCT_INDEX,
+        service_context,
+        recursive=True,
+    )
 
-print("Done indexing!")
+    print("Done indexing!")
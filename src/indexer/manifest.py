@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+from typing import Dict, List, Union
+
+MANIFEST_FILE_NAME = "manifest.json"
+# bump whenever the way documents are split or hashed changes
+MANIFEST_FORMAT_VERSION = 1
+
+
+class IndexManifest:
+    """
+    Record of what a persisted index was built from.
+
+    For every source file the manifest keeps its content hash and the ids of
+    the documents loaded from it, and for every chunk the hash of the text
+    that was embedded mapped to the id of its node. The indexer uses it to
+    re-embed only the chunks that changed since the previous build.
+    """
+
+    def __init__(self, settings: dict):
+        """
+        Initialize an empty IndexManifest.
+
+        Args:
+        - settings (dict): Settings the embeddings depend on, such as the
+          embedding model and the chunk size.
+        """
+        self.settings = dict(settings, format_version=MANIFEST_FORMAT_VERSION)
+        # relative file path -> {"hash": content hash, "ref_doc_ids": [...]}
+        self.files: Dict[str, dict] = {}
+        # chunk hash -> node id
+        self.chunks: Dict[str, str] = {}
+
+    @classmethod
+    def load(cls, persist_dir: str, settings: dict) -> Union["IndexManifest", None]:
+        """
+        Load the manifest of a persisted index.
+
+        Args:
+        - persist_dir (str): The directory the index was persisted to.
+        - settings (dict): The settings of the build about to run.
+
+        Returns:
+        - Union[IndexManifest, None]: The manifest, or None when there is
+          none or it was written with different settings, in which case the
+          index has to be rebuilt from scratch.
+        """
+        path = os.path.join(persist_dir, MANIFEST_FILE_NAME)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            data = json.load(f)
+
+        manifest = cls(settings)
+        if data.get("settings") != manifest.settings:
+            return None
+        manifest.files = data["files"]
+        manifest.chunks = data["chunks"]
+        return manifest
+
+    def save(self, persist_dir: str) -> None:
+        """
+        Write the manifest next to the persisted index.
+
+        Args:
+        - persist_dir (str): The directory the index was persisted to.
+
+        Returns:
+        - None
+        """
+        data = {"settings": self.settings, "files": self.files, "chunks": self.chunks}
+        with open(os.path.join(persist_dir, MANIFEST_FILE_NAME), "w") as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+
+    def changed_files(self, file_hashes: Dict[str, str]) -> List[str]:
+        """
+        List the files that are new or whose content changed.
+
+        Args:
+        - file_hashes (Dict[str, str]): Relative path of every current source
+          file mapped to its content hash.
+
+        Returns:
+        - List[str]: The relative paths of the new and changed files.
+        """
+        return sorted(
+            path
+            for path, file_hash in file_hashes.items()
+            if self.files.get(path, {}).get("hash") != file_hash
+        )
+
+    def deleted_files(self, file_hashes: Dict[str, str]) -> List[str]:
+        """
+        List the indexed files that no longer exist.
+
+        Args:
+        - file_hashes (Dict[str, str]): Relative path of every current source
+          file mapped to its content hash.
+
+        Returns:
+        - List[str]: The relative paths of the deleted files.
+        """
+        return sorted(path for path in self.files if path not in file_hashes)
+
+    @staticmethod
+    def file_hash(path: str) -> str:
+        """
+        Compute the content hash of a file.
+
+        Args:
+        - path (str): The file to hash.
+
+        Returns:
+        - str: The hash as a hex digest.
+        """
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def chunk_hash(text: str) -> str:
+        """
+        Compute the hash of the text embedded for a chunk.
+
+        Args:
+        - text (str): The chunk text, including the embedded metadata.
+
+        Returns:
+        - str: The hash as a hex digest.
+        """
+        return hashlib.sha256(text.encode()).hexdigest()
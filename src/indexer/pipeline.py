@@ -0,0 +1,137 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+from llama_index import SimpleDirectoryReader
+from llama_index.callbacks import CallbackManager
+from llama_index.embeddings.base import BaseEmbedding
+from llama_index.node_parser import NodeParser
+from llama_index.schema import BaseNode, Document, MetadataMode
+
+from src import constants
+
+
+def filename_fn(filename):
+    return {"file_name": filename}
+
+
+def indexer_setting(name: str, default: int) -> int:
+    """
+    Read an integer indexer setting from the environment.
+
+    Args:
+    - name (str): The environment variable.
+    - default (int): The value used when the variable is not set.
+
+    Returns:
+    - int: The setting, at least 1.
+    """
+    return max(1, int(os.getenv(name, default)))
+
+
+def parse_file(
+    input_dir: str, path: str, node_parser: NodeParser
+) -> Tuple[List[Document], List[BaseNode]]:
+    """
+    Load a source file and split it into chunks.
+
+    Args:
+    - input_dir (str): The documentation directory.
+    - path (str): Path of the file, relative to `input_dir`.
+    - node_parser (NodeParser): The parser splitting documents into chunks.
+
+    Returns:
+    - Tuple[List[Document], List[BaseNode]]: The documents loaded from the
+      file and their chunks.
+    """
+    documents = SimpleDirectoryReader(
+        input_files=[os.path.join(input_dir, path)],
+        file_metadata=filename_fn,
+        filename_as_id=True,
+    ).load_data()
+    # callbacks registered in the parent process are not shared with the workers
+    node_parser = node_parser.copy(update={"callback_manager": CallbackManager([])})
+    return documents, node_parser.get_nodes_from_documents(documents)
+
+
+def parse_files(
+    input_dir: str, paths: List[str], node_parser: NodeParser, workers: int = None
+) -> Dict[str, Tuple[List[Document], List[BaseNode]]]:
+    """
+    Load and chunk source files in a pool of processes.
+
+    Args:
+    - input_dir (str): The documentation directory.
+    - paths (List[str]): Paths of the files, relative to `input_dir`.
+    - node_parser (NodeParser): The parser splitting documents into chunks.
+    - workers (int): Number of processes, INDEXER_WORKERS by default; the
+      files are parsed in this process when it is 1.
+
+    Returns:
+    - Dict[str, Tuple[List[Document], List[BaseNode]]]: The documents and
+      chunks of every file, keyed by its path.
+    """
+    if workers is None:
+        workers = indexer_setting("INDEXER_WORKERS", os.cpu_count() or 1)
+    workers = min(workers, len(paths))
+    if workers <= 1:
+        return {path: parse_file(input_dir, path, node_parser) for path in paths}
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(
+            parse_file,
+            [input_dir] * len(paths),
+            paths,
+            [node_parser] * len(paths),
+            # fewer, larger tasks keep the pickling overhead down
+            chunksize=max(1, len(paths) // (workers * 4)),
+        )
+        return dict(zip(paths, results))
+
+
+def embed_nodes(
+    nodes: List[BaseNode],
+    embed_model: BaseEmbedding,
+    concurrency: int = None,
+) -> dict:
+    """
+    Embed the nodes that have no embedding yet, in batches sent concurrently.
+
+    Args:
+    - nodes (List[BaseNode]): The nodes, updated in place.
+    - embed_model (BaseEmbedding): The embedding model, its
+      `embed_batch_size` is the number of texts per request.
+    - concurrency (int): Batches embedded at the same time,
+      INDEXER_EMBED_CONCURRENCY by default.
+
+    Returns:
+    - dict: Number of embedded chunks, the time it took and the throughput.
+    """
+    if concurrency is None:
+        concurrency = indexer_setting(
+            "INDEXER_EMBED_CONCURRENCY", constants.INDEXER_EMBED_CONCURRENCY
+        )
+
+    pending = [node for node in nodes if node.embedding is None]
+    batch_size = embed_model.embed_batch_size
+    batches = [pending[i : i + batch_size] for i in range(0, len(pending), batch_size)]
+
+    def embed_batch(batch):
+        texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in batch]
+        for node, embedding in zip(batch, embed_model.get_text_embedding_batch(texts)):
+            node.embedding = embedding
+
+    start = time.perf_counter()
+    # the local model releases the GIL while computing and the TEI server
+    # is called over HTTP, so threads are enough to overlap the batches
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        # consume the results so that a failed batch raises here
+        list(pool.map(embed_batch, batches))
+    seconds = time.perf_counter() - start
+
+    return {
+        "embedded_chunks": len(pending),
+        "embed_seconds": round(seconds, 3),
+        "embed_chunks_per_second": round(len(pending) / seconds, 1) if seconds else 0,
+    }
@@ -1,5 +1,6 @@
-import inspect
+import logging
 import os
+import sys
 import warnings
 
 from langchain.callbacks.manager import CallbackManager
@@ -40,10 +41,20 @@ class LLMLoader:
         self.llm = None
         self._set_llm_instance()
 
+    def _debug(self, message, *args):
+        """
+        Logs a debug message prefixed with the name of the calling method.
+
+        The caller is only looked up when debug messages are enabled, and the
+        message is only formatted when it is emitted.
+        """
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(
+                "[%s] " + message, sys._getframe(1).f_code.co_name, *args, stacklevel=2
+            )
+
     def _set_llm_instance(self):
-        self.logger.debug(
-            f"[{inspect.stack()[0][3]}] Loading LLM {str(self.llm_backend)}"
-        )
+        self._debug("Loading LLM %s", self.llm_backend)
         # convert to string to handle None or False definitions
         match str(self.llm_backend):
             case "openai":
@@ -60,7 +71,7 @@ class LLMLoader:
                 self.logger.error(f"ERROR: Unsupported LLM {str(self.llm_backend)}")
 
     def _openai_llm_instance(self):
-        self.logger.debug(f"[{inspect.stack()[0][3]}] Creating OpenAI LLM instance")
+        self._debug("Creating OpenAI LLM instance")
         try:
             from langchain.llms import OpenAI
         except Exception:
@@ -85,10 +96,10 @@ class LLMLoader:
         }
         params.update(self.llm_params)  # override parameters
         self.llm = OpenAI(**params)
-        self.logger.debug(f"[{inspect.stack()[0][3]}] OpenAI LLM instance {self.llm}")
+        self._debug("OpenAI LLM instance %s", self.llm)
 
     def _ollama_llm_instance(self):
-        self.logger.debug(f"[{inspect.stack()[0][3]}] Creating Ollama LLM instance")
+        self._debug("Creating Ollama LLM instance")
         try:
             from langchain.llms import Ollama
         except Exception:
@@ -109,15 +120,13 @@ class LLMLoader:
         }
         params.update(self.llm_params)  # override parameters
         self.llm = Ollama(**params)
-        self.logger.debug(f"[{inspect.stack()[0][3]}] Ollama LLM instance {self.llm}")
+        self._debug("Ollama LLM instance %s", self.llm)
 
     def _tgi_llm_instance(self):
         """
         Note: TGI does not support specifying the model, it is an instance per model.
         """
-        self.logger.debug(
-            f"[{inspect.stack()[0][3]}] Creating Hugging Face TGI LLM instance"
-        )
+        self._debug("Creating Hugging Face TGI LLM instance")
         try:
             from langchain.llms import HuggingFaceTextGenInference
         except Exception:
@@ -140,13 +149,11 @@ class LLMLoader:
         }
         params.update(self.llm_params)  # override parameters
         self.llm = HuggingFaceTextGenInference(**params)
-        self.logger.debug(
-            f"[{inspect.stack()[0][3]}] Hugging Face TGI LLM instance {self.llm}"
-        )
+        self._debug("Hugging Face TGI LLM instance %s", self.llm)
 
     def _bam_llm_instance(self):
         """BAM Research Lab"""
-        self.logger.debug(f"[{inspect.stack()[0][3]}] BAM LLM instance")
+        self._debug("BAM LLM instance")
         try:
             # BAM Research lab
             from genai.credentials import Credentials
@@ -188,10 +195,10 @@ class LLMLoader:
         params = GenerateParams(**bam_params)
 
         self.llm = LangChainInterface(model=model_id, params=params, credentials=creds)
-        self.logger.debug(f"[{inspect.stack()[0][3]}] BAM LLM instance {self.llm}")
+        self._debug("BAM LLM instance %s", self.llm)
 
     def _watson_llm_instance(self):
-        self.logger.debug(f"[{inspect.stack()[0][3]}] Watson LLM instance")
+        self._debug("Watson LLM instance")
         # WatsonX (requires WansonX libraries)
         try:
             from ibm_watson_machine_learning.foundation_models import Model
@@ -242,7 +249,7 @@ class LLMLoader:
             ),
         )
         self.llm = WatsonxLLM(model=llm_model)
-        self.logger.debug(f"[{inspect.stack()[0][3]}] Watson LLM instance {self.llm}")
+        self._debug("Watson LLM instance %s", self.llm)
 
     def status(self):
         import json
@@ -5,8 +5,10 @@ from langchain.chains import LLMChain
 from langchain.prompts import PromptTemplate
 
 from src import constants
+from utils.log_policy import PROMPT, RESPONSE, log_payload
 from utils.logger import Logger
 from utils.model_context import get_watsonx_predictor
+from utils.prompt_budget import PromptBudget
 
 load_dotenv()
 
@@ -34,6 +36,38 @@ class HappyResponseGenerator:
         Returns:
         - str: The generated happy response.
         """
+        llm_chain = self._get_llm_chain(conversation, user_question, **kwargs)
+        response = llm_chain(inputs={"question": user_question})
+        return self._parse_response(conversation, response)
+
+    async def agenerate(self, conversation, user_question, **kwargs):
+        """
+        Asynchronous version of `generate`.
+
+        Args:
+        - conversation (str): The identifier for the conversation or task context.
+        - user_question (str): The question posed by the user.
+        - **kwargs: Additional keyword arguments for customization.
+
+        Returns:
+        - str: The generated happy response.
+        """
+        llm_chain = self._get_llm_chain(conversation, user_question, **kwargs)
+        response = await llm_chain.acall(inputs={"question": user_question})
+        return self._parse_response(conversation, response)
+
+    def _get_llm_chain(self, conversation, user_question, **kwargs):
+        """
+        Builds the LLM chain used to generate the happy response.
+
+        Args:
+        - conversation (str): The identifier for the conversation or task context.
+        - user_question (str): The question posed by the user.
+        - **kwargs: Additional keyword arguments for customization.
+
+        Returns:
+        - LLMChain: The chain to call with the question.
+        """
         model = kwargs.get(
             "model",
             os.getenv("HAPPY_RESPONSE_GENERATOR_MODEL", constants.GRANITE_13B_CHAT_V1),
@@ -48,16 +82,36 @@ class HappyResponseGenerator:
         )
 
         self.logger.info(f"{conversation} using model: {model}")
-        self.logger.info(f"{conversation} user query: {user_question}")
-        query = prompt_instructions.format(question=user_question)
-
-        self.logger.info(f"{conversation} full prompt: {query}")
+        log_payload(self.logger, PROMPT, conversation, "user query", user_question)
+        PromptBudget(model).fit(
+            "happy_response_generator",
+            constants.HAPPY_RESPONSE_GENERATOR_PROMPT_TEMPLATE,
+            question=user_question,
+        )
+        log_payload(
+            self.logger,
+            PROMPT,
+            conversation,
+            "full prompt",
+            lambda: prompt_instructions.format(question=user_question),
+        )
 
         bare_llm = get_watsonx_predictor(model=model, temperature=2)
-        llm_chain = LLMChain(llm=bare_llm, prompt=prompt_instructions, verbose=verbose)
+        return LLMChain(llm=bare_llm, prompt=prompt_instructions, verbose=verbose)
 
-        response = llm_chain(inputs={"question": user_question})
+    def _parse_response(self, conversation, response):
+        """
+        Extracts the happy response from the LLM chain output.
+
+        Args:
+        - conversation (str): The identifier for the conversation or task context.
+        - response (dict): The output of the LLM chain.
 
-        self.logger.info(f"{conversation} happy response: {str(response['text'])}")
+        Returns:
+        - str: The generated happy response.
+        """
+        log_payload(
+            self.logger, RESPONSE, conversation, "happy response", response["text"]
+        )
 
         return str(response["text"])
@@ -0,0 +1,325 @@
+import os
+import re
+import threading
+from typing import List, Tuple, Union
+
+from app.constants import NOYAML, VALID, YAML
+from src import constants
+
+# terms that only make sense in a kubernetes or openshift context
+STRONG_TOPIC_TERMS = frozenset(
+    [
+        "kubernetes",
+        "k8s",
+        "openshift",
+        "ocp",
+        "kubectl",
+        "kubelet",
+        "kubeconfig",
+        "etcd",
+        "deploymentconfig",
+        "statefulset",
+        "statefulsets",
+        "daemonset",
+        "daemonsets",
+        "replicaset",
+        "replicasets",
+        "cronjob",
+        "cronjobs",
+        "configmap",
+        "configmaps",
+        "persistentvolume",
+        "persistentvolumes",
+        "persistentvolumeclaim",
+        "persistentvolumeclaims",
+        "pvc",
+        "pvcs",
+        "storageclass",
+        "networkpolicy",
+        "serviceaccount",
+        "clusterrole",
+        "clusterrolebinding",
+        "rolebinding",
+        "customresourcedefinition",
+        "horizontalpodautoscaler",
+        "verticalpodautoscaler",
+        "clusterautoscaler",
+        "machineset",
+        "machinesets",
+        "machineconfig",
+        "imagestream",
+        "buildconfig",
+        "operatorhub",
+        "kustomize",
+        "minikube",
+        "containerd",
+        "cri-o",
+    ]
+)
+
+# kubernetes resources and tools whose names are also everyday words
+RESOURCE_TOPIC_TERMS = frozenset(
+    [
+        "pod",
+        "pods",
+        "deployment",
+        "deployments",
+        "namespace",
+        "namespaces",
+        "ingress",
+        "rbac",
+        "crd",
+        "crds",
+        "hpa",
+        "vpa",
+        "helm",
+        "olm",
+    ]
+)
+
+# terms that hint at a kubernetes or openshift context but are common elsewhere
+WEAK_TOPIC_TERMS = frozenset(
+    [
+        "cluster",
+        "clusters",
+        "node",
+        "nodes",
+        "container",
+        "containers",
+        "image",
+        "images",
+        "service",
+        "services",
+        "route",
+        "routes",
+        "secret",
+        "secrets",
+        "volume",
+        "volumes",
+        "operator",
+        "operators",
+        "replica",
+        "replicas",
+        "autoscale",
+        "autoscaling",
+        "scale",
+        "scaling",
+        "job",
+        "jobs",
+        "quota",
+        "quotas",
+        "workload",
+        "workloads",
+        "manifest",
+        "manifests",
+        "registry",
+        "taint",
+        "taints",
+        "toleration",
+        "tolerations",
+        "affinity",
+        "liveness",
+        "readiness",
+        "probe",
+        "probes",
+        "rollout",
+        "upgrade",
+        "project",
+        "projects",
+    ]
+)
+
+# requests for something else than help with a cluster, e.g. "write a poem
+# about kubernetes", whatever vocabulary they use
+OFF_TOPIC_TERMS = frozenset(
+    [
+        "poem",
+        "poems",
+        "poetry",
+        "haiku",
+        "limerick",
+        "song",
+        "lyrics",
+        "story",
+        "stories",
+        "joke",
+        "jokes",
+        "essay",
+        "novel",
+        "recipe",
+        "recipes",
+        "pretend",
+        "roleplay",
+    ]
+)
+
+# explicit requests for yaml
+YAML_TERMS = frozenset(["yaml", "yml", "manifest", "manifests"])
+
+# verbs asking for something to be produced
+GENERATION_TERMS = frozenset(
+    ["create", "write", "generate", "give", "make", "produce", "build", "draft"]
+)
+
+# words opening a question that asks for information rather than a resource
+INTERROGATIVE_TERMS = frozenset(
+    [
+        "how",
+        "what",
+        "why",
+        "when",
+        "where",
+        "which",
+        "who",
+        "is",
+        "are",
+        "does",
+        "do",
+        "can",
+        "explain",
+        "describe",
+        "list",
+        "tell",
+    ]
+)
+
+# `oc` is only a strong signal when followed by one of its subcommands
+OC_COMMAND_PATTERN = re.compile(
+    r"\boc\s+(get|create|apply|delete|describe|edit|adm|login|new-app|new-project|"
+    r"rollout|scale|expose|logs|exec|debug|project|patch|set|whoami)\b"
+)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-.][a-z0-9]+)*")
+
+
+class QuestionClassifier:
+    """
+    In-process classifier answering the clear-cut question validation cases.
+
+    The classifier scores keyword and YAML-intent features of the query and
+    only answers when its confidence reaches the configured threshold; the
+    ambiguous queries are left to the LLM based `QuestionValidator`. A single
+    topic term is never enough to accept a query, as "pod" or "helm" are
+    everyday words too: it takes a kubernetes specific term and another topic
+    term, and no off-topic request such as a poem. It never rejects a query
+    as INVALID on its own, since a query without any kubernetes vocabulary
+    can still be a legitimate question.
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        """Implement Singleton pattern with thread safety."""
+        with cls._lock:
+            if not cls._instance:
+                cls._instance = super(QuestionClassifier, cls).__new__(cls)
+                cls._instance.initialize_classifier()
+        return cls._instance
+
+    def initialize_classifier(self):
+        """
+        Initialize the QuestionClassifier and reset its statistics.
+        """
+        self.threshold = float(
+            os.getenv(
+                "OLS_QUESTION_CLASSIFIER_THRESHOLD",
+                constants.QUESTION_CLASSIFIER_CONFIDENCE_THRESHOLD,
+            )
+        )
+        self.classified = 0
+        self.fallbacks = 0
+        self.confidence_total = 0.0
+
+    def classify(self, query: str) -> Tuple[Union[List[str], None], float]:
+        """
+        Classify the query the same way `QuestionValidator` does, if confident.
+
+        Args:
+        - query (str): The question to be classified.
+
+        Returns:
+        - Tuple[Union[List[str], None], float]: The one-word responses (e.g.
+          [VALID, YAML]), or None when the LLM validator must decide, and
+          the confidence of the classification.
+        """
+        text = query.lower()
+        tokens = TOKEN_PATTERN.findall(text)
+        token_set = set(tokens)
+
+        topic_confidence = self._topic_confidence(text, token_set)
+        yaml_result, yaml_confidence = self._yaml_intent(tokens, token_set)
+        confidence = min(topic_confidence, yaml_confidence)
+
+        with self._lock:
+            self.confidence_total += confidence
+            if confidence < self.threshold:
+                self.fallbacks += 1
+                return None, confidence
+            self.classified += 1
+        return [VALID, yaml_result], confidence
+
+    def stats(self) -> dict:
+        """
+        Report how often the classifier answered and how confident it was.
+
+        Returns:
+        - dict: Number of classified queries and fallbacks, the fallback rate
+          and the mean confidence.
+        """
+        with self._lock:
+            total = self.classified + self.fallbacks
+            return {
+                "classified": self.classified,
+                "fallbacks": self.fallbacks,
+                "fallback_rate": self.fallbacks / total if total else 0.0,
+                "mean_confidence": self.confidence_total / total if total else 0.0,
+            }
+
+    @staticmethod
+    def _topic_confidence(text, token_set) -> float:
+        """
+        Estimate how confident we are the query is about kubernetes or openshift.
+        """
+        if token_set & OFF_TOPIC_TERMS:
+            return 0.3
+        strong_terms = len(token_set & STRONG_TOPIC_TERMS)
+        if OC_COMMAND_PATTERN.search(text):
+            strong_terms += 1
+        other_terms = len(token_set & (RESOURCE_TOPIC_TERMS | WEAK_TOPIC_TERMS))
+        if strong_terms >= 2:
+            return 0.95
+        if strong_terms == 1:
+            return 0.9 if other_terms else 0.7
+        if other_terms >= 3:
+            return 0.8
+        if other_terms == 2:
+            return 0.7
+        if other_terms == 1:
+            return 0.6
+        return 0.3
+
+    @staticmethod
+    def _yaml_intent(tokens, token_set) -> Tuple[str, float]:
+        """
+        Estimate whether the query asks for YAML and how confident we are.
+        """
+        words = [word for word in tokens if word != "please"]
+        if not words:
+            return NOYAML, 0.5
+        wants_resource = bool(token_set & GENERATION_TERMS)
+        is_question = words[0] in INTERROGATIVE_TERMS
+
+        if token_set & YAML_TERMS:
+            # "what is a yaml manifest" asks about yaml, not for yaml
+            if is_question and not wants_resource:
+                return NOYAML, 0.5
+            return YAML, 0.95
+        # an imperative such as "create a deployment ..." asks for a resource
+        if words[0] in GENERATION_TERMS and token_set & (
+            STRONG_TOPIC_TERMS | RESOURCE_TOPIC_TERMS
+        ):
+            return YAML, 0.9
+        if is_question and not wants_resource:
+            return NOYAML, 0.9
+        return NOYAML, 0.5
@@ -5,8 +5,11 @@ from langchain.chains import LLMChain
 from langchain.prompts import PromptTemplate
 
 from src import constants
+from src.query_helpers.question_classifier import QuestionClassifier
+from utils.log_policy import PROMPT, log_payload
 from utils.logger import Logger
 from utils.model_context import get_watsonx_predictor
+from utils.prompt_budget import PromptBudget
 
 load_dotenv()
 
@@ -34,6 +37,76 @@ class QuestionValidator:
         Returns:
         - list: A list of one-word responses.
         """
+        fast_response = self._classify_locally(conversation, query)
+        if fast_response is not None:
+            return fast_response
+
+        llm_chain = self._get_llm_chain(conversation, query, **kwargs)
+        response = llm_chain(inputs={"query": query})
+        return self._parse_response(conversation, response)
+
+    async def avalidate_question(self, conversation, query, **kwargs):
+        """
+        Asynchronous version of `validate_question`.
+
+        Args:
+        - conversation (str): The identifier for the conversation or task context.
+        - query (str): The question to be validated.
+        - **kwargs: Additional keyword arguments for customization.
+
+        Returns:
+        - list: A list of one-word responses.
+        """
+        fast_response = self._classify_locally(conversation, query)
+        if fast_response is not None:
+            return fast_response
+
+        llm_chain = self._get_llm_chain(conversation, query, **kwargs)
+        response = await llm_chain.acall(inputs={"query": query})
+        return self._parse_response(conversation, response)
+
+    def _classify_locally(self, conversation, query):
+        """
+        Runs the in-process question classifier, which answers the clear-cut
+        cases without calling the LLM. It can be disabled by setting
+        `OLS_QUESTION_CLASSIFIER` to false.
+
+        Args:
+        - conversation (str): The identifier for the conversation or task context.
+        - query (str): The question to be validated.
+
+        Returns:
+        - Union[list, None]: A list of one-word responses, or None when the
+          question has to be validated by the LLM.
+        """
+        if os.getenv("OLS_QUESTION_CLASSIFIER", "True").lower() != "true":
+            return None
+
+        response, confidence = QuestionClassifier().classify(query)
+        if response is None:
+            self.logger.info(
+                f"{conversation} Local classifier not confident ({confidence}), "
+                "falling back to the LLM"
+            )
+        else:
+            self.logger.info(
+                f"{conversation} Local classifier response: {','.join(response)} "
+                f"(confidence {confidence})"
+            )
+        return response
+
+    def _get_llm_chain(self, conversation, query, **kwargs):
+        """
+        Builds the LLM chain used to validate the question.
+
+        Args:
+        - conversation (str): The identifier for the conversation or task context.
+        - query (str): The question to be validated.
+        - **kwargs: Additional keyword arguments for customization.
+
+        Returns:
+        - LLMChain: The chain to call with the query.
+        """
         model = kwargs.get(
             "model",
             os.getenv(
@@ -57,11 +130,31 @@ class QuestionValidator:
         )
         llm_chain = LLMChain(llm=bare_llm, prompt=prompt_instructions, verbose=verbose)
 
-        task_query = prompt_instructions.format(query=query)
+        PromptBudget(model, max_new_tokens=4).fit(
+            "question_validator",
+            constants.QUESTION_VALIDATOR_PROMPT_TEMPLATE,
+            query=query,
+        )
+        log_payload(
+            self.logger,
+            PROMPT,
+            conversation,
+            "task query",
+            lambda: prompt_instructions.format(query=query),
+        )
+        return llm_chain
 
-        self.logger.info(f"{conversation} task query: {task_query}")
+    def _parse_response(self, conversation, response):
+        """
+        Checks the LLM response and splits it into its one-word parts.
 
-        response = llm_chain(inputs={"query": query})
+        Args:
+        - conversation (str): The identifier for the conversation or task context.
+        - response (dict): The output of the LLM chain.
+
+        Returns:
+        - list: A list of one-word responses.
+        """
         clean_response = str(response["text"]).strip()
 
         self.logger.info(f"{conversation} response: {clean_response}")
@@ -2,10 +2,11 @@ import os
 
 import llama_index
 from dotenv import load_dotenv
-from llama_index import StorageContext, load_index_from_storage
 from llama_index.prompts import PromptTemplate
 
 from src import constants
+from src.docs.index_registry import IndexRegistry
+from utils.log_policy import RESPONSE, log_payload
 from utils.logger import Logger
 from utils.model_context import get_watsonx_context
 
@@ -55,18 +56,12 @@ class TaskBreakdown:
         self.logger.info(f"{conversation} using model: {model}")
         service_context = get_watsonx_context(model=model)
 
-        storage_context = StorageContext.from_defaults(
-            persist_dir=constants.SUMMARY_DOCS_PERSIST_DIR
-        )
-        self.logger.info(f"{conversation} Setting up index")
-        index = load_index_from_storage(
-            storage_context=storage_context,
-            index_id=constants.SUMMARY_INDEX,
-            service_context=service_context,
-        )
+        self.logger.info(f"{conversation} Getting shared index")
+        index = IndexRegistry().get_index(constants.SUMMARY_INDEX)
 
         self.logger.info(f"{conversation} Setting up query engine")
         query_engine = index.as_query_engine(
+            service_context=service_context,
             text_qa_template=summary_task_breakdown_template,
             verbose=verbose,
             streaming=False,
@@ -83,8 +78,13 @@ class TaskBreakdown:
             ]
         )
 
-        for line in str(task_breakdown_response).splitlines():
-            self.logger.info(f"{conversation} Task breakdown response: {line}")
+        log_payload(
+            self.logger,
+            RESPONSE,
+            conversation,
+            "Task breakdown response",
+            lambda: str(task_breakdown_response),
+        )
 
         for line in referenced_documents.splitlines():
             self.logger.info(f"{conversation} Referenced documents: {line}")
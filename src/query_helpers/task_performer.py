@@ -3,6 +3,7 @@ import os
 from dotenv import load_dotenv
 
 from src import constants
+from utils.log_policy import RESPONSE, log_payload
 from utils.logger import Logger
 
 load_dotenv()
@@ -54,5 +55,5 @@ spec:
   scaleDown:
     enabled: true
 """
-        self.logger.info(f"{conversation} response: {response}")
+        log_payload(self.logger, RESPONSE, conversation, "response", response)
         return response
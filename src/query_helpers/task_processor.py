@@ -1,15 +1,20 @@
 import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
 
 from dotenv import load_dotenv
 from langchain.chains import LLMChain
 from langchain.prompts import PromptTemplate
 
-from query_helpers.yes_no_classifier import YesNoClassifier
 from src import constants
 from src.query_helpers.task_performer import TaskPerformer
 from src.query_helpers.task_rephraser import TaskRephraser
+from src.query_helpers.yes_no_classifier import YesNoClassifier
+from utils.log_policy import PROMPT, RESPONSE, log_payload
 from utils.logger import Logger
 from utils.model_context import get_watsonx_predictor
+from utils.prompt_budget import PromptBudget
 
 load_dotenv()
 
@@ -17,6 +22,21 @@ load_dotenv()
 class TaskProcessor:
     """
     Class responsible for processing a list of tasks based on the provided input.
+
+    Every task takes several LLM round trips, so the tasks run concurrently
+    on a pool of `OLS_TASK_WORKERS` threads. The LLM is first asked whether
+    each task can be completed; clear answers are classified by the local
+    yes/no rules and the others in a single batch once all are known. The
+    tasks are then rephrased and performed, a task waiting for the tasks it
+    depends on (the `dependencies` keyword argument). Dependencies only
+    order the tasks: the output of a task is not passed to the tasks
+    depending on it. The outputs keep the order of the task list, and as
+    soon as a task cannot be completed the later tasks not started yet are
+    dropped and the running ones stop before their next LLM call; the
+    earlier tasks are still checked, as the earliest failure is reported.
+
+    The endpoints do not process tasks yet: nothing in the app calls
+    `process_tasks`.
     """
 
     def __init__(self):
@@ -33,7 +53,10 @@ class TaskProcessor:
         - conversation (str): The identifier for the conversation or task context.
         - tasklist (list): A list of tasks to be processed.
         - original_query (str): The original query or information related to the tasks.
-        - **kwargs: Additional keyword arguments for customization.
+        - **kwargs: Additional keyword arguments for customization, among them
+          `dependencies` (dict), the index of a task mapped to the indexes of
+          the tasks it needs to wait for; tasks are independent by default.
+          A task does not get the outputs of the tasks it waits for.
 
         Returns:
         - list: A list containing the response status and outputs.
@@ -42,6 +65,12 @@ class TaskProcessor:
             "model", os.getenv("TASK_PROCESSOR_MODEL", constants.GRANITE_13B_CHAT_V1)
         )
         verbose = kwargs.get("verbose", "").lower() == "true"
+        dependencies = {
+            index: set(after)
+            for index, after in kwargs.get("dependencies", {}).items()
+            if after
+        }
+        self.check_dependencies(len(tasklist), dependencies)
 
         settings_string = f"conversation: {conversation}, tasklist: {tasklist}, query: {original_query}, model: {model}, verbose: {verbose}"
         self.logger.info(f"{conversation} call settings: {settings_string}")
@@ -51,53 +80,266 @@ class TaskProcessor:
         )
 
         self.logger.info(f"{conversation} Beginning task processing")
-        outputs = []
 
         self.logger.info(f"{conversation} using model: {model}")
         bare_llm = get_watsonx_predictor(model=model, min_new_tokens=5)
         llm_chain = LLMChain(llm=bare_llm, prompt=prompt_instructions, verbose=verbose)
 
-        for task in tasklist:
-            self.logger.info(f"{conversation} task: {task}")
+        # ask whether every task can be completed, stopping the tasks after
+        # the first task the local yes/no rules see cannot be, then classify
+        # the other answers with as few LLM calls as possible
+        checks = self.run_tasks(
+            conversation,
+            len(tasklist),
+            {},
+            partial(
+                self.check_task,
+                conversation,
+                model,
+                llm_chain,
+                tasklist,
+                original_query,
+            ),
+        )
+        # the tasks after a failure were not all checked, and do not matter
+        first_failure = min(
+            (i for i, check in checks.items() if check[0] not in (None, 1)),
+            default=len(tasklist),
+        )
+        undecided = [
+            i for i in sorted(checks) if checks[i][0] is None and i < first_failure
+        ]
+        if undecided:
+            statuses = YesNoClassifier().classify_batch(
+                conversation, [checks[i][1] for i in undecided]
+            )
+            for i, status in zip(undecided, statuses):
+                self.logger.info(f"{conversation} response status: {str(status)}")
+                checks[i] = [status, checks[i][1]]
 
-            task_query = prompt_instructions.format(task=task, query=original_query)
-            self.logger.info(f"{conversation} task query: {task_query}")
+        # report the failure of the earliest task, as a sequential run would
+        for index in sorted(checks):
+            status, clean_response = checks[index]
+            if status is not None and status != 1:
+                return self.failure(
+                    conversation, status, tasklist[index], clean_response
+                )
+
+        results = self.run_tasks(
+            conversation,
+            len(tasklist),
+            dependencies,
+            partial(self.perform_task, conversation, checks, original_query),
+        )
 
-            response = llm_chain(inputs={"task": task, "query": original_query})
-            self.logger.info(f"{conversation} task response: {str(response)}")
+        outputs = [results[index][1] for index in range(len(tasklist))]
+        log_payload(self.logger, RESPONSE, conversation, "outputs", outputs)
+        return [1, outputs]
 
-            clean_response = response["text"].split("")[0]
+    def run_tasks(self, conversation, tasks, dependencies, process):
+        """
+        Runs a stage of every task on a bounded pool of threads, a task
+        starting once the tasks it depends on are processed. Once a task
+        failed, the later tasks are not started and the running ones are
+        aborted, while the earlier tasks go on.
+
+        Args:
+        - conversation (str): The identifier for the conversation or task context.
+        - tasks (int): The number of tasks.
+        - dependencies (dict): The index of a task mapped to the set of the
+          indexes of the tasks it waits for.
+        - process (callable): Runs the stage of the task of the given index,
+          given the index and a `threading.Event` set when the task is
+          aborted; returns the response status, None if not known yet, and
+          the output of the task, or None when it was aborted.
+
+        Returns:
+        - dict: The index of every processed task mapped to its response
+          status and output, aborted tasks are left out.
+        """
+        workers = max(
+            1, int(os.getenv("OLS_TASK_WORKERS", constants.TASK_PROCESSOR_WORKERS))
+        )
+        aborts = {index: threading.Event() for index in range(tasks)}
+        first_failure = tasks
+        results = {}
+        pending = list(range(tasks))
+        running = {}
+
+        with ThreadPoolExecutor(
+            max_workers=max(1, min(workers, tasks)),
+            thread_name_prefix="ols-task",
+        ) as executor:
+            while pending or running:
+                # only hand the executor as many tasks as it has workers, so
+                # that an abort drops the tasks which have not started
+                ready = [
+                    index
+                    for index in pending
+                    if not dependencies.get(index, set()) - results.keys()
+                ][: workers - len(running)]
+                for index in ready:
+                    pending.remove(index)
+                    running[executor.submit(process, index, aborts[index])] = index
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception:
+                        # stop the other tasks before the error propagates
+                        for abort in aborts.values():
+                            abort.set()
+                        raise
+                    if result is None:
+                        continue
+                    results[index] = result
+                    if result[0] not in (None, 1) and index < first_failure:
+                        first_failure = index
+                        pending = [i for i in pending if i < first_failure]
+                        for i in range(first_failure + 1, tasks):
+                            aborts[i].set()
+                        self.logger.info(
+                            f"{conversation} Aborting the tasks after task "
+                            f"{index}, {len(pending) + len(running)} tasks "
+                            "outstanding"
+                        )
+        return results
+
+    def check_task(
+        self, conversation, model, llm_chain, tasklist, original_query, index, abort
+    ):
+        """
+        Asks whether the query tells enough to complete a task.
+
+        Args:
+        - conversation (str): The identifier for the conversation or task context.
+        - model (str): The model the task prompt is sent to.
+        - llm_chain (LLMChain): The chain asking whether the task can be completed.
+        - tasklist (list): A list of tasks to be processed.
+        - original_query (str): The original query or information related to the task.
+        - index (int): The index of the task to check.
+        - abort (threading.Event): Set when the task is aborted.
+
+        Returns:
+        - Union[list, None]: The response status, None when the local yes/no
+          rules cannot tell it, and the answer of the LLM, or None when the
+          task was aborted.
+        """
+        task = tasklist[index]
+        self.logger.info(f"{conversation} task: {task}")
+
+        PromptBudget(model).fit(
+            "task_processor",
+            constants.TASK_PERFORMER_PROMPT_TEMPLATE,
+            task=task,
+            query=original_query,
+        )
+        log_payload(
+            self.logger,
+            PROMPT,
+            conversation,
+            "task query",
+            lambda: constants.TASK_PERFORMER_PROMPT_TEMPLATE.format(
+                task=task, query=original_query
+            ),
+        )
+
+        response = llm_chain(inputs={"task": task, "query": original_query})
+        log_payload(
+            self.logger, RESPONSE, conversation, "task response", response["text"]
+        )
+        if abort.is_set():
+            return None
 
-            yes_no_classifier = YesNoClassifier()
-            response_status = int(
-                yes_no_classifier.classify(conversation, clean_response)
+        clean_response = response["text"].strip()
+        response_status = YesNoClassifier().classify_locally(
+            conversation, clean_response
+        )
+        return [response_status, clean_response]
+
+    def perform_task(self, conversation, checks, original_query, index, abort):
+        """
+        Rephrases a task that can be completed with the query and performs it.
+
+        Args:
+        - conversation (str): The identifier for the conversation or task context.
+        - checks (dict): The index of every task mapped to its response status
+          and the answer of the LLM on whether it can be completed.
+        - original_query (str): The original query or information related to the task.
+        - index (int): The index of the task to perform.
+        - abort (threading.Event): Set when the task is aborted, it then
+          stops before its next LLM call.
+
+        Returns:
+        - Union[list, None]: The response status and the output of the task,
+          or None when the task was aborted.
+        """
+        task_rephraser = TaskRephraser()
+        rephrased_task = task_rephraser.rephrase_task(
+            conversation, checks[index][1], original_query
+        )
+        if abort.is_set():
+            return None
+
+        task_performer = TaskPerformer()
+        return [1, task_performer.perform_task(conversation, rephrased_task)]
+
+    def failure(self, conversation, response_status, task, clean_response):
+        """
+        Builds the response for a task that cannot be completed.
+
+        Args:
+        - conversation (str): The identifier for the conversation or task context.
+        - response_status (int): The classification of the answer of the LLM.
+        - task (str): The task.
+        - clean_response (str): The answer of the LLM on whether the task can
+          be completed.
+
+        Returns:
+        - list: A list containing the response status and the message.
+        """
+        if response_status == 0:
+            self.logger.info(
+                f"{conversation} Aborting task processing for no response - need details"
             )
-            self.logger.info(f"{conversation} response status: {str(response_status)}")
+            resolution_request = f"In trying to answer your question, we were unable to determine how to proceed. The step we failed on was the following:\n {task}\n The failure message was:\n {clean_response}\n Please try rephrasing your request to include information that might help complete the task."
+            self.logger.info(f"{conversation} resolution request: {resolution_request}")
+            return [response_status, resolution_request]
 
-            if response_status == 0:
-                self.logger.info(
-                    f"{conversation} Aborting task processing for no response - need details"
-                )
-                resolution_request = f"In trying to answer your question, we were unable to determine how to proceed. The step we failed on was the following:\n {task}\n The failure message was:\n {clean_response}\n Please try rephrasing your request to include information that might help complete the task."
-                self.logger.info(
-                    f"{conversation} resolution request: {resolution_request}"
-                )
-                return [response_status, resolution_request]
-            elif response_status == 1:
-                task_rephraser = TaskRephraser()
-                rephrased_task = task_rephraser.rephrase_task(
-                    conversation, clean_response, original_query
-                )
+        self.logger.info(f"{conversation} Unknown response status")
+        return [response_status, "Unknown error occurred"]
 
-                task_performer = TaskPerformer()
-                outputs.append(
-                    task_performer.perform_task(
-                        conversation, rephrased_task, original_query
-                    )
-                )
-                self.logger.info(f"{conversation} current outputs: {str(outputs)}")
-            else:
-                self.logger.info(f"{conversation} Unknown response status")
-                return [response_status, "Unknown error occurred"]
+    @staticmethod
+    def check_dependencies(tasks, dependencies):
+        """
+        Checks that the dependencies between the tasks can be satisfied.
 
-        return [1, outputs]
+        Args:
+        - tasks (int): The number of tasks.
+        - dependencies (dict): The index of a task mapped to the set of the
+          indexes of the tasks it waits for.
+
+        Returns:
+        - None
+
+        Raises:
+        - ValueError: When a dependency refers to an unknown task or the
+          dependencies form a cycle.
+        """
+        for index, after in dependencies.items():
+            unknown = [i for i in [index, *after] if not 0 <= i < tasks]
+            if unknown:
+                raise ValueError(f"Dependencies refer to unknown tasks: {unknown}")
+
+        done = set()
+        remaining = set(range(tasks))
+        while remaining:
+            ready = {i for i in remaining if dependencies.get(i, set()) <= done}
+            if not ready:
+                raise ValueError(
+                    f"Dependencies between tasks {sorted(remaining)} form a cycle"
+                )
+            done |= ready
+            remaining -= ready
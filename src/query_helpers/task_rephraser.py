@@ -5,8 +5,10 @@ from langchain.chains import LLMChain
 from langchain.prompts import PromptTemplate
 
 from src import constants
+from utils.log_policy import PROMPT, RESPONSE, log_payload
 from utils.logger import Logger
 from utils.model_context import get_watsonx_predictor
+from utils.prompt_budget import PromptBudget
 
 load_dotenv()
 
@@ -53,11 +55,21 @@ class TaskRephraser:
         bare_llm = get_watsonx_predictor(model=model, min_new_tokens=5)
         llm_chain = LLMChain(llm=bare_llm, prompt=prompt_instructions, verbose=verbose)
 
-        task_query = prompt_instructions.format(task=task, query=original_query)
-
-        self.logger.info(f"{conversation} task query: {task_query}")
+        PromptBudget(model).fit(
+            "task_rephraser",
+            constants.TASK_REPHRASER_PROMPT_TEMPLATE,
+            task=task,
+            query=original_query,
+        )
+        log_payload(
+            self.logger,
+            PROMPT,
+            conversation,
+            "task query",
+            lambda: prompt_instructions.format(task=task, query=original_query),
+        )
 
         response = llm_chain(inputs={"task": task, "query": original_query})
 
-        self.logger.info(f"{conversation} response: {str(response)}")
+        log_payload(self.logger, RESPONSE, conversation, "response", response["text"])
         return response["text"]
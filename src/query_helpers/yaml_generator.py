@@ -5,8 +5,11 @@ from langchain.chains import LLMChain
 from langchain.prompts import PromptTemplate
 
 from src import constants
+from utils.log_policy import PROMPT, RESPONSE, log_payload
 from utils.logger import Logger
 from utils.model_context import get_watsonx_predictor
+from utils.prompt_budget import KEEP_END, PromptBudget
+from utils.stage_executor import iterate_blocking
 
 load_dotenv()
 
@@ -35,6 +38,91 @@ class YamlGenerator:
         Returns:
         - str: The generated YAML response.
         """
+        llm_chain, inputs = self._get_llm_chain(
+            conversation_id, query, history, **kwargs
+        )
+        response = llm_chain(inputs=inputs)
+        log_payload(
+            self.logger, RESPONSE, conversation_id, "response", response["text"]
+        )
+        return response["text"]
+
+    async def agenerate_yaml(self, conversation_id, query, history=None, **kwargs):
+        """
+        Asynchronous version of `generate_yaml`.
+
+        Args:
+        - conversation_id (str): The identifier for the conversation or task context.
+        - query (str): The user request.
+        - history (str): The history of the conversation (if available).
+        - **kwargs: Additional keyword arguments for customization.
+
+        Returns:
+        - str: The generated YAML response.
+        """
+        llm_chain, inputs = self._get_llm_chain(
+            conversation_id, query, history, **kwargs
+        )
+        response = await llm_chain.acall(inputs=inputs)
+        log_payload(
+            self.logger, RESPONSE, conversation_id, "response", response["text"]
+        )
+        return response["text"]
+
+    def stream_yaml(self, conversation_id, query, history=None, **kwargs):
+        """
+        Generates YAML response to a user request, producing it as it is generated.
+
+        Args:
+        - conversation_id (str): The identifier for the conversation or task context.
+        - query (str): The user request.
+        - history (str): The history of the conversation (if available).
+        - **kwargs: Additional keyword arguments for customization.
+
+        Returns:
+        - Iterator[str]: The chunks of the generated YAML response.
+        """
+        llm_chain, inputs = self._get_llm_chain(
+            conversation_id, query, history, **kwargs
+        )
+        prompt = llm_chain.prompt.format(
+            **{name: inputs[name] for name in llm_chain.prompt.input_variables}
+        )
+        return llm_chain.llm.stream(prompt)
+
+    def astream_yaml(self, conversation_id, query, history=None, **kwargs):
+        """
+        Asynchronous version of `stream_yaml`, run on the shared executor.
+
+        Args:
+        - conversation_id (str): The identifier for the conversation or task context.
+        - query (str): The user request.
+        - history (str): The history of the conversation (if available).
+        - **kwargs: Additional keyword arguments for customization.
+
+        Returns:
+        - AsyncIterator[str]: The chunks of the generated YAML response.
+        """
+        return iterate_blocking(
+            self.stream_yaml(conversation_id, query, history, **kwargs)
+        )
+
+    def _get_llm_chain(self, conversation_id, query, history=None, **kwargs):
+        """
+        Builds the LLM chain used to generate the YAML response.
+
+        The oldest turns of the history are dropped when the prompt would
+        not fit the context window of the model, see `PromptBudget`.
+
+        Args:
+        - conversation_id (str): The identifier for the conversation or task context.
+        - query (str): The user request.
+        - history (str): The history of the conversation (if available).
+        - **kwargs: Additional keyword arguments for customization.
+
+        Returns:
+        - Tuple[LLMChain, dict]: The chain and the inputs to call it with.
+        """
         model = kwargs.get(
             "model", os.getenv("YAML_MODEL", constants.GRANITE_20B_CODE_INSTRUCT_V1)
         )
@@ -44,19 +132,33 @@ class YamlGenerator:
         self.logger.info(f"{conversation_id} using model: {model}")
         bare_llm = get_watsonx_predictor(model=model)
 
+        budget = PromptBudget(model)
         if history:
+            inputs = budget.fit(
+                "yaml_generator",
+                constants.YAML_GENERATOR_WITH_HISTORY_PROMPT_TEMPLATE,
+                truncatable={"history": KEEP_END},
+                query=query,
+                history=history,
+            )
+            if inputs["history"] != history:
+                self.logger.info(f"{conversation_id} history truncated to fit {model}")
             prompt_instructions = PromptTemplate.from_template(
                 constants.YAML_GENERATOR_WITH_HISTORY_PROMPT_TEMPLATE
             )
-            task_query = prompt_instructions.format(query=query, history=history)
         else:
+            inputs = budget.fit(
+                "yaml_generator", constants.YAML_GENERATOR_PROMPT_TEMPLATE, query=query
+            )
             prompt_instructions = PromptTemplate.from_template(
                 constants.YAML_GENERATOR_PROMPT_TEMPLATE
             )
-            task_query = prompt_instructions.format(query=query)
-
-        self.logger.info(f"{conversation_id} task query: {task_query}")
+        log_payload(
+            self.logger,
+            PROMPT,
+            conversation_id,
+            "task query",
+            lambda: prompt_instructions.format(**inputs),
+        )
         llm_chain = LLMChain(llm=bare_llm, verbose=verbose, prompt=prompt_instructions)
-        response = llm_chain(inputs={"query": query, "history": history})
-        self.logger.info(f"{conversation_id} response:\n{response['text']}")
-        return response["text"]
+        return llm_chain, inputs
@@ -1,19 +1,68 @@
 import os
+import re
+from typing import List, Union
 
 from dotenv import load_dotenv
 from langchain.chains import LLMChain
 from langchain.prompts import PromptTemplate
 
 from src import constants
+from utils.log_policy import PROMPT, RESPONSE, log_payload
 from utils.logger import Logger
 from utils.model_context import get_watsonx_predictor
+from utils.prompt_budget import PromptBudget
 
 load_dotenv()
 
+# first words of a statement answering yes
+AFFIRMATIVE_TERMS = frozenset(
+    [
+        "yes",
+        "yeah",
+        "yep",
+        "sure",
+        "certainly",
+        "absolutely",
+        "definitely",
+        "correct",
+        "indeed",
+        "affirmative",
+    ]
+)
+
+# a statement opening with a no on its own, e.g. "No, ..." or "Nope.", as
+# opposed to "No additional information is needed" or "No problem"
+NEGATIVE_PATTERN = re.compile(r"^(no|nope|nah|negative)\s*([,.!;:-]|$)")
+
+# a yes followed by one of these, e.g. "Certainly not.", may be a no
+NEGATION_PATTERN = re.compile(r"\b(not|never|no|none|nothing|neither|nor)\b|n't\b")
+
+# a yes or no qualified by one of these needs the LLM to be understood
+HEDGE_PATTERN = re.compile(
+    r"\b(but|however|although|though|not enough|insufficient|missing|unclear|"
+    r"cannot|can't|unable|partially)\b"
+)
+
+# statements saying the information is not sufficient, without a yes or no
+INSUFFICIENT_PATTERN = re.compile(
+    r"^(the (above )?query|it|there) (does not|doesn't|do not|is not|isn't) "
+    r"(contain|provide|include|have|give|enough)"
+)
+
+WORD_PATTERN = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+# "<number>: <result>" lines of a batched classification
+BATCH_RESPONSE_PATTERN = re.compile(r"^\s*(\d+)\s*[:.)-]\s*([019])\b", re.MULTILINE)
+
 
 class YesNoClassifier:
     """
     This class is responsible for classifying a statement as yes, no, or undetermined.
+
+    Statements opening with a clear yes or no are classified by local rules,
+    without an LLM call; the rules can be disabled by setting
+    `OLS_YES_NO_RULES` to false. `classify_batch` asks the LLM about up to
+    `OLS_YES_NO_BATCH_SIZE` of the other statements in a single prompt.
     """
 
     def __init__(self):
@@ -34,6 +83,10 @@ class YesNoClassifier:
         Returns:
         - int: The classification result (1 for yes, 0 for no, 9 for undetermined).
         """
+        local_response = self.classify_locally(conversation, statement)
+        if local_response is not None:
+            return local_response
+
         model = kwargs.get(
             "model", os.getenv("YESNO_MODEL", constants.GRANITE_13B_CHAT_V1)
         )
@@ -48,20 +101,161 @@ class YesNoClassifier:
 
         self.logger.info(f"{conversation} using model: {model}")
         self.logger.info(f"{conversation} determining yes/no: {statement}")
-        query = prompt_instructions.format(statement=statement)
-
-        self.logger.info(f"{conversation} yes/no query: {query}")
+        PromptBudget(model, max_new_tokens=2).fit(
+            "yes_no_classifier",
+            constants.YES_OR_NO_CLASSIFIER_PROMPT_TEMPLATE,
+            statement=statement,
+        )
+        log_payload(
+            self.logger,
+            PROMPT,
+            conversation,
+            "yes/no query",
+            lambda: prompt_instructions.format(statement=statement),
+        )
         self.logger.info(f"{conversation} using model: {model}")
 
-        bare_llm = get_watsonx_predictor(model=model)
+        # the answer is a single digit
+        bare_llm = get_watsonx_predictor(model=model, max_new_tokens=2)
         llm_chain = LLMChain(llm=bare_llm, prompt=prompt_instructions, verbose=verbose)
 
         response = llm_chain(inputs={"statement": statement})
 
-        self.logger.info(f"{conversation} bare response: {response}")
-        self.logger.info(f"{conversation} yes/no response: {response['text']}")
+        log_payload(
+            self.logger, RESPONSE, conversation, "yes/no response", response["text"]
+        )
 
-        if response["text"] not in ["0", "1", "9"]:
+        clean_response = str(response["text"]).strip()
+        if clean_response not in ["0", "1", "9"]:
             raise ValueError("Returned response not 0, 1, or 9")
 
-        return int(response["text"])
+        return int(clean_response)
+
+    def classify_batch(self, conversation, statements, **kwargs) -> List[int]:
+        """
+        Classifies several statements as yes, no, or undetermined, asking the
+        LLM about the statements the local rules cannot classify in batches.
+
+        Args:
+        - conversation (str): The identifier for the conversation or task context.
+        - statements (list): The statements to be classified.
+        - **kwargs: Additional keyword arguments for customization.
+
+        Returns:
+        - List[int]: The classification result of every statement, in order
+          (1 for yes, 0 for no, 9 for undetermined).
+        """
+        results = [self.classify_locally(conversation, s) for s in statements]
+        remaining = [i for i, result in enumerate(results) if result is None]
+
+        batch_size = max(
+            1, int(os.getenv("OLS_YES_NO_BATCH_SIZE", constants.YES_NO_BATCH_SIZE))
+        )
+        for start in range(0, len(remaining), batch_size):
+            batch = remaining[start : start + batch_size]
+            if len(batch) == 1:
+                results[batch[0]] = self.classify(
+                    conversation, statements[batch[0]], **kwargs
+                )
+                continue
+            batch_results = self._classify_llm_batch(
+                conversation, [statements[i] for i in batch], batch_size, **kwargs
+            )
+            for i, result in zip(batch, batch_results):
+                # statements the LLM skipped are asked about on their own
+                results[i] = (
+                    result
+                    if result is not None
+                    else self.classify(conversation, statements[i], **kwargs)
+                )
+        return results
+
+    def _classify_llm_batch(
+        self, conversation, statements, batch_size, **kwargs
+    ) -> List[Union[int, None]]:
+        """
+        Asks the LLM to classify several statements in a single prompt.
+
+        Args:
+        - conversation (str): The identifier for the conversation or task context.
+        - statements (list): The statements to be classified.
+        - batch_size (int): The largest number of statements of a prompt.
+        - **kwargs: Additional keyword arguments for customization.
+
+        Returns:
+        - List[Union[int, None]]: The classification result of every
+          statement, None for the statements missing from the response.
+        """
+        model = kwargs.get(
+            "model", os.getenv("YESNO_MODEL", constants.GRANITE_13B_CHAT_V1)
+        )
+        verbose = kwargs.get("verbose", "").lower() == "true"
+
+        self.logger.info(
+            f"{conversation} determining yes/no of {len(statements)} statements"
+        )
+        numbered = "\n".join(
+            f"{i}. {' '.join(statement.split())}"
+            for i, statement in enumerate(statements, start=1)
+        )
+
+        # an answer line such as "10: 1" takes up to about 6 tokens
+        max_new_tokens = 6 * batch_size
+        PromptBudget(model, max_new_tokens=max_new_tokens).fit(
+            "yes_no_classifier",
+            constants.YES_OR_NO_BATCH_CLASSIFIER_PROMPT_TEMPLATE,
+            statements=numbered,
+        )
+        prompt_instructions = PromptTemplate.from_template(
+            constants.YES_OR_NO_BATCH_CLASSIFIER_PROMPT_TEMPLATE
+        )
+        bare_llm = get_watsonx_predictor(model=model, max_new_tokens=max_new_tokens)
+        llm_chain = LLMChain(llm=bare_llm, prompt=prompt_instructions, verbose=verbose)
+
+        response = llm_chain(inputs={"statements": numbered})
+        log_payload(
+            self.logger,
+            RESPONSE,
+            conversation,
+            "yes/no batch response",
+            response["text"],
+        )
+
+        answers = {
+            int(number): int(result)
+            for number, result in BATCH_RESPONSE_PATTERN.findall(str(response["text"]))
+        }
+        return [answers.get(i) for i in range(1, len(statements) + 1)]
+
+    def classify_locally(self, conversation, statement) -> Union[int, None]:
+        """
+        Classifies a statement opening with a clear yes or no.
+
+        Args:
+        - conversation (str): The identifier for the conversation or task context.
+        - statement (str): The statement to be classified.
+
+        Returns:
+        - Union[int, None]: 1 for yes, 0 for no, or None when the statement
+          has to be classified by the LLM.
+        """
+        if os.getenv("OLS_YES_NO_RULES", "True").lower() != "true":
+            return None
+
+        text = " ".join(statement.lower().split())
+        words = WORD_PATTERN.findall(text)
+        result = None
+        if not words:
+            pass
+        elif HEDGE_PATTERN.search(text):
+            pass
+        elif words[0] in AFFIRMATIVE_TERMS and not NEGATION_PATTERN.search(text):
+            result = 1
+        elif NEGATIVE_PATTERN.match(text):
+            result = 0
+        elif INSUFFICIENT_PATTERN.match(text):
+            result = 0
+
+        if result is not None:
+            self.logger.info(f"{conversation} yes/no rules response: {result}")
+        return result
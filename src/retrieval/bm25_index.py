@@ -0,0 +1,256 @@
+import json
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+BM25_FILE_NAME = "bm25.npz"
+BM25_TERMS_FILE_NAME = "bm25_terms.json"
+# words too common to tell chunks apart
+STOP_WORDS = frozenset(
+    """a an and are as at be by can do does for from how i in is it its me my
+    of on or that the this to was what when where which who why will with you
+    your""".split()
+)
+# words, numbers and compounds such as cluster-autoscaler, apps/v1 or 4.14
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[._/-][a-z0-9]+)*")
+COMPOUND_SEPARATORS = re.compile(r"[._/-]")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split a text into the terms indexed and searched by `BM25Index`.
+
+    Terms are lowercased. Compound tokens such as CRD kinds, flag names and
+    versions are kept whole, so they match exactly, and their parts are
+    added as well.
+
+    Args:
+    - text (str): The text.
+
+    Returns:
+    - List[str]: The terms, in order, with repetitions.
+    """
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOP_WORDS:
+            continue
+        terms.append(token)
+        if not token.isalnum():
+            terms.extend(
+                part
+                for part in COMPOUND_SEPARATORS.split(token)
+                if part not in STOP_WORDS
+            )
+    return terms
+
+
+class BM25Index:
+    """
+    Inverted index scoring chunks with BM25, for lexical retrieval.
+
+    The postings are stored in compressed sparse row layout: the chunk
+    positions and term frequencies of all terms in two flat arrays, and the
+    offset of every term in them. Loading the index reads a few numpy
+    arrays and the sorted term list, and scoring a query only touches the
+    postings of its terms.
+    """
+
+    def __init__(
+        self,
+        terms: List[str],
+        offsets: np.ndarray,
+        positions: np.ndarray,
+        frequencies: np.ndarray,
+        lengths: np.ndarray,
+        node_ids: List[str],
+        k1: float = 1.2,
+        b: float = 0.75,
+    ):
+        """
+        Initialize the BM25Index.
+
+        Args:
+        - terms (List[str]): The sorted vocabulary.
+        - offsets (np.ndarray): Where the postings of every term start,
+          followed by the total number of postings.
+        - positions (np.ndarray): The chunk position of every posting.
+        - frequencies (np.ndarray): The term frequency of every posting.
+        - lengths (np.ndarray): The number of terms of every chunk.
+        - node_ids (List[str]): The node id of every chunk.
+        - k1 (float): BM25 term frequency saturation.
+        - b (float): BM25 length normalization.
+        """
+        self.terms = terms
+        self.term_ids = {term: i for i, term in enumerate(terms)}
+        self.offsets = offsets
+        self.positions = positions
+        self.frequencies = frequencies
+        self.lengths = lengths
+        self.node_ids = node_ids
+        self.k1 = k1
+        self.b = b
+        self.average_length = float(lengths.mean()) if len(lengths) else 0.0
+
+    @classmethod
+    def build(
+        cls, node_ids: List[str], texts: List[str], k1: float = 1.2, b: float = 0.75
+    ) -> "BM25Index":
+        """
+        Index the given chunks.
+
+        Args:
+        - node_ids (List[str]): The node id of every chunk.
+        - texts (List[str]): The text of every chunk.
+        - k1 (float): BM25 term frequency saturation.
+        - b (float): BM25 length normalization.
+
+        Returns:
+        - BM25Index: The index.
+        """
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        lengths = np.zeros(len(texts), dtype=np.int32)
+        for position, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            lengths[position] = sum(counts.values())
+            for term, frequency in counts.items():
+                postings.setdefault(term, []).append((position, frequency))
+
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(postings[term]) for term in terms])
+        positions = np.fromiter(
+            (p for term in terms for p, _ in postings[term]),
+            dtype=np.int32,
+            count=offsets[-1],
+        )
+        frequencies = np.fromiter(
+            (
+                min(f, np.iinfo(np.uint16).max)
+                for term in terms
+                for _, f in postings[term]
+            ),
+            dtype=np.uint16,
+            count=offsets[-1],
+        )
+        return cls(
+            terms, offsets, positions, frequencies, lengths, list(node_ids), k1, b
+        )
+
+    @classmethod
+    def load(cls, persist_dir: str) -> "BM25Index":
+        """
+        Load a persisted index.
+
+        Args:
+        - persist_dir (str): The directory the index was persisted to.
+
+        Returns:
+        - BM25Index: The index.
+        """
+        with open(os.path.join(persist_dir, BM25_TERMS_FILE_NAME)) as f:
+            ids = json.load(f)
+        with np.load(os.path.join(persist_dir, BM25_FILE_NAME)) as data:
+            return cls(
+                ids["terms"],
+                data["offsets"],
+                data["positions"],
+                data["frequencies"],
+                data["lengths"],
+                ids["node_ids"],
+                float(data["k1"]),
+                float(data["b"]),
+            )
+
+    @staticmethod
+    def exists(persist_dir: str) -> bool:
+        """
+        Check whether an index was persisted to the given directory.
+
+        Args:
+        - persist_dir (str): The directory to check.
+
+        Returns:
+        - bool: True if the directory holds a persisted BM25Index.
+        """
+        return os.path.exists(os.path.join(persist_dir, BM25_FILE_NAME))
+
+    def persist(self, persist_dir: str) -> None:
+        """
+        Write the index to the given directory.
+
+        Args:
+        - persist_dir (str): The directory to persist to.
+
+        Returns:
+        - None
+        """
+        os.makedirs(persist_dir, exist_ok=True)
+        path = os.path.join(persist_dir, BM25_FILE_NAME)
+        with open(path + ".tmp", "wb") as f:
+            np.savez(
+                f,
+                offsets=self.offsets,
+                positions=self.positions,
+                frequencies=self.frequencies,
+                lengths=self.lengths,
+                k1=self.k1,
+                b=self.b,
+            )
+        os.replace(path + ".tmp", path)
+
+        terms_path = os.path.join(persist_dir, BM25_TERMS_FILE_NAME)
+        with open(terms_path + ".tmp", "w") as f:
+            json.dump({"terms": self.terms, "node_ids": self.node_ids}, f)
+        os.replace(terms_path + ".tmp", terms_path)
+
+    def scores(self, query: str) -> np.ndarray:
+        """
+        Compute the BM25 score of every chunk for the query.
+
+        Args:
+        - query (str): The query text.
+
+        Returns:
+        - np.ndarray: One float32 score per chunk, 0 for chunks sharing no
+          term with the query.
+        """
+        scores = np.zeros(len(self.node_ids), dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self.term_ids.get(term)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            positions = self.positions[start:end]
+            frequencies = self.frequencies[start:end].astype(np.float32)
+            df = end - start
+            idf = math.log(1 + (len(self.node_ids) - df + 0.5) / (df + 0.5))
+            norms = self.k1 * (
+                1 - self.b + self.b * self.lengths[positions] / self.average_length
+            )
+            scores[positions] += (
+                idf * frequencies * (self.k1 + 1) / (frequencies + norms)
+            )
+        return scores
+
+    def search(self, query: str, top_k: int) -> List[Tuple[str, float]]:
+        """
+        Find the chunks matching the query best.
+
+        Args:
+        - query (str): The query text.
+        - top_k (int): The maximum number of chunks to return.
+
+        Returns:
+        - List[Tuple[str, float]]: The node ids and BM25 scores of the
+          matching chunks, best first.
+        """
+        scores = self.scores(query)
+        matching = np.flatnonzero(scores)
+        if top_k < len(matching):
+            matching = matching[np.argpartition(-scores[matching], top_k - 1)[:top_k]]
+        matching = matching[np.argsort(-scores[matching], kind="stable")]
+        return [(self.node_ids[i], float(scores[i])) for i in matching]
@@ -0,0 +1,97 @@
+from typing import Dict, List
+
+from llama_index.indices.vector_store import VectorStoreIndex
+from llama_index.retrievers import BaseRetriever
+from llama_index.schema import NodeWithScore, QueryBundle
+
+from src.retrieval.bm25_index import BM25Index
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Retriever fusing lexical (BM25) and vector search.
+
+    Dense retrieval can miss chunks that only match on exact tokens such as
+    CRD kinds, flag names or `oc` subcommands. Both searches return their
+    `candidate_top_k` best chunks, the scores of each search are scaled to
+    [0, 1] over its candidates and the chunks are ranked by the weighted
+    sum `alpha * vector + (1 - alpha) * lexical`, a chunk missing from one
+    search scoring 0 in it.
+    """
+
+    def __init__(
+        self,
+        index: VectorStoreIndex,
+        bm25_index: BM25Index,
+        similarity_top_k: int = 1,
+        alpha: float = 0.5,
+        candidate_top_k: int = 20,
+    ):
+        """
+        Initialize the HybridRetriever.
+
+        Args:
+        - index (VectorStoreIndex): The vector index, which also holds the nodes.
+        - bm25_index (BM25Index): The inverted index of the same nodes.
+        - similarity_top_k (int): The number of nodes to retrieve.
+        - alpha (float): The weight of the vector scores, 1 - alpha is the
+          weight of the lexical scores.
+        - candidate_top_k (int): The number of nodes each search returns.
+        """
+        self.docstore = index.docstore
+        self.bm25_index = bm25_index
+        self.similarity_top_k = similarity_top_k
+        self.alpha = alpha
+        self.candidate_top_k = max(candidate_top_k, similarity_top_k)
+        self.vector_retriever = index.as_retriever(
+            similarity_top_k=self.candidate_top_k
+        )
+        super().__init__(callback_manager=index.service_context.callback_manager)
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        vector_results = self.vector_retriever.retrieve(query_bundle)
+        lexical_results = self.bm25_index.search(
+            query_bundle.query_str, self.candidate_top_k
+        )
+
+        nodes = {result.node.node_id: result.node for result in vector_results}
+        vector_scores = self.scaled(
+            {result.node.node_id: result.score or 0.0 for result in vector_results}
+        )
+        lexical_scores = self.scaled(dict(lexical_results))
+        fused = {
+            node_id: self.alpha * vector_scores.get(node_id, 0.0)
+            + (1 - self.alpha) * lexical_scores.get(node_id, 0.0)
+            for node_id in {**vector_scores, **lexical_scores}
+        }
+        top = sorted(fused, key=fused.get, reverse=True)[: self.similarity_top_k]
+
+        missing = [node_id for node_id in top if node_id not in nodes]
+        if missing:
+            nodes.update(
+                {node.node_id: node for node in self.docstore.get_nodes(missing)}
+            )
+        return [
+            NodeWithScore(node=nodes[node_id], score=fused[node_id]) for node_id in top
+        ]
+
+    @staticmethod
+    def scaled(scores: Dict[str, float]) -> Dict[str, float]:
+        """
+        Min-max scale scores to [0, 1], so scores of different searches add up.
+
+        Args:
+        - scores (Dict[str, float]): Node id mapped to its score.
+
+        Returns:
+        - Dict[str, float]: Node id mapped to its scaled score, 1 for every
+          node when all the scores are equal.
+        """
+        if not scores:
+            return {}
+        low, high = min(scores.values()), max(scores.values())
+        if high == low:
+            return dict.fromkeys(scores, 1.0)
+        return {
+            node_id: (score - low) / (high - low) for node_id, score in scores.items()
+        }
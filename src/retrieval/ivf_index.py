@@ -0,0 +1,176 @@
+import math
+import os
+
+import numpy as np
+
+IVF_FILE_NAME = "ivf.npz"
+# rows scored against the centroids at a time when assigning them to lists
+ASSIGN_BLOCK_ROWS = 65536
+# rows sampled per list to train the centroids
+TRAINING_ROWS_PER_LIST = 256
+
+
+class IVFIndex:
+    """
+    Inverted file index over normalized vectors, for approximate search.
+
+    The vectors are clustered into `nlist` lists with spherical k-means. A
+    search only scores the vectors of the `nprobe` lists whose centroids
+    are the most similar to the query: a larger `nprobe` gives a better
+    recall at the cost of a higher latency, and `nprobe == nlist` is an
+    exact search. The index only stores the centroids and the row
+    positions of every list, the vectors stay in the vector store.
+    """
+
+    def __init__(self, centroids: np.ndarray, order: np.ndarray, offsets: np.ndarray):
+        """
+        Initialize the IVFIndex.
+
+        Args:
+        - centroids (np.ndarray): The normalized centroid of every list.
+        - order (np.ndarray): The row positions, grouped by list.
+        - offsets (np.ndarray): Where every list starts in `order`, followed
+          by the total number of rows.
+        """
+        self.centroids = centroids
+        self.order = order
+        self.offsets = offsets
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @staticmethod
+    def default_nlist(rows: int) -> int:
+        """
+        Get the usual number of lists for the given number of vectors.
+
+        Args:
+        - rows (int): The number of vectors.
+
+        Returns:
+        - int: About four times the square root of the number of vectors.
+        """
+        return max(1, min(rows, round(4 * math.sqrt(rows))))
+
+    @classmethod
+    def build(
+        cls, vectors: np.ndarray, nlist: int = 0, iterations: int = 10, seed: int = 0
+    ) -> "IVFIndex":
+        """
+        Cluster the vectors into lists.
+
+        Args:
+        - vectors (np.ndarray): The normalized vectors, one per row.
+        - nlist (int): The number of lists, `default_nlist` if 0.
+        - iterations (int): The number of k-means iterations.
+        - seed (int): Seed of the sampling, for reproducible builds.
+
+        Returns:
+        - IVFIndex: The index.
+        """
+        rows = len(vectors)
+        nlist = min(nlist or cls.default_nlist(rows), rows)
+        rng = np.random.default_rng(seed)
+
+        sample_size = min(rows, nlist * TRAINING_ROWS_PER_LIST)
+        sample = np.asarray(
+            vectors[np.sort(rng.choice(rows, sample_size, replace=False))],
+            dtype=np.float32,
+        )
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)]
+        for _ in range(iterations):
+            labels = cls._assign(sample, centroids)
+            order = np.argsort(labels, kind="stable")
+            counts = np.bincount(labels, minlength=nlist)
+            filled = counts > 0
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+            sums = np.empty_like(centroids)
+            sums[filled] = np.add.reduceat(sample[order], starts[filled], axis=0)
+            # restart the empty lists from random sample rows
+            sums[~filled] = sample[rng.choice(sample_size, int((~filled).sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = sums / np.where(norms == 0, 1, norms)
+
+        labels = cls._assign(vectors, centroids)
+        order = np.argsort(labels, kind="stable").astype(np.int64)
+        offsets = np.searchsorted(labels[order], np.arange(nlist + 1))
+        return cls(centroids, order, offsets.astype(np.int64))
+
+    @classmethod
+    def load(cls, persist_dir: str) -> "IVFIndex":
+        """
+        Load a persisted index.
+
+        Args:
+        - persist_dir (str): The directory the index was persisted to.
+
+        Returns:
+        - IVFIndex: The index.
+        """
+        with np.load(os.path.join(persist_dir, IVF_FILE_NAME)) as data:
+            return cls(data["centroids"], data["order"], data["offsets"])
+
+    @staticmethod
+    def exists(persist_dir: str) -> bool:
+        """
+        Check whether an index was persisted to the given directory.
+
+        Args:
+        - persist_dir (str): The directory to check.
+
+        Returns:
+        - bool: True if the directory holds a persisted IVFIndex.
+        """
+        return os.path.exists(os.path.join(persist_dir, IVF_FILE_NAME))
+
+    def persist(self, persist_dir: str) -> None:
+        """
+        Write the index to the given directory.
+
+        Args:
+        - persist_dir (str): The directory to persist to.
+
+        Returns:
+        - None
+        """
+        path = os.path.join(persist_dir, IVF_FILE_NAME)
+        with open(path + ".tmp", "wb") as f:
+            np.savez(
+                f, centroids=self.centroids, order=self.order, offsets=self.offsets
+            )
+        os.replace(path + ".tmp", path)
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        """
+        Get the row positions of the lists closest to the query.
+
+        Args:
+        - query (np.ndarray): The normalized query.
+        - nprobe (int): The number of lists to search.
+
+        Returns:
+        - np.ndarray: The row positions to score.
+        """
+        nprobe = max(1, min(nprobe, self.nlist))
+        scores = self.centroids @ query
+        probes = np.argpartition(-scores, nprobe - 1)[:nprobe]
+        return np.concatenate(
+            [self.order[self.offsets[p] : self.offsets[p + 1]] for p in probes]
+        )
+
+    @staticmethod
+    def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        """
+        Get the list of the most similar centroid for every vector.
+        """
+        return np.concatenate(
+            [
+                np.argmax(
+                    np.asarray(vectors[i : i + ASSIGN_BLOCK_ROWS], np.float32)
+                    @ centroids.T,
+                    axis=1,
+                )
+                for i in range(0, len(vectors), ASSIGN_BLOCK_ROWS)
+            ]
+        )
@@ -0,0 +1,330 @@
+import json
+import os
+from typing import Any, List, Union
+
+import numpy as np
+from llama_index.schema import BaseNode
+from llama_index.vector_stores.types import (
+    VectorStore,
+    VectorStoreQuery,
+    VectorStoreQueryResult,
+)
+
+from src import constants
+from src.retrieval.ivf_index import IVF_FILE_NAME, IVFIndex
+
+VECTORS_FILE_NAME = "vectors.npy"
+VECTOR_IDS_FILE_NAME = "vector_ids.json"
+# rows converted to float32 at a time when scoring a float16 matrix
+SCORE_BLOCK_ROWS = 65536
+
+
+class MmapVectorStore(VectorStore):
+    """
+    Vector store keeping the embeddings in one contiguous matrix.
+
+    The matrix is persisted as a numpy `.npy` file of float32 or float16
+    rows, next to a JSON table of the node and document ids of every row,
+    and is memory-mapped when loaded: opening the store does not parse or
+    copy the vectors, the pages are read on demand by the first queries.
+    The rows are normalized when added, so the cosine similarity of a query
+    against every node is a single matrix-vector product.
+
+    Like `SimpleVectorStore` it does not store the node texts, they stay in
+    the docstore. Adding or deleting nodes materializes the matrix in memory
+    until it is persisted again.
+
+    When the store is persisted with `nlist` set, an `IVFIndex` is built
+    over the vectors and queries only score the vectors of the `nprobe`
+    closest lists. Exact search is used when there is no (up to date) IVF
+    index, when `nprobe` covers every list and when `exact=True` is passed
+    to `query`.
+    """
+
+    stores_text: bool = False
+    is_embedding_query: bool = True
+
+    def __init__(
+        self,
+        vectors: Union[np.ndarray, None] = None,
+        node_ids: Union[List[str], None] = None,
+        ref_doc_ids: Union[List[str], None] = None,
+        dtype: str = "float32",
+    ):
+        """
+        Initialize the MmapVectorStore.
+
+        Args:
+        - vectors (np.ndarray): The normalized embeddings, one row per node.
+        - node_ids (List[str]): The node id of every row.
+        - ref_doc_ids (List[str]): The id of the document of every row.
+        - dtype (str): "float32" or "float16", the type the vectors are stored as.
+        """
+        self.dtype = np.dtype(vectors.dtype if vectors is not None else dtype)
+        if self.dtype not in (np.float32, np.float16):
+            raise ValueError(f"Unsupported vector store dtype: {self.dtype}")
+        self.vectors = vectors
+        self.node_ids = list(node_ids or [])
+        self.ref_doc_ids = list(ref_doc_ids or [])
+        self.positions = {node_id: i for i, node_id in enumerate(self.node_ids)}
+        self.ivf_index = None
+        # number of IVF lists to build when persisting, 0 to pick it from
+        # the number of vectors and None not to build an IVF index
+        self.nlist = None
+        self.nprobe = constants.IVF_NPROBE
+        # score every vector even when there is an IVF index
+        self.exact = False
+
+    @classmethod
+    def from_persist_dir(cls, persist_dir: str) -> "MmapVectorStore":
+        """
+        Open a persisted store, memory-mapping its vectors.
+
+        Args:
+        - persist_dir (str): The directory the store was persisted to.
+
+        Returns:
+        - MmapVectorStore: The store.
+        """
+        vectors = np.load(os.path.join(persist_dir, VECTORS_FILE_NAME), mmap_mode="r")
+        with open(os.path.join(persist_dir, VECTOR_IDS_FILE_NAME)) as f:
+            ids = json.load(f)
+        if not len(vectors):
+            # an empty store has no dimension, the first added rows set it
+            store = cls(None, dtype=vectors.dtype)
+        else:
+            store = cls(vectors, ids["node_ids"], ids["ref_doc_ids"])
+        if IVFIndex.exists(persist_dir):
+            store.ivf_index = IVFIndex.load(persist_dir)
+        return store
+
+    @staticmethod
+    def exists(persist_dir: str) -> bool:
+        """
+        Check whether a store was persisted to the given directory.
+
+        Args:
+        - persist_dir (str): The directory to check.
+
+        Returns:
+        - bool: True if the directory holds a persisted MmapVectorStore.
+        """
+        return os.path.exists(os.path.join(persist_dir, VECTORS_FILE_NAME))
+
+    @property
+    def client(self) -> Any:
+        return None
+
+    def add(self, nodes: List[BaseNode], **add_kwargs: Any) -> List[str]:
+        """
+        Add the embeddings of the given nodes.
+
+        Args:
+        - nodes (List[BaseNode]): The embedded nodes.
+
+        Returns:
+        - List[str]: The ids of the added nodes.
+        """
+        if not nodes:
+            return []
+        rows = self.normalize_rows([node.get_embedding() for node in nodes]).astype(
+            self.dtype
+        )
+        if self.vectors is None or not len(self.vectors):
+            self.vectors = rows
+        else:
+            self.vectors = np.vstack([self.vectors, rows])
+
+        # the IVF index no longer covers every vector until it is rebuilt
+        self.ivf_index = None
+        for node in nodes:
+            self.positions[node.node_id] = len(self.node_ids)
+            self.node_ids.append(node.node_id)
+            self.ref_doc_ids.append(node.ref_doc_id)
+        return [node.node_id for node in nodes]
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        """
+        Delete the embeddings of the nodes of the given document.
+
+        Args:
+        - ref_doc_id (str): The id of the document.
+
+        Returns:
+        - None
+        """
+        keep = np.array([doc_id != ref_doc_id for doc_id in self.ref_doc_ids], bool)
+        if keep.all():
+            return
+        self.vectors = np.ascontiguousarray(self.vectors[keep])
+        self.ivf_index = None
+        self.node_ids = [n for n, kept in zip(self.node_ids, keep) if kept]
+        self.ref_doc_ids = [d for d, kept in zip(self.ref_doc_ids, keep) if kept]
+        self.positions = {node_id: i for i, node_id in enumerate(self.node_ids)}
+
+    def get(self, node_id: str) -> List[float]:
+        """
+        Get the stored, normalized embedding of a node.
+
+        Args:
+        - node_id (str): The id of the node.
+
+        Returns:
+        - List[float]: The embedding.
+        """
+        return self.vectors[self.positions[node_id]].astype(np.float32).tolist()
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        """
+        Find the nodes most similar to the query embedding.
+
+        Args:
+        - query (VectorStoreQuery): The query, with its embedding and top k;
+          it can be restricted to a list of node ids.
+        - exact (bool): Score every vector even when there is an IVF index,
+          defaults to the `exact` attribute.
+
+        Returns:
+        - VectorStoreQueryResult: The ids of the most similar nodes and
+          their cosine similarities, most similar first.
+        """
+        if query.filters is not None:
+            raise ValueError("Metadata filters are not supported by MmapVectorStore")
+        if self.vectors is None or not self.node_ids:
+            return VectorStoreQueryResult(nodes=None, similarities=[], ids=[])
+
+        query_vector = self.normalize(query.query_embedding)
+        candidates = None
+        if query.node_ids is not None:
+            candidates = np.array(
+                [self.positions[n] for n in query.node_ids if n in self.positions],
+                dtype=np.int64,
+            )
+        elif self.approximate(kwargs.get("exact", self.exact)):
+            candidates = self.ivf_index.candidates(query_vector, self.nprobe)
+        scores = self.scores(query_vector, candidates)
+
+        top = self.top_k(scores, query.similarity_top_k)
+        positions = top if candidates is None else candidates[top]
+        return VectorStoreQueryResult(
+            nodes=None,
+            similarities=scores[top].tolist(),
+            ids=[self.node_ids[i] for i in positions],
+        )
+
+    def approximate(self, exact: bool = False) -> bool:
+        """
+        Check whether queries are answered from the IVF index.
+
+        Args:
+        - exact (bool): Whether an exact search was requested.
+
+        Returns:
+        - bool: True if only the vectors of the probed lists are scored.
+        """
+        return (
+            not exact
+            and self.ivf_index is not None
+            and self.nprobe < self.ivf_index.nlist
+        )
+
+    def scores(
+        self, query: np.ndarray, positions: Union[np.ndarray, None] = None
+    ) -> np.ndarray:
+        """
+        Compute the cosine similarity of the query with the stored vectors.
+
+        Args:
+        - query (np.ndarray): The normalized query embedding.
+        - positions (np.ndarray): The rows to score, all if None.
+
+        Returns:
+        - np.ndarray: One float32 similarity per scored row.
+        """
+        vectors = self.vectors if positions is None else self.vectors[positions]
+        if self.dtype == np.float32:
+            return vectors @ query
+        # numpy has no fast float16 product, convert bounded blocks instead
+        return np.concatenate(
+            [
+                vectors[i : i + SCORE_BLOCK_ROWS].astype(np.float32) @ query
+                for i in range(0, len(vectors), SCORE_BLOCK_ROWS)
+            ]
+        )
+
+    @staticmethod
+    def normalize_rows(embeddings) -> np.ndarray:
+        """
+        Scale every row of a matrix of embeddings to unit length.
+        """
+        rows = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(rows, axis=1, keepdims=True)
+        return rows / np.where(norms == 0, 1, norms)
+
+    @staticmethod
+    def normalize(embedding: List[float]) -> np.ndarray:
+        """
+        Scale an embedding to unit length so a dot product is a cosine similarity.
+        """
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    @staticmethod
+    def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+        """
+        Get the positions of the k highest scores, highest first.
+
+        Args:
+        - scores (np.ndarray): The scores.
+        - k (int): The number of positions to return.
+
+        Returns:
+        - np.ndarray: The positions.
+        """
+        k = min(k, len(scores))
+        if k <= 0:
+            return np.array([], dtype=np.int64)
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top], kind="stable")]
+
+    def persist(self, persist_path: str, fs: Any = None) -> None:
+        """
+        Write the store to the directory of the given path.
+
+        The storage context passes the path of the JSON file the default
+        vector store would be written to, only its directory is used.
+
+        Args:
+        - persist_path (str): A path in the directory to persist to.
+
+        The IVF index is rebuilt when it is out of date and `nlist` is set,
+        and removed when `nlist` is None.
+
+        Returns:
+        - None
+        """
+        persist_dir = os.path.dirname(persist_path)
+        os.makedirs(persist_dir, exist_ok=True)
+        vectors = self.vectors
+        if vectors is None:
+            vectors = np.zeros((0, 0), dtype=self.dtype)
+
+        # write next to the files and rename, the current ones may be mapped
+        vectors_path = os.path.join(persist_dir, VECTORS_FILE_NAME)
+        with open(vectors_path + ".tmp", "wb") as f:
+            np.save(f, np.ascontiguousarray(vectors))
+        os.replace(vectors_path + ".tmp", vectors_path)
+
+        ids_path = os.path.join(persist_dir, VECTOR_IDS_FILE_NAME)
+        with open(ids_path + ".tmp", "w") as f:
+            json.dump({"node_ids": self.node_ids, "ref_doc_ids": self.ref_doc_ids}, f)
+        os.replace(ids_path + ".tmp", ids_path)
+
+        ivf_path = os.path.join(persist_dir, IVF_FILE_NAME)
+        if self.nlist is not None and len(vectors):
+            if self.ivf_index is None or self.nlist not in (0, self.ivf_index.nlist):
+                self.ivf_index = IVFIndex.build(vectors, self.nlist)
+            self.ivf_index.persist(persist_dir)
+        elif os.path.exists(ivf_path):
+            os.remove(ivf_path)
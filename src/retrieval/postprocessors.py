@@ -0,0 +1,270 @@
+import os
+import re
+import threading
+from typing import List, Optional, Tuple
+
+from llama_index.postprocessor import SentenceTransformerRerank
+from llama_index.postprocessor.types import BaseNodePostprocessor
+from llama_index.schema import MetadataMode, NodeWithScore, QueryBundle
+
+from src import constants
+from src.cache.cache import estimate_tokens
+from src.retrieval.bm25_index import tokenize
+
+# sentence ends within a paragraph
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+
+# fenced code blocks, e.g. YAML or shell examples, kept or dropped whole
+CODE_BLOCK = re.compile(
+    r"^[ \t]*(```|~~~).*?^[ \t]*\1[^\n]*$", re.MULTILINE | re.DOTALL
+)
+
+# markdown headings and list items, kept or dropped whole
+HEADING = re.compile(r"\s*#{1,6}\s")
+LINE_UNIT = re.compile(r"\s*(#{1,6}|[-*+]|\d+[.)])\s")
+
+NON_BLANK_LINE = re.compile(r"[^\n]*\S[^\n]*")
+
+# cross-encoders loaded so far, by model name and number of nodes kept
+rerankers = {}
+rerankers_lock = threading.Lock()
+
+
+class SentenceCompressor(BaseNodePostprocessor):
+    """
+    Node postprocessor trimming the retrieved nodes to the sentences
+    relevant to the query, within a token budget shared by all the nodes.
+
+    The text of a node is split into units: fenced code blocks, markdown
+    headings and list items are units of their own, kept whole, and the
+    paragraphs are split into sentences. A unit is relevant when it shares
+    terms with the query, and the units sharing the most terms are kept
+    first, the nodes being visited in rank order. The heading of a section
+    with kept units is kept too, budget permitting. The kept units stay in
+    document order, separated by the line breaks separating them in the
+    document. When no unit of the best node shares a term with the query,
+    e.g. for a paraphrased question, its leading units are kept instead.
+    Nodes left without units are dropped.
+    """
+
+    max_tokens: int = constants.CONTEXT_MAX_TOKENS
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "SentenceCompressor"
+
+    def _postprocess_nodes(
+        self,
+        nodes: List[NodeWithScore],
+        query_bundle: Optional[QueryBundle] = None,
+    ) -> List[NodeWithScore]:
+        if query_bundle is None:
+            return nodes
+        query_terms = set(tokenize(query_bundle.query_str))
+
+        budget = self.max_tokens
+        compressed = []
+        for rank, node in enumerate(nodes):
+            text = node.node.get_content(MetadataMode.NONE)
+            spans = self.units(text)
+            units = [text[start:end] for start, end in spans]
+            overlaps = [len(query_terms.intersection(tokenize(u))) for u in units]
+            candidates = [i for i, overlap in enumerate(overlaps) if overlap]
+            if not candidates and rank == 0:
+                candidates = list(range(len(units)))
+
+            kept = set()
+            for i in sorted(candidates, key=lambda i: -overlaps[i]):
+                tokens = estimate_tokens(units[i])
+                if tokens <= budget:
+                    kept.add(i)
+                    budget -= tokens
+            for i in self.section_headings(units, kept):
+                tokens = estimate_tokens(units[i])
+                if tokens <= budget:
+                    kept.add(i)
+                    budget -= tokens
+            if not kept:
+                continue
+
+            # never modify the node, it belongs to the shared docstore
+            trimmed = node.node.copy()
+            trimmed.set_content(self.join(text, spans, sorted(kept)))
+            compressed.append(NodeWithScore(node=trimmed, score=node.score))
+        return compressed
+
+    @staticmethod
+    def units(text: str) -> List[Tuple[int, int]]:
+        """
+        Split a text into the units kept or dropped by the compressor: fenced
+        code blocks, markdown headings, list items, and the sentences of the
+        other paragraphs.
+
+        Args:
+        - text (str): The text.
+
+        Returns:
+        - List[Tuple[int, int]]: The start and end of the non-blank units in
+          the text, stripped, in order.
+        """
+        spans = []
+        position = 0
+        for block in CODE_BLOCK.finditer(text):
+            spans.extend(prose_units(text, position, block.start()))
+            spans.append(strip_span(text, block.start(), block.end()))
+            position = block.end()
+        spans.extend(prose_units(text, position, len(text)))
+        return spans
+
+    @staticmethod
+    def section_headings(units: List[str], kept: set) -> List[int]:
+        """
+        Find the headings of the sections with kept units.
+
+        Args:
+        - units (List[str]): The units of a text.
+        - kept (set): The indexes of the kept units.
+
+        Returns:
+        - List[int]: The indexes of the headings not kept yet, in order.
+        """
+        headings = set()
+        heading = None
+        for i, unit in enumerate(units):
+            if HEADING.match(unit):
+                heading = i
+            elif i in kept and heading is not None and heading not in kept:
+                headings.add(heading)
+        return sorted(headings)
+
+    @staticmethod
+    def join(text: str, spans: List[Tuple[int, int]], kept: List[int]) -> str:
+        """
+        Join the kept units of a text, separated by a space, a line break or
+        a blank line as in the text.
+
+        Args:
+        - text (str): The text.
+        - spans (List[Tuple[int, int]]): The units of the text.
+        - kept (List[int]): The indexes of the kept units, in order.
+
+        Returns:
+        - str: The kept units.
+        """
+        parts = [text[slice(*spans[kept[0]])]]
+        for previous, i in zip(kept, kept[1:]):
+            # the widest break between the units, dropped ones included
+            line_breaks = max(
+                text[spans[j][1] : spans[j + 1][0]].count("\n")
+                for j in range(previous, i)
+            )
+            parts.append(("\n" * min(line_breaks, 2)) or " ")
+            parts.append(text[slice(*spans[i])])
+        return "".join(parts)
+
+
+def strip_span(text: str, start: int, end: int) -> Tuple[int, int]:
+    """
+    Narrow a span of a text to exclude its leading and trailing whitespace.
+    """
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def prose_units(text: str, start: int, end: int) -> List[Tuple[int, int]]:
+    """
+    Split a part of a text without code blocks into units: a heading or a
+    list item is a unit, and the other lines are grouped into paragraphs,
+    split into sentences.
+
+    Args:
+    - text (str): The text.
+    - start (int): The start of the part.
+    - end (int): The end of the part.
+
+    Returns:
+    - List[Tuple[int, int]]: The start and end of the non-blank units.
+    """
+    spans = []
+    paragraphs = []
+    for line in NON_BLANK_LINE.finditer(text, start, end):
+        if LINE_UNIT.match(line.group()):
+            paragraphs.append((line.start(), line.end(), False))
+        elif (
+            paragraphs
+            and paragraphs[-1][2]
+            and text.count("\n", paragraphs[-1][1], line.start()) < 2
+        ):
+            paragraphs[-1] = (paragraphs[-1][0], line.end(), True)
+        else:
+            paragraphs.append((line.start(), line.end(), True))
+
+    for paragraph_start, paragraph_end, is_prose in paragraphs:
+        if not is_prose:
+            spans.append(strip_span(text, paragraph_start, paragraph_end))
+            continue
+        position = paragraph_start
+        for boundary in SENTENCE_BOUNDARY.finditer(
+            text, paragraph_start, paragraph_end
+        ):
+            spans.append(strip_span(text, position, boundary.start()))
+            position = boundary.end()
+        spans.append(strip_span(text, position, paragraph_end))
+    return [(s, e) for s, e in spans if s < e]
+
+
+def get_reranker(model: str, top_n: int) -> SentenceTransformerRerank:
+    """
+    Get a cross-encoder reranker, loading its model on first use only.
+
+    Args:
+    - model (str): The sentence-transformers cross-encoder model.
+    - top_n (int): The number of nodes the reranker keeps.
+
+    Returns:
+    - SentenceTransformerRerank: The shared reranker.
+    """
+    key = (model, top_n)
+    with rerankers_lock:
+        if key not in rerankers:
+            rerankers[key] = SentenceTransformerRerank(
+                model=model, top_n=top_n, device="cpu"
+            )
+        return rerankers[key]
+
+
+def retrieval_postprocessors() -> List[BaseNodePostprocessor]:
+    """
+    Get the postprocessors applied to the retrieved nodes before they are
+    put into the summarization prompt, configured from the environment.
+
+    By default the nodes are reranked by the `OLS_RERANKER_MODEL`
+    cross-encoder, a small local sentence-transformers model, and the best
+    `OLS_RERANK_TOP_N` kept; `OLS_RERANKER=none` skips the reranking. The
+    nodes are then trimmed to `OLS_CONTEXT_MAX_TOKENS` tokens.
+
+    Returns:
+    - List[BaseNodePostprocessor]: The postprocessors, in order.
+    """
+    postprocessors = []
+    reranker = os.getenv("OLS_RERANKER", constants.RERANKER).lower()
+    if reranker == constants.CROSS_ENCODER_RERANKER:
+        postprocessors.append(
+            get_reranker(
+                os.getenv("OLS_RERANKER_MODEL", constants.RERANKER_MODEL),
+                int(os.getenv("OLS_RERANK_TOP_N", constants.RERANK_TOP_N)),
+            )
+        )
+    elif reranker != constants.NO_RERANKER:
+        raise ValueError(f"Unknown reranker: {reranker}")
+    postprocessors.append(
+        SentenceCompressor(
+            max_tokens=int(
+                os.getenv("OLS_CONTEXT_MAX_TOKENS", constants.CONTEXT_MAX_TOKENS)
+            )
+        )
+    )
+    return postprocessors
@@ -0,0 +1,122 @@
+import os
+from typing import Union
+
+from llama_index.vector_stores.simple import (
+    DEFAULT_PERSIST_FNAME,
+    DEFAULT_VECTOR_STORE,
+    NAMESPACE_SEP,
+)
+from llama_index.vector_stores.types import VectorStore
+
+from src import constants
+from src.retrieval.ivf_index import IVF_FILE_NAME
+from src.retrieval.mmap_vector_store import (
+    VECTOR_IDS_FILE_NAME,
+    VECTORS_FILE_NAME,
+    MmapVectorStore,
+)
+
+
+def vector_store_settings() -> dict:
+    """
+    Get the format new indexes store their vectors in.
+
+    Returns:
+    - dict: The vector store format ("simple" for the llama_index JSON
+      store or "mmap" for `MmapVectorStore`) and the dtype of the vectors.
+    """
+    store_format = os.getenv("OLS_VECTOR_STORE", constants.VECTOR_STORE_FORMAT).lower()
+    if store_format not in (constants.SIMPLE_VECTOR_STORE, constants.MMAP_VECTOR_STORE):
+        raise ValueError(f"Unknown vector store format: {store_format}")
+    settings = {"vector_store": store_format}
+    if store_format == constants.MMAP_VECTOR_STORE:
+        settings["dtype"] = os.getenv(
+            "OLS_VECTOR_STORE_DTYPE", constants.VECTOR_STORE_DTYPE
+        )
+    return settings
+
+
+def new_vector_store(settings: dict) -> Union[VectorStore, None]:
+    """
+    Create an empty vector store for a new index.
+
+    Args:
+    - settings (dict): As returned by `vector_store_settings`.
+
+    Returns:
+    - Union[VectorStore, None]: The store, or None for the default one.
+    """
+    if settings["vector_store"] == constants.MMAP_VECTOR_STORE:
+        return MmapVectorStore(dtype=settings["dtype"])
+    return None
+
+
+def configure_vector_index(vector_store: Union[VectorStore, None]) -> None:
+    """
+    Configure the approximate search index a vector store is persisted with.
+
+    With OLS_VECTOR_INDEX=ivf an `IVFIndex` of OLS_IVF_NLIST lists (picked
+    from the number of vectors if 0) is built when a memory-mapped store is
+    persisted, with "exact" no index is built.
+
+    Args:
+    - vector_store (Union[VectorStore, None]): The store of the index being built.
+
+    Returns:
+    - None
+    """
+    vector_index = os.getenv("OLS_VECTOR_INDEX", constants.VECTOR_INDEX).lower()
+    if vector_index not in (constants.EXACT_VECTOR_INDEX, constants.IVF_VECTOR_INDEX):
+        raise ValueError(f"Unknown vector index: {vector_index}")
+    if not isinstance(vector_store, MmapVectorStore):
+        if vector_index == constants.IVF_VECTOR_INDEX:
+            raise ValueError("The IVF vector index requires OLS_VECTOR_STORE=mmap")
+        return
+    vector_store.nlist = (
+        int(os.getenv("OLS_IVF_NLIST", constants.IVF_NLIST))
+        if vector_index == constants.IVF_VECTOR_INDEX
+        else None
+    )
+
+
+def load_vector_store(persist_dir: str) -> Union[VectorStore, None]:
+    """
+    Open the vector store persisted with an index, whatever its format.
+
+    The approximate search of a memory-mapped store probes OLS_IVF_NPROBE
+    lists, unless OLS_VECTOR_SEARCH=exact.
+
+    Args:
+    - persist_dir (str): The directory the index was persisted to.
+
+    Returns:
+    - Union[VectorStore, None]: The store, or None when the index uses the
+      default store, which the storage context loads itself.
+    """
+    if not MmapVectorStore.exists(persist_dir):
+        return None
+    vector_store = MmapVectorStore.from_persist_dir(persist_dir)
+    vector_store.nprobe = int(os.getenv("OLS_IVF_NPROBE", constants.IVF_NPROBE))
+    vector_store.exact = os.getenv("OLS_VECTOR_SEARCH", "ann").lower() == "exact"
+    return vector_store
+
+
+def remove_vector_store(persist_dir: str) -> None:
+    """
+    Delete the persisted vectors of an index, in every format.
+
+    Args:
+    - persist_dir (str): The directory the index was persisted to.
+
+    Returns:
+    - None
+    """
+    for name in (
+        f"{DEFAULT_VECTOR_STORE}{NAMESPACE_SEP}{DEFAULT_PERSIST_FNAME}",
+        VECTORS_FILE_NAME,
+        VECTOR_IDS_FILE_NAME,
+        IVF_FILE_NAME,
+    ):
+        path = os.path.join(persist_dir, name)
+        if os.path.exists(path):
+            os.remove(path)
@@ -1,7 +1,11 @@
+import asyncio
+import time
+
 from fastapi.testclient import TestClient
 import requests
 
 from app.main import app
+from utils.warmup import Warmup
 
 client = TestClient(app)
 
@@ -18,6 +22,38 @@ def test_readyz():
     assert response.json() == {"status": "1"}
 
 
+def test_readyz_reports_warmup():
+    warmup = Warmup()
+    warmup.initialize_warmup()
+    try:
+        warmup.add("indexes", lambda: None)
+
+        # the warmup of the test client has not run
+        response = client.get("/readyz")
+        assert response.status_code == requests.codes.service_unavailable
+        assert response.json()["status"] == "0"
+
+        warmup.run()
+        response = client.get("/readyz")
+        assert response.status_code == requests.codes.ok
+        assert response.json()["status"] == "1"
+        assert response.json()["warmup"]["components"]["indexes"]["status"] == "ok"
+
+        # a failed required component keeps the app out of the load balancer
+        warmup.initialize_warmup()
+
+        def fail():
+            raise RuntimeError("no index")
+
+        warmup.add("indexes", fail, required=True)
+        warmup.run()
+        response = client.get("/readyz")
+        assert response.status_code == requests.codes.service_unavailable
+        assert response.json()["warmup"]["components"]["indexes"]["status"] == "failed"
+    finally:
+        warmup.initialize_warmup()
+
+
 def test_root():
     response = client.get("/")
     assert response.status_code == requests.codes.ok
@@ -47,7 +83,7 @@ def test_feedback():
 
 def test_raw_prompt(monkeypatch):
     # the raw prompt should just return stuff from LangChainInterface, so mock that base method
-    # model_context is what imports LangChainInterface, so we have to mock that particular usage/"instance"
+    # model_context is what defines AsyncLangChainInterface, so we have to mock that particular usage/"instance"
     # of it in our tests
 
     import utils.model_context
@@ -55,7 +91,7 @@ def test_raw_prompt(monkeypatch):
 
     ml = mock_langchain_interface("test response")
 
-    monkeypatch.setattr(utils.model_context, "LangChainInterface", ml)
+    monkeypatch.setattr(utils.model_context, "AsyncLangChainInterface", ml)
 
     response = client.post(
         "/ols/raw_prompt", json={"conversation_id": "1234", "query": "test query"}
@@ -67,3 +103,172 @@ def test_raw_prompt(monkeypatch):
         "query": "test query",
         "response": "test response",
     }
+
+
+def test_prompt_too_long(monkeypatch):
+    from src.query_helpers.question_validator import QuestionValidator
+    from utils.prompt_budget import PromptTooLongError
+
+    async def avalidate_question(self, conversation, query, **kwargs):
+        raise PromptTooLongError("question_validator prompt needs 9000 tokens")
+
+    monkeypatch.setattr(QuestionValidator, "avalidate_question", avalidate_question)
+
+    for endpoint in ("/ols", "/ols/stream"):
+        response = client.post(endpoint, json={"query": "a very long query"})
+        assert response.status_code == requests.codes.request_entity_too_large
+        assert "too long" in response.json()["detail"]["response"]
+
+
+def sse_events(text):
+    # the (event, data) pairs of a server-sent events stream
+    events = []
+    for block in text.strip("\n").split("\n\n"):
+        lines = block.split("\n")
+        event = lines[0].removeprefix("event: ")
+        data = "\n".join(line.removeprefix("data: ") for line in lines[1:])
+        events.append((event, data))
+    return events
+
+
+def mock_stream_helpers(monkeypatch, yaml_result):
+    from src.query_helpers.happy_response_generator import HappyResponseGenerator
+    from src.query_helpers.question_validator import QuestionValidator
+
+    async def avalidate_question(self, conversation, query, **kwargs):
+        return ["VALID", yaml_result]
+
+    async def agenerate(self, conversation, query, **kwargs):
+        return "Sure, here you go:"
+
+    monkeypatch.setattr(QuestionValidator, "avalidate_question", avalidate_question)
+    monkeypatch.setattr(HappyResponseGenerator, "agenerate", agenerate)
+
+
+def test_stream_summary(monkeypatch):
+    from src.docs.docs_summarizer import DocsSummarizer
+
+    mock_stream_helpers(monkeypatch, "NOYAML")
+
+    async def astream_summary(self, conversation, query, **kwargs):
+        async def chunks():
+            yield "Scale it with\n"
+            yield "oc scale."
+
+        return chunks(), "scaling.md"
+
+    monkeypatch.setattr(DocsSummarizer, "astream_summary", astream_summary)
+
+    response = client.post(
+        "/ols/stream",
+        json={"conversation_id": "1234", "query": "How do I scale a deployment?"},
+    )
+    assert response.status_code == requests.codes.ok
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert sse_events(response.text) == [
+        ("conversation_id", "1234"),
+        ("wrapper", "Sure, here you go:"),
+        ("summary", "Scale it with\n"),
+        ("summary", "oc scale."),
+        ("referenced_documents", "scaling.md"),
+        ("done", ""),
+    ]
+
+
+def test_stream_error_event(monkeypatch):
+    from src.query_helpers.yaml_generator import YamlGenerator
+
+    mock_stream_helpers(monkeypatch, "YAML")
+
+    async def astream_yaml(self, conversation, query, previous_input, **kwargs):
+        yield "apiVersion: v1\n"
+        raise RuntimeError("model unavailable")
+
+    monkeypatch.setattr(YamlGenerator, "astream_yaml", astream_yaml)
+
+    response = client.post("/ols/stream", json={"query": "Create a pod"})
+    assert response.status_code == requests.codes.ok
+    events = sse_events(response.text)
+    assert [event for event, _ in events] == [
+        "conversation_id",
+        "wrapper",
+        "yaml",
+        "error",
+    ]
+    assert events[2][1] == "apiVersion: v1\n"
+    assert events[3][1] == "Internal server error. Please try again."
+
+
+def mock_ols_helpers(monkeypatch, validation_result):
+    # records the retrieval and the nodes the summarizer got
+    from src.docs.docs_summarizer import DocsSummarizer
+    from src.query_helpers.happy_response_generator import HappyResponseGenerator
+    from src.query_helpers.question_validator import QuestionValidator
+
+    calls = {"retrieval": [], "summarized_nodes": []}
+
+    async def avalidate_question(self, conversation, query, **kwargs):
+        # leave the speculative retrieval time to start
+        await asyncio.sleep(0.05)
+        return validation_result
+
+    async def aretrieve(self, conversation, query):
+        calls["retrieval"].append("started")
+        try:
+            if validation_result[0] == "INVALID":
+                await asyncio.sleep(10)
+            return ["retrieved node"]
+        except asyncio.CancelledError:
+            calls["retrieval"].append("cancelled")
+            raise
+
+    async def asummarize(self, conversation, query, nodes=None, **kwargs):
+        calls["summarized_nodes"].append(nodes)
+        return "summary", "doc.md"
+
+    async def agenerate(self, conversation, query, **kwargs):
+        return "Sure."
+
+    monkeypatch.setattr(QuestionValidator, "avalidate_question", avalidate_question)
+    monkeypatch.setattr(DocsSummarizer, "aretrieve", aretrieve)
+    monkeypatch.setattr(DocsSummarizer, "asummarize", asummarize)
+    monkeypatch.setattr(HappyResponseGenerator, "agenerate", agenerate)
+    return calls
+
+
+def test_speculative_retrieval_cancelled_on_rejection(monkeypatch):
+    monkeypatch.setenv("OLS_SPECULATIVE_RETRIEVAL", "True")
+    calls = mock_ols_helpers(monkeypatch, ["INVALID", "NOYAML"])
+
+    start = time.monotonic()
+    response = client.post("/ols", json={"query": "What is the meaning of life?"})
+
+    assert response.status_code == requests.codes.unprocessable_entity
+    # the request did not wait for the retrieval
+    assert time.monotonic() - start < 5
+    assert calls["retrieval"] == ["started", "cancelled"]
+    assert calls["summarized_nodes"] == []
+
+
+def test_speculative_retrieval_used_on_acceptance(monkeypatch):
+    monkeypatch.setenv("OLS_SPECULATIVE_RETRIEVAL", "True")
+    calls = mock_ols_helpers(monkeypatch, ["VALID", "NOYAML"])
+
+    response = client.post("/ols", json={"query": "How do I scale a deployment?"})
+
+    assert response.status_code == requests.codes.ok
+    assert response.json()["response"] == "Sure.\nsummary"
+    assert calls["retrieval"] == ["started"]
+    assert calls["summarized_nodes"] == [["retrieved node"]]
+
+
+def test_speculative_retrieval_disabled(monkeypatch):
+    monkeypatch.setenv("OLS_SPECULATIVE_RETRIEVAL", "False")
+    calls = mock_ols_helpers(monkeypatch, ["VALID", "NOYAML"])
+
+    response = client.post("/ols", json={"query": "How do I scale a deployment?"})
+
+    assert response.status_code == requests.codes.ok
+    # the summarizer retrieves the nodes itself once the question is valid
+    assert calls["retrieval"] == []
+    assert calls["summarized_nodes"] == [None]
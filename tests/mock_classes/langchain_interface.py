@@ -14,4 +14,7 @@ def mock_langchain_interface(retval):
         def __call__(self, *args, **kwargs):
             return retval
 
+        async def apredict(self, *args, **kwargs):
+            return retval
+
     return MockLangChainInterface
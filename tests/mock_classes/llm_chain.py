@@ -17,4 +17,7 @@ def mock_llm_chain(retval):
         def __call__(self, *args, **kwargs):
             return retval
 
+        async def acall(self, *args, **kwargs):
+            return retval
+
     return MockLLMChain
@@ -0,0 +1,20 @@
+from app.utils import Utils
+
+
+def test_get_suid():
+    assert Utils.get_suid() != Utils.get_suid()
+
+
+def test_format_sse():
+    assert Utils.format_sse("wrapper", "hello") == "event: wrapper\ndata: hello\n\n"
+
+
+def test_format_sse_multiline():
+    assert (
+        Utils.format_sse("yaml", "kind: Pod\nmetadata:")
+        == "event: yaml\ndata: kind: Pod\ndata: metadata:\n\n"
+    )
+
+
+def test_format_sse_empty():
+    assert Utils.format_sse("done", "") == "event: done\ndata: \n\n"
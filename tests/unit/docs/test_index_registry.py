@@ -0,0 +1,127 @@
+import threading
+import time
+import tracemalloc
+
+import pytest
+
+import src.docs.index_registry
+from src import constants
+from src.docs.index_registry import IndexRegistry
+
+
+class MockIndex:
+    def __init__(self, index_id):
+        self.index_id = index_id
+        self.docstore = type("MockDocStore", (), {"docs": {"node1": None}})()
+
+
+@pytest.fixture
+def registry(monkeypatch, tmp_path):
+    loads = []
+
+    def mock_load_index_from_storage(storage_context, index_id, service_context):
+        loads.append(index_id)
+        return MockIndex(index_id)
+
+    monkeypatch.setattr(
+        src.docs.index_registry.StorageContext, "from_defaults", lambda **kw: None
+    )
+    monkeypatch.setattr(
+        src.docs.index_registry, "load_index_from_storage", mock_load_index_from_storage
+    )
+    monkeypatch.setattr(src.docs.index_registry, "get_embed_context", lambda: None)
+
+    r = IndexRegistry()
+    r.initialize_registry()
+    monkeypatch.setattr(
+        r,
+        "persist_dirs",
+        {
+            constants.PRODUCT_INDEX: str(tmp_path),
+            constants.SUMMARY_INDEX: str(tmp_path),
+        },
+    )
+    r.loads = loads
+    return r
+
+
+def test_index_loaded_once(registry):
+    index1 = registry.get_index(constants.PRODUCT_INDEX)
+    index2 = registry.get_index(constants.PRODUCT_INDEX)
+    assert index1 is index2
+    assert registry.loads == [constants.PRODUCT_INDEX]
+
+
+def test_concurrent_get_index_loads_once(registry):
+    threads = [
+        threading.Thread(target=registry.get_index, args=(constants.SUMMARY_INDEX,))
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert registry.loads == [constants.SUMMARY_INDEX]
+
+
+def test_load_all_and_stats(registry):
+    registry.load_all()
+    stats = registry.stats()
+    assert set(stats) == {constants.PRODUCT_INDEX, constants.SUMMARY_INDEX}
+    for index_stats in stats.values():
+        assert index_stats["load_time_seconds"] >= 0
+        assert index_stats["nodes"] == 1
+        assert "memory_bytes" in index_stats
+
+
+def test_memory_traced_on_opt_in(registry):
+    registry.get_index(constants.PRODUCT_INDEX)
+    assert registry.stats()[constants.PRODUCT_INDEX]["memory_bytes"] is None
+
+    registry.trace_memory = True
+    registry.get_index(constants.SUMMARY_INDEX)
+    assert registry.stats()[constants.SUMMARY_INDEX]["memory_bytes"] >= 0
+    assert not tracemalloc.is_tracing()
+
+
+def test_tracing_stopped_when_load_fails(registry, monkeypatch):
+    def fail(**kwargs):
+        raise RuntimeError("corrupt index")
+
+    monkeypatch.setattr(src.docs.index_registry, "load_index_from_storage", fail)
+    registry.trace_memory = True
+    with pytest.raises(RuntimeError):
+        registry.get_index(constants.PRODUCT_INDEX)
+    assert not tracemalloc.is_tracing()
+
+
+def test_rebuilt_index_reloaded(registry, tmp_path):
+    registry.reload_seconds = 0.01
+    index = registry.get_index(constants.PRODUCT_INDEX)
+    version = registry.index_version(constants.PRODUCT_INDEX)
+
+    time.sleep(0.02)
+    # an unchanged index is not loaded again
+    assert registry.get_index(constants.PRODUCT_INDEX) is index
+
+    (tmp_path / "docstore.json").write_text("{}")
+    time.sleep(0.02)
+    assert registry.get_index(constants.PRODUCT_INDEX) is not index
+    assert registry.index_version(constants.PRODUCT_INDEX) != version
+    assert registry.loads == [constants.PRODUCT_INDEX] * 2
+
+
+def test_reload_disabled(registry, tmp_path):
+    registry.reload_seconds = 0
+    index = registry.get_index(constants.PRODUCT_INDEX)
+    (tmp_path / "docstore.json").write_text("{}")
+    assert registry.get_index(constants.PRODUCT_INDEX) is index
+
+
+def test_unknown_index(registry):
+    with pytest.raises(ValueError):
+        registry.get_index("unknown")
+
+
+def test_singleton_pattern():
+    assert IndexRegistry() is IndexRegistry()
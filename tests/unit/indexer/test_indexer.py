@@ -0,0 +1,117 @@
+import os
+
+import pytest
+from llama_index import ServiceContext, StorageContext, load_index_from_storage
+from llama_index.node_parser import SentenceSplitter
+from llama_index.token_counter.mock_embed_model import MockEmbedding
+
+from src.indexer.indexer import build_index
+from src.indexer.manifest import MANIFEST_FILE_NAME
+from src.retrieval.bm25_index import BM25Index
+
+
+class CountingEmbedding(MockEmbedding):
+    """Mock embedding model counting the texts it embeds."""
+
+    embedded: int = 0
+
+    def _get_text_embeddings(self, texts):
+        self.embedded += len(texts)
+        return super()._get_text_embeddings(texts)
+
+
+@pytest.fixture
+def service_context():
+    return ServiceContext.from_defaults(
+        llm=None,
+        embed_model=CountingEmbedding(embed_dim=8),
+        node_parser=SentenceSplitter(chunk_size=32, chunk_overlap=0),
+    )
+
+
+def write_docs(input_dir, docs):
+    for name, text in docs.items():
+        with open(os.path.join(input_dir, name), "w") as f:
+            f.write(text)
+
+
+def paragraphs(*words):
+    return "\n\n".join(f"{word} " * 28 for word in words)
+
+
+def indexed_files(persist_dir, service_context):
+    index = load_index_from_storage(
+        StorageContext.from_defaults(persist_dir=persist_dir),
+        index_id="test",
+        service_context=service_context,
+    )
+    return sorted(
+        os.path.basename(node.metadata["file_name"])
+        for node in index.docstore.get_nodes(
+            list(index.index_struct.nodes_dict.values())
+        )
+    )
+
+
+def test_unchanged_tree_is_not_reembedded(tmp_path, service_context):
+    input_dir, persist_dir = str(tmp_path / "docs"), str(tmp_path / "index")
+    os.mkdir(input_dir)
+    write_docs(input_dir, {"a.txt": paragraphs("alpha"), "b.txt": paragraphs("beta")})
+
+    first = build_index(input_dir, persist_dir, "test", service_context)
+    embedded = service_context.embed_model.embedded
+    second = build_index(input_dir, persist_dir, "test", service_context)
+
+    assert first["changed_files"] == 2
+    assert second["changed_files"] == 0
+    assert service_context.embed_model.embedded == embedded
+    assert os.path.exists(os.path.join(persist_dir, MANIFEST_FILE_NAME))
+
+
+def test_only_changed_chunks_are_embedded(tmp_path, service_context):
+    input_dir, persist_dir = str(tmp_path / "docs"), str(tmp_path / "index")
+    os.mkdir(input_dir)
+    write_docs(input_dir, {"a.txt": paragraphs("alpha", "beta", "gamma")})
+    build_index(input_dir, persist_dir, "test", service_context)
+
+    write_docs(input_dir, {"a.txt": paragraphs("alpha", "beta", "delta")})
+    stats = build_index(input_dir, persist_dir, "test", service_context)
+
+    # the chunks before the edited paragraph are unchanged
+    assert stats["reused_chunks"] > 0
+    assert service_context.embed_model.embedded == 3 + stats["embedded_chunks"]
+    assert indexed_files(persist_dir, service_context) == ["a.txt"] * 3
+
+
+def test_deleted_files_are_dropped(tmp_path, service_context):
+    input_dir, persist_dir = str(tmp_path / "docs"), str(tmp_path / "index")
+    os.mkdir(input_dir)
+    write_docs(input_dir, {"a.txt": paragraphs("alpha"), "b.txt": paragraphs("beta")})
+    build_index(input_dir, persist_dir, "test", service_context)
+
+    os.remove(os.path.join(input_dir, "b.txt"))
+    stats = build_index(input_dir, persist_dir, "test", service_context)
+
+    assert stats["deleted_files"] == 1
+    assert indexed_files(persist_dir, service_context) == ["a.txt"]
+    # the inverted index no longer holds the chunks of the deleted file
+    bm25_index = BM25Index.load(persist_dir)
+    assert bm25_index.search("alpha", top_k=4)
+    assert bm25_index.search("beta", top_k=4) == []
+
+
+def test_settings_change_rebuilds_from_scratch(tmp_path, service_context):
+    input_dir, persist_dir = str(tmp_path / "docs"), str(tmp_path / "index")
+    os.mkdir(input_dir)
+    write_docs(input_dir, {"a.txt": paragraphs("alpha")})
+    build_index(input_dir, persist_dir, "test", service_context)
+
+    other_context = ServiceContext.from_defaults(
+        llm=None,
+        embed_model=CountingEmbedding(embed_dim=8),
+        node_parser=SentenceSplitter(chunk_size=64, chunk_overlap=0),
+    )
+    stats = build_index(input_dir, persist_dir, "test", other_context)
+
+    assert stats["changed_files"] == 1
+    assert stats["reused_chunks"] == 0
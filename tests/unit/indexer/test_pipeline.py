@@ -0,0 +1,48 @@
+import os
+
+from llama_index.node_parser import SentenceSplitter
+from llama_index.schema import TextNode
+from llama_index.token_counter.mock_embed_model import MockEmbedding
+
+from src.indexer.pipeline import embed_nodes, parse_files
+
+
+class BatchRecordingEmbedding(MockEmbedding):
+    """Mock embedding model recording the size of every batch it embeds."""
+
+    batches: list = []
+
+    def _get_text_embeddings(self, texts):
+        self.batches.append(len(texts))
+        return super()._get_text_embeddings(texts)
+
+
+def test_parse_files_in_processes(tmp_path):
+    for i in range(4):
+        (tmp_path / f"doc{i}.txt").write_text(f"document {i} " * 100)
+    paths = sorted(os.listdir(tmp_path))
+    node_parser = SentenceSplitter(chunk_size=64, chunk_overlap=0)
+
+    in_process = parse_files(str(tmp_path), paths, node_parser, workers=1)
+    in_pool = parse_files(str(tmp_path), paths, node_parser, workers=2)
+
+    assert list(in_pool) == paths
+    for path in paths:
+        documents, nodes = in_pool[path]
+        assert [d.doc_id for d in documents] == [d.doc_id for d in in_process[path][0]]
+        assert [n.text for n in nodes] == [n.text for n in in_process[path][1]]
+        assert all(n.ref_doc_id == documents[0].doc_id for n in nodes)
+
+
+def test_embed_nodes_in_batches():
+    embed_model = BatchRecordingEmbedding(embed_dim=4, embed_batch_size=3)
+    nodes = [TextNode(text=f"chunk {i}") for i in range(7)]
+    # already embedded nodes are skipped
+    nodes[0].embedding = [1.0, 0.0, 0.0, 0.0]
+
+    stats = embed_nodes(nodes, embed_model, concurrency=2)
+
+    assert stats["embedded_chunks"] == 6
+    assert sorted(embed_model.batches) == [3, 3]
+    assert all(node.embedding is not None for node in nodes)
+    assert nodes[0].embedding == [1.0, 0.0, 0.0, 0.0]
@@ -0,0 +1,70 @@
+import pytest
+
+from app.constants import NOYAML, VALID, YAML
+from src.query_helpers.question_classifier import QuestionClassifier
+
+
+@pytest.fixture
+def classifier():
+    c = QuestionClassifier()
+    c.initialize_classifier()
+    return c
+
+
+clear_questions = (
+    ("How do I check the logs of a pod in openshift?", [VALID, NOYAML]),
+    (
+        "What is the difference between a deployment and a statefulset?",
+        [VALID, NOYAML],
+    ),
+    ("Why does oc get nodes show NotReady?", [VALID, NOYAML]),
+    ("write a kubernetes deployment yaml for the mongodb image", [VALID, YAML]),
+    (
+        "give me a kubernetes deployment of 5 nginx pods with a 200mi memory limit",
+        [VALID, YAML],
+    ),
+    ("Please create a configmap in my openshift project", [VALID, YAML]),
+)
+
+
+@pytest.mark.parametrize("query,expected", clear_questions)
+def test_clear_questions(classifier, query, expected):
+    response, confidence = classifier.classify(query)
+    assert response == expected
+    assert confidence >= classifier.threshold
+
+
+ambiguous_questions = (
+    "Why is the sky blue?",
+    "Can you make me lunch with ham and cheese?",
+    "What is the meaning of life?",
+    "How do I keep a secret?",
+    "What is a yaml file?",
+    "Can you create a deployment for my frontend?",
+    # a single topic term, common outside of kubernetes
+    "How do I check the logs of a pod?",
+    "Create a deployment plan for the release",
+    "How do I install helm on my boat?",
+    "Please create a configmap holding my app settings",
+    # off-topic requests using kubernetes vocabulary
+    "write a poem about kubernetes",
+    "Write a song about openshift pods and kubectl",
+    "",
+)
+
+
+@pytest.mark.parametrize("query", ambiguous_questions)
+def test_ambiguous_questions_fall_back(classifier, query):
+    response, confidence = classifier.classify(query)
+    assert response is None
+    assert confidence < classifier.threshold
+
+
+def test_stats(classifier):
+    classifier.classify("How do I check the logs of a pod in openshift?")
+    classifier.classify("Why is the sky blue?")
+    stats = classifier.stats()
+    assert stats["classified"] == 1
+    assert stats["fallbacks"] == 1
+    assert stats["fallback_rate"] == 0.5
+    assert 0 < stats["mean_confidence"] < 1
@@ -1,3 +1,5 @@
+import asyncio
+
 import pytest
 
 import src.query_helpers.question_validator
@@ -35,3 +37,41 @@ def test_valid_responses(question_validator, monkeypatch):
         )
 
         assert response == retval.split(",")
+
+
+def test_valid_responses_async(question_validator, monkeypatch):
+    for retval in ["INVALID,NOYAML", "VALID,NOYAML", "VALID,YAML"]:
+        ml = mock_llm_chain({"text": retval})
+        monkeypatch.setattr(src.query_helpers.question_validator, "LLMChain", ml)
+
+        response = asyncio.run(
+            question_validator.avalidate_question(
+                conversation="1234", query="What is the meaning of life?"
+            )
+        )
+
+        assert response == retval.split(",")
+
+
+def test_clear_question_skips_llm(question_validator, monkeypatch):
+    # the LLM would answer with an invalid response if it got called
+    ml = mock_llm_chain({"text": "default"})
+    monkeypatch.setattr(src.query_helpers.question_validator, "LLMChain", ml)
+
+    response = question_validator.validate_question(
+        conversation="1234", query="How do I list the pods of my openshift namespace?"
+    )
+
+    assert response == ["VALID", "NOYAML"]
+
+
+def test_local_classifier_disabled(question_validator, monkeypatch):
+    monkeypatch.setenv("OLS_QUESTION_CLASSIFIER", "False")
+    ml = mock_llm_chain({"text": "VALID,YAML"})
+    monkeypatch.setattr(src.query_helpers.question_validator, "LLMChain", ml)
+
+    response = question_validator.validate_question(
+        conversation="1234", query="How do I list the pods of my openshift namespace?"
+    )
+
+    assert response == ["VALID", "YAML"]
@@ -0,0 +1,182 @@
+import threading
+import time
+
+import pytest
+
+import src.query_helpers.task_processor
+from src.query_helpers.task_performer import TaskPerformer
+from src.query_helpers.task_processor import TaskProcessor
+from src.query_helpers.task_rephraser import TaskRephraser
+from src.query_helpers.yes_no_classifier import YesNoClassifier
+
+
+def task_llm_chain(delays=None, started=None, barrier=None):
+    class MockLLMChain:
+        """
+        Mock LLMChain answering with the task it got, after a delay per task,
+        and after all the tasks reached the barrier, if any.
+        """
+
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def __call__(self, inputs, *args, **kwargs):
+            if started is not None:
+                started.append(inputs["task"])
+            if barrier is not None:
+                barrier.wait(timeout=5)
+            time.sleep((delays or {}).get(inputs["task"], 0))
+            return {"text": f" {inputs['task']} \n"}
+
+    return MockLLMChain
+
+
+@pytest.fixture
+def task_processor(monkeypatch):
+    # the LLM answers with the task: "no, ..." tasks need details according
+    # to the local rules, "unknown ..." tasks cannot be classified by the LLM
+    batches = []
+
+    def classify_batch(self, conversation, statements, **kwargs):
+        batches.append(statements)
+        return [9 if s.startswith("unknown") else 1 for s in statements]
+
+    monkeypatch.setattr(YesNoClassifier, "classify_batch", classify_batch)
+    monkeypatch.setattr(
+        TaskRephraser,
+        "rephrase_task",
+        lambda self, conversation, task, query, **kwargs: f"{task} for {query}",
+    )
+    monkeypatch.setattr(
+        TaskPerformer,
+        "perform_task",
+        lambda self, conversation, task, **kwargs: f"done: {task}",
+    )
+    monkeypatch.setenv("OLS_TASK_WORKERS", "4")
+    processor = TaskProcessor()
+    processor.batches = batches
+    return processor
+
+
+def test_outputs_keep_task_order(task_processor, monkeypatch):
+    # the tasks only get an answer once all of them asked, so they ran
+    # concurrently, and the first task finishes last
+    barrier = threading.Barrier(3)
+    ml = task_llm_chain(delays={"a": 0.2, "b": 0.1}, barrier=barrier)
+    monkeypatch.setattr(src.query_helpers.task_processor, "LLMChain", ml)
+
+    status, outputs = task_processor.process_tasks("1234", ["a", "b", "c"], "query")
+
+    assert status == 1
+    assert outputs == ["done: a for query", "done: b for query", "done: c for query"]
+    assert not barrier.broken
+    # the answers were classified by a single call
+    assert task_processor.batches == [["a", "b", "c"]]
+
+
+def test_clear_answers_skip_the_llm(task_processor, monkeypatch):
+    ml = task_llm_chain()
+    monkeypatch.setattr(src.query_helpers.task_processor, "LLMChain", ml)
+
+    status, outputs = task_processor.process_tasks(
+        "1234", ["yes, a", "yes, b"], "query"
+    )
+
+    assert status == 1
+    assert len(outputs) == 2
+    assert task_processor.batches == []
+
+
+def test_need_details_aborts_outstanding_tasks(task_processor, monkeypatch):
+    started = []
+    ml = task_llm_chain(delays={"b": 0.2}, started=started)
+    monkeypatch.setattr(src.query_helpers.task_processor, "LLMChain", ml)
+    monkeypatch.setenv("OLS_TASK_WORKERS", "2")
+
+    performed = []
+    monkeypatch.setattr(
+        TaskPerformer,
+        "perform_task",
+        lambda self, conversation, task, **kwargs: performed.append(task),
+    )
+
+    status, response = task_processor.process_tasks(
+        "1234", ["no, a", "b", "c", "d"], "query"
+    )
+
+    assert status == 0
+    assert "no, a" in response
+    # the tasks waiting for a worker never started and the running one stopped
+    assert sorted(started) == ["b", "no, a"]
+    assert performed == []
+    assert task_processor.batches == []
+
+
+def test_earliest_failure_is_reported(task_processor, monkeypatch):
+    ml = task_llm_chain(delays={"unknown a": 0.1})
+    monkeypatch.setattr(src.query_helpers.task_processor, "LLMChain", ml)
+
+    status, response = task_processor.process_tasks("1234", ["unknown a", "b"], "query")
+
+    assert status == 9
+    assert response == "Unknown error occurred"
+
+
+def test_earlier_undecided_tasks_are_classified(task_processor, monkeypatch):
+    # the second task fails by the local rules while the first one still
+    # waits for its answer, which the LLM then classifies as a failure
+    ml = task_llm_chain(delays={"unknown a": 0.1})
+    monkeypatch.setattr(src.query_helpers.task_processor, "LLMChain", ml)
+
+    status, response = task_processor.process_tasks(
+        "1234", ["unknown a", "no, b"], "query"
+    )
+
+    assert status == 9
+    assert response == "Unknown error occurred"
+    assert task_processor.batches == [["unknown a"]]
+
+
+def test_dependencies_run_in_order(task_processor, monkeypatch):
+    started = []
+    ml = task_llm_chain(delays={"a": 0.1}, started=started)
+    monkeypatch.setattr(src.query_helpers.task_processor, "LLMChain", ml)
+
+    status, outputs = task_processor.process_tasks(
+        "1234", ["a", "b", "c"], "query", dependencies={1: [0]}
+    )
+
+    assert status == 1
+    assert len(outputs) == 3
+    assert started.index("b") > started.index("a")
+
+
+def test_invalid_dependencies(task_processor, monkeypatch):
+    monkeypatch.setattr(src.query_helpers.task_processor, "LLMChain", task_llm_chain())
+
+    with pytest.raises(ValueError):
+        task_processor.process_tasks("1234", ["a", "b"], "query", dependencies={1: [2]})
+    with pytest.raises(ValueError):
+        task_processor.process_tasks(
+            "1234", ["a", "b"], "query", dependencies={0: [1], 1: [0]}
+        )
+
+
+def test_task_error_propagates(task_processor, monkeypatch):
+    monkeypatch.setattr(src.query_helpers.task_processor, "LLMChain", task_llm_chain())
+
+    def perform_task(self, conversation, task, **kwargs):
+        raise ValueError("Task failed")
+
+    monkeypatch.setattr(TaskPerformer, "perform_task", perform_task)
+
+    with pytest.raises(ValueError):
+        task_processor.process_tasks("1234", ["a", "b"], "query")
+    # no task thread is left behind
+    assert not [t for t in threading.enumerate() if t.name.startswith("ols-task")]
+
+
+def test_no_tasks(task_processor, monkeypatch):
+    monkeypatch.setattr(src.query_helpers.task_processor, "LLMChain", task_llm_chain())
+
+    assert task_processor.process_tasks("1234", [], "query") == [1, []]
@@ -30,3 +30,133 @@ def test_good_value_response(yes_no_classifier, monkeypatch):
         assert yes_no_classifier.classify(
             conversation="1234", statement="The sky is blue."
         ) == int(x)
+
+
+clear_statements = (
+    ("Yes, the query contains enough information.", 1),
+    ("yes", 1),
+    ("Sure, that sounds good.", 1),
+    ("No, the query does not tell which namespace to use.", 0),
+    ("Nope.", 0),
+    ("no", 0),
+    ("The above query does not contain enough information to complete the task.", 0),
+)
+
+
+@pytest.mark.parametrize("statement,expected", clear_statements)
+def test_clear_statements_skip_llm(yes_no_classifier, monkeypatch, statement, expected):
+    # the LLM would answer with an invalid response if it got called
+    ml = mock_llm_chain({"text": "default"})
+    monkeypatch.setattr(src.query_helpers.yes_no_classifier, "LLMChain", ml)
+
+    assert yes_no_classifier.classify(conversation="1234", statement=statement) == (
+        expected
+    )
+
+
+ambiguous_statements = (
+    "Yes, but the query does not say which namespace to use.",
+    "No problem, the query has everything needed.",
+    # a negated yes
+    "Certainly not.",
+    "Yes, it isn't enough.",
+    "Sure, I would never guess the namespace.",
+    # a no opening a noun phrase
+    "No additional information is needed; the task can be completed.",
+    "No further details are required.",
+    # a qualified no
+    "No, but the query names the deployment.",
+    "The query contains the cluster name.",
+    "",
+)
+
+
+@pytest.mark.parametrize("statement", ambiguous_statements)
+def test_ambiguous_statements_reach_llm(yes_no_classifier, monkeypatch, statement):
+    ml = mock_llm_chain({"text": "9"})
+    monkeypatch.setattr(src.query_helpers.yes_no_classifier, "LLMChain", ml)
+
+    assert yes_no_classifier.classify(conversation="1234", statement=statement) == 9
+
+
+def test_rules_can_be_disabled(yes_no_classifier, monkeypatch):
+    monkeypatch.setenv("OLS_YES_NO_RULES", "False")
+    ml = mock_llm_chain({"text": "9"})
+    monkeypatch.setattr(src.query_helpers.yes_no_classifier, "LLMChain", ml)
+
+    assert yes_no_classifier.classify(conversation="1234", statement="Yes.") == 9
+
+
+def test_classify_batch(yes_no_classifier, monkeypatch):
+    calls = []
+
+    class MockLLMChain:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def __call__(self, inputs, *args, **kwargs):
+            calls.append(inputs)
+            return {"text": "1: 0\n2: 9\n3: 1"}
+
+    monkeypatch.setattr(src.query_helpers.yes_no_classifier, "LLMChain", MockLLMChain)
+
+    statements = [
+        "Yes, go ahead.",
+        "The query names the deployment.",
+        "Apples are red.",
+        "No.",
+        "It depends on the\ncluster.",
+    ]
+    results = yes_no_classifier.classify_batch("1234", statements)
+
+    assert results == [1, 0, 9, 0, 1]
+    # the statements the rules could not classify went in a single prompt
+    assert calls == [
+        {
+            "statements": "1. The query names the deployment.\n"
+            "2. Apples are red.\n"
+            "3. It depends on the cluster."
+        }
+    ]
+
+
+def test_classify_batch_asks_again_for_skipped_statements(
+    yes_no_classifier, monkeypatch
+):
+    class MockLLMChain:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def __call__(self, inputs, *args, **kwargs):
+            # the batched prompt only gets an answer for the first statement
+            return {"text": "1: 1" if "statements" in inputs else "0"}
+
+    monkeypatch.setattr(src.query_helpers.yes_no_classifier, "LLMChain", MockLLMChain)
+
+    results = yes_no_classifier.classify_batch(
+        "1234", ["Apples are red.", "The sky is blue."]
+    )
+
+    assert results == [1, 0]
+
+
+def test_classify_batch_size(yes_no_classifier, monkeypatch):
+    monkeypatch.setenv("OLS_YES_NO_BATCH_SIZE", "2")
+    calls = []
+
+    class MockLLMChain:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def __call__(self, inputs, *args, **kwargs):
+            calls.append(inputs)
+            return {"text": "1: 1\n2: 1" if "statements" in inputs else "1"}
+
+    monkeypatch.setattr(src.query_helpers.yes_no_classifier, "LLMChain", MockLLMChain)
+
+    results = yes_no_classifier.classify_batch(
+        "1234", ["Apples are red.", "The sky is blue.", "Grass is green."]
+    )
+
+    assert results == [1, 1, 1]
+    assert [list(call) for call in calls] == [["statements"], ["statement"]]
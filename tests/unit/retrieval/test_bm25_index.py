@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from src.retrieval.bm25_index import BM25Index, tokenize
+
+
+@pytest.fixture
+def index():
+    return BM25Index.build(
+        ["scale", "mcp", "login", "autoscaler"],
+        [
+            "Scale a deployment with oc scale --replicas.",
+            "A MachineConfigPool groups the nodes a MachineConfig applies to.",
+            "Log in to the cluster with oc login.",
+            "The cluster-autoscaler adjusts the size of the cluster.",
+        ],
+    )
+
+
+def test_tokenize_keeps_compounds():
+    assert tokenize("Use the cluster-autoscaler in apps/v1") == [
+        "use",
+        "cluster-autoscaler",
+        "cluster",
+        "autoscaler",
+        "apps/v1",
+        "apps",
+        "v1",
+    ]
+
+
+def test_exact_token_match(index):
+    results = index.search("What is a MachineConfigPool?", top_k=4)
+    assert [node_id for node_id, _ in results] == ["mcp"]
+
+
+def test_ranking(index):
+    results = index.search("cluster autoscaler", top_k=2)
+    assert results[0][0] == "autoscaler"
+    assert len(results) == 2
+    assert results[0][1] > results[1][1] > 0
+
+
+def test_no_match(index):
+    assert index.search("prometheus", top_k=4) == []
+    assert not index.scores("the a of").any()
+
+
+def test_persist_and_load(index, tmp_path):
+    index.persist(str(tmp_path))
+    assert BM25Index.exists(str(tmp_path))
+    loaded = BM25Index.load(str(tmp_path))
+    assert loaded.node_ids == index.node_ids
+    assert np.allclose(loaded.scores("oc login"), index.scores("oc login"))
@@ -0,0 +1,72 @@
+from llama_index import ServiceContext, VectorStoreIndex
+from llama_index.schema import TextNode
+from llama_index.token_counter.mock_embed_model import MockEmbedding
+
+from src.retrieval.bm25_index import BM25Index
+from src.retrieval.hybrid_retriever import HybridRetriever
+
+
+class KeywordEmbedding(MockEmbedding):
+    """Mock embedding model only telling apart texts about scaling."""
+
+    def _embed(self, text):
+        return [1.0, 0.0] if "scal" in text.lower() else [0.0, 1.0]
+
+    def _get_query_embedding(self, query):
+        return self._embed(query)
+
+    def _get_text_embedding(self, text):
+        return self._embed(text)
+
+    def _get_text_embeddings(self, texts):
+        return [self._embed(text) for text in texts]
+
+
+def build(texts):
+    nodes = [TextNode(id_=node_id, text=text) for node_id, text in texts.items()]
+    index = VectorStoreIndex(
+        nodes,
+        service_context=ServiceContext.from_defaults(
+            llm=None, embed_model=KeywordEmbedding(embed_dim=2)
+        ),
+    )
+    return index, BM25Index.build(list(texts), list(texts.values()))
+
+
+def test_lexical_match_outranks_vector_tie():
+    index, bm25_index = build(
+        {
+            "hpa": "Scaling pods with a HorizontalPodAutoscaler.",
+            "machineset": "Scaling compute nodes with a MachineSet.",
+            "login": "Log in with oc login.",
+        }
+    )
+    retriever = HybridRetriever(index, bm25_index, similarity_top_k=2)
+    nodes = retriever.retrieve("How do I scale a MachineSet?")
+    assert [n.node.node_id for n in nodes] == ["machineset", "hpa"]
+    assert nodes[0].score > nodes[1].score
+
+
+def test_lexical_only_candidates_are_fetched():
+    index, bm25_index = build(
+        {
+            "hpa": "Scaling pods with a HorizontalPodAutoscaler.",
+            "login": "Log in with oc login.",
+        }
+    )
+    retriever = HybridRetriever(
+        index, bm25_index, similarity_top_k=1, alpha=0.0, candidate_top_k=1
+    )
+    nodes = retriever.retrieve("scale oc login")
+    assert nodes[0].node.node_id == "login"
+    assert nodes[0].node.text == "Log in with oc login."
+
+
+def test_scaled():
+    assert HybridRetriever.scaled({"a": 2.0, "b": 4.0, "c": 3.0}) == {
+        "a": 0.0,
+        "b": 1.0,
+        "c": 0.5,
+    }
+    assert HybridRetriever.scaled({"a": 0.3}) == {"a": 1.0}
+    assert HybridRetriever.scaled({}) == {}
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+from llama_index.schema import TextNode
+from llama_index.vector_stores.types import VectorStoreQuery
+
+from src.retrieval.ivf_index import IVFIndex
+from src.retrieval.mmap_vector_store import MmapVectorStore
+
+
+@pytest.fixture
+def vectors():
+    # points scattered around 8 well separated directions
+    rng = np.random.default_rng(1)
+    centers = rng.standard_normal((8, 16))
+    points = np.repeat(centers, 50, axis=0) + 0.05 * rng.standard_normal((400, 16))
+    return (points / np.linalg.norm(points, axis=1, keepdims=True)).astype(np.float32)
+
+
+def test_build_covers_every_row(vectors):
+    index = IVFIndex.build(vectors, nlist=8)
+    assert index.nlist == 8
+    assert sorted(index.order.tolist()) == list(range(len(vectors)))
+    assert index.offsets[0] == 0
+    assert index.offsets[-1] == len(vectors)
+
+
+def test_candidates_find_the_neighbours(vectors):
+    index = IVFIndex.build(vectors, nlist=8)
+    candidates = index.candidates(vectors[0], nprobe=1)
+    # the list of the query holds its whole cluster and little else
+    assert 0 in candidates
+    assert len(candidates) < len(vectors) / 2
+    assert len(index.candidates(vectors[0], nprobe=8)) == len(vectors)
+
+
+def test_persist_and_load(vectors, tmp_path):
+    index = IVFIndex.build(vectors, nlist=4)
+    index.persist(str(tmp_path))
+    loaded = IVFIndex.load(str(tmp_path))
+    assert np.array_equal(loaded.centroids, index.centroids)
+    assert np.array_equal(loaded.order, index.order)
+
+
+def test_default_nlist():
+    assert IVFIndex.default_nlist(10000) == 400
+    assert IVFIndex.default_nlist(1) == 1
+
+
+def test_store_approximate_and_exact_search(vectors, tmp_path):
+    store = MmapVectorStore()
+    store.add(
+        [
+            TextNode(id_=str(i), text="", embedding=v.tolist())
+            for i, v in enumerate(vectors)
+        ]
+    )
+    store.nlist = 8
+    store.persist(str(tmp_path / "default__vector_store.json"))
+
+    loaded = MmapVectorStore.from_persist_dir(str(tmp_path))
+    loaded.nprobe = 1
+    assert loaded.approximate()
+    query = VectorStoreQuery(query_embedding=vectors[3].tolist(), similarity_top_k=5)
+    approximate = loaded.query(query)
+    exact = loaded.query(query, exact=True)
+    assert approximate.ids == exact.ids
+    assert approximate.ids[0] == "3"
+
+    # adding vectors makes the index stale until the store is persisted again
+    loaded.add([TextNode(id_="new", text="", embedding=vectors[0].tolist())])
+    assert not loaded.approximate()
+
+
+def test_store_without_nlist_drops_the_index(vectors, tmp_path):
+    store = MmapVectorStore()
+    store.add([TextNode(id_="0", text="", embedding=vectors[0].tolist())])
+    store.nlist = 0
+    store.persist(str(tmp_path / "default__vector_store.json"))
+    assert IVFIndex.exists(str(tmp_path))
+
+    store.nlist = None
+    store.persist(str(tmp_path / "default__vector_store.json"))
+    assert not IVFIndex.exists(str(tmp_path))
@@ -0,0 +1,123 @@
+import numpy as np
+import pytest
+from llama_index import ServiceContext, StorageContext, load_index_from_storage
+from llama_index.node_parser import SentenceSplitter
+from llama_index.schema import NodeRelationship, RelatedNodeInfo, TextNode
+from llama_index.token_counter.mock_embed_model import MockEmbedding
+from llama_index.vector_stores.types import VectorStoreQuery
+
+from src.indexer.indexer import build_index
+from src.retrieval.mmap_vector_store import MmapVectorStore
+
+
+def node(node_id, embedding, doc_id="doc"):
+    return TextNode(
+        id_=node_id,
+        text=node_id,
+        embedding=embedding,
+        relationships={NodeRelationship.SOURCE: RelatedNodeInfo(node_id=doc_id)},
+    )
+
+
+@pytest.fixture
+def store():
+    s = MmapVectorStore()
+    s.add(
+        [
+            node("x", [1.0, 0.0, 0.0], "doc1"),
+            node("y", [0.0, 2.0, 0.0], "doc1"),
+            node("z", [0.0, 0.0, 3.0], "doc2"),
+        ]
+    )
+    return s
+
+
+def test_query_top_k(store):
+    result = store.query(
+        VectorStoreQuery(query_embedding=[0.1, 1.0, 0.0], similarity_top_k=2)
+    )
+    assert result.ids == ["y", "x"]
+    assert result.similarities[0] == pytest.approx(1 / np.sqrt(1.01), rel=1e-5)
+
+
+def test_query_node_ids(store):
+    result = store.query(
+        VectorStoreQuery(
+            query_embedding=[0.1, 1.0, 0.0], similarity_top_k=2, node_ids=["x", "z"]
+        )
+    )
+    assert result.ids == ["x", "z"]
+
+
+def test_delete(store):
+    store.delete("doc1")
+    result = store.query(
+        VectorStoreQuery(query_embedding=[1.0, 1.0, 1.0], similarity_top_k=3)
+    )
+    assert result.ids == ["z"]
+
+
+def test_persist_and_mmap(store, tmp_path):
+    store.persist(str(tmp_path / "default__vector_store.json"))
+    loaded = MmapVectorStore.from_persist_dir(str(tmp_path))
+
+    assert isinstance(loaded.vectors, np.memmap)
+    assert loaded.get("z") == [0.0, 0.0, 1.0]
+    result = loaded.query(
+        VectorStoreQuery(query_embedding=[0.0, 0.0, 1.0], similarity_top_k=1)
+    )
+    assert result.ids == ["z"]
+
+
+def test_add_to_persisted_empty_store(tmp_path):
+    MmapVectorStore(dtype="float16").persist(str(tmp_path / "vector_store.json"))
+    loaded = MmapVectorStore.from_persist_dir(str(tmp_path))
+
+    assert loaded.vectors is None
+    assert loaded.dtype == np.float16
+    loaded.add([node("x", [1.0, 0.0, 0.0])])
+    assert loaded.get("x") == [1.0, 0.0, 0.0]
+
+
+def test_float16(tmp_path):
+    store = MmapVectorStore(dtype="float16")
+    store.add([node("x", [1.0, 0.0]), node("y", [0.6, 0.8])])
+    store.persist(str(tmp_path / "default__vector_store.json"))
+    loaded = MmapVectorStore.from_persist_dir(str(tmp_path))
+
+    assert loaded.vectors.dtype == np.float16
+    result = loaded.query(
+        VectorStoreQuery(query_embedding=[0.5, 1.0], similarity_top_k=2)
+    )
+    assert result.ids == ["y", "x"]
+
+
+def test_index_built_with_mmap_store(tmp_path, monkeypatch):
+    monkeypatch.setenv("OLS_VECTOR_STORE", "mmap")
+    input_dir = tmp_path / "docs"
+    input_dir.mkdir()
+    (input_dir / "a.txt").write_text("alpha " * 100)
+    (input_dir / "b.txt").write_text("beta " * 100)
+    service_context = ServiceContext.from_defaults(
+        llm=None,
+        embed_model=MockEmbedding(embed_dim=8),
+        node_parser=SentenceSplitter(chunk_size=64, chunk_overlap=0),
+    )
+    persist_dir = str(tmp_path / "index")
+    build_index(str(input_dir), persist_dir, "test", service_context)
+    # an incremental update goes through the persisted mmap store
+    (input_dir / "b.txt").unlink()
+    build_index(str(input_dir), persist_dir, "test", service_context)
+
+    assert MmapVectorStore.exists(persist_dir)
+    vector_store = MmapVectorStore.from_persist_dir(persist_dir)
+    index = load_index_from_storage(
+        StorageContext.from_defaults(
+            persist_dir=persist_dir, vector_store=vector_store
+        ),
+        index_id="test",
+        service_context=service_context,
+    )
+    nodes = index.as_retriever(similarity_top_k=2).retrieve("alpha")
+    assert len(nodes) == 2
+    assert all(n.node.metadata["file_name"].endswith("a.txt") for n in nodes)
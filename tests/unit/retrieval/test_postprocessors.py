@@ -0,0 +1,129 @@
+import pytest
+from llama_index.schema import NodeWithScore, QueryBundle, TextNode
+
+import src.retrieval.postprocessors
+from src import constants
+from src.retrieval.postprocessors import SentenceCompressor, retrieval_postprocessors
+
+ROUTES = (
+    "Routes expose services outside the cluster.\n"
+    "Create a route with oc expose service.\n"
+    "The router runs on the infrastructure nodes."
+)
+TLS = "Secure routes use TLS certificates. Edge routes terminate TLS at the router."
+
+
+def nodes(*texts):
+    return [
+        NodeWithScore(node=TextNode(id_=str(i), text=text), score=1.0 - i / 10)
+        for i, text in enumerate(texts)
+    ]
+
+
+def compress(retrieved, query, max_tokens=512):
+    return SentenceCompressor(max_tokens=max_tokens).postprocess_nodes(
+        retrieved, QueryBundle(query)
+    )
+
+
+def test_keeps_relevant_sentences():
+    compressed = compress(nodes(ROUTES, TLS), "How do I expose a service with oc?")
+    assert [n.node.text for n in compressed] == [
+        "Routes expose services outside the cluster.\n"
+        "Create a route with oc expose service."
+    ]
+
+
+DEPLOYMENT = """## Creating a deployment
+
+To create a deployment, apply the following YAML.
+
+```yaml
+apiVersion: apps/v1
+kind: Deployment
+metadata:
+  name: frontend
+spec:
+  replicas: 3
+```
+
+The deployment creates three pods.
+
+## Cleaning up
+
+Run the following command:
+
+- `oc delete all -l app=frontend`, which also removes its pods.
+"""
+
+
+def test_code_blocks_and_headings_kept_whole():
+    compressed = compress(
+        nodes(DEPLOYMENT), "how do I create a deployment with 3 replicas"
+    )
+    assert [n.node.text for n in compressed] == [
+        "## Creating a deployment\n\n"
+        "To create a deployment, apply the following YAML.\n\n"
+        "```yaml\n"
+        "apiVersion: apps/v1\n"
+        "kind: Deployment\n"
+        "metadata:\n"
+        "  name: frontend\n"
+        "spec:\n"
+        "  replicas: 3\n"
+        "```\n\n"
+        "The deployment creates three pods."
+    ]
+
+
+def test_list_items_kept_whole():
+    compressed = compress(nodes(DEPLOYMENT), "oc delete", max_tokens=30)
+    assert [n.node.text for n in compressed] == [
+        "## Cleaning up\n\n"
+        "- `oc delete all -l app=frontend`, which also removes its pods."
+    ]
+
+
+def test_token_budget():
+    compressed = compress(nodes(ROUTES, TLS), "How do I secure routes with TLS?", 20)
+    # the budget is shared by all nodes, in rank order, and within a node the
+    # sentences matching the most terms win
+    assert [n.node.text for n in compressed] == [
+        "Routes expose services outside the cluster.",
+        "Secure routes use TLS certificates.",
+    ]
+
+
+def test_top_node_kept_without_overlap():
+    compressed = compress(nodes(ROUTES, TLS), "ingress?", max_tokens=12)
+    assert [n.node.text for n in compressed] == [
+        "Routes expose services outside the cluster."
+    ]
+
+
+def test_shared_nodes_not_modified():
+    retrieved = nodes(ROUTES)
+    compress(retrieved, "oc expose")
+    assert retrieved[0].node.text == ROUTES
+
+
+def test_retrieval_postprocessors(monkeypatch):
+    # the cross-encoder reranks the nodes by default
+    monkeypatch.setattr(
+        src.retrieval.postprocessors,
+        "get_reranker",
+        lambda model, top_n: ("reranker", model, top_n),
+    )
+    monkeypatch.setenv("OLS_CONTEXT_MAX_TOKENS", "100")
+    postprocessors = retrieval_postprocessors()
+    assert postprocessors[0] == ("reranker", constants.RERANKER_MODEL, 3)
+    assert postprocessors[1].max_tokens == 100
+
+    monkeypatch.setenv("OLS_RERANKER", "none")
+    postprocessors = retrieval_postprocessors()
+    assert len(postprocessors) == 1
+    assert postprocessors[0].max_tokens == 100
+
+    monkeypatch.setenv("OLS_RERANKER", "llm")
+    with pytest.raises(ValueError):
+        retrieval_postprocessors()
@@ -1,3 +1,5 @@
+import asyncio
+
 import pytest
 
 from src.cache.in_memory_cache import InMemoryCache
@@ -43,3 +45,97 @@ def test_singleton_pattern():
     cache1 = InMemoryCache()
     cache2 = InMemoryCache()
     assert cache1 is cache2
+
+
+def test_get_refreshes_recency(cache):
+    cache.capacity = 2
+    cache.insert_or_append("key1", "value1")
+    cache.insert_or_append("key2", "value2")
+    # touch key1 so that key2 becomes the least recently used entry
+    assert cache.get("key1") == "value1"
+    cache.insert_or_append("key3", "value3")
+
+    assert cache.get("key2") is None
+    assert cache.get("key1") == "value1"
+    assert cache.get("key3") == "value3"
+
+
+def test_insert_or_append_byte_budget(cache):
+    cache.max_bytes = 1000
+    cache.capacity = 10
+    cache.insert_or_append("key1", "x" * 400)
+    cache.insert_or_append("key2", "x" * 400)
+    cache.insert_or_append("key3", "x" * 400)
+
+    assert cache.get("key1") is None
+    assert cache.get("key3") == "x" * 400
+    assert cache.stats()["bytes"] <= 1000
+
+
+def test_oversized_entry_keeps_other_entries(cache):
+    cache.max_bytes = 1000
+    cache.capacity = 10
+    cache.insert_or_append("key1", "x" * 100)
+    cache.insert_or_append("key2", "y" * 600)
+    # the conversation alone outgrows the cache: its oldest turn is dropped,
+    # not the other entry
+    cache.insert_or_append("key2", "z" * 600)
+    assert cache.get("key1") == "x" * 100
+    assert cache.get_turns("key2") == ["z" * 600]
+
+    # a turn larger than the whole cache is not stored
+    cache.insert_or_append("key2", "v" * 2000)
+    cache.insert_or_append("key3", "v" * 2000)
+    assert cache.get("key1") == "x" * 100
+    assert cache.get("key2") is None
+    assert cache.get("key3") is None
+    assert cache.stats()["bytes"] <= 1000
+
+
+def test_insert_or_append_ttl(cache):
+    cache.insert_or_append("key1", "value1", ttl=-1)
+    assert cache.get("key1") is None
+    assert cache.stats()["entries"] == 0
+
+    cache.insert_or_append("key1", "value2")
+    assert cache.get("key1") == "value2"
+
+
+def test_large_cache_is_striped(cache):
+    cache.capacity = 1000
+    assert cache.stats()["segments"] > 1
+    for i in range(1000):
+        cache.insert_or_append(f"key{i}", f"value{i}")
+    assert cache.stats()["entries"] == 1000
+    assert all(cache.get(f"key{i}") == f"value{i}" for i in range(1000))
+
+
+def test_get_turns(cache):
+    cache.insert_or_append("key1", "value1")
+    cache.insert_or_append("key1", "value2")
+    cache.insert_or_append("key1", "value3")
+    assert cache.get_turns("key1") == ["value1", "value2", "value3"]
+    assert cache.get_turns("key1", last=2) == ["value2", "value3"]
+    assert cache.get_turns("nonexistent_key") == []
+
+
+def test_max_turns(cache):
+    cache.max_turns = 2
+    for i in range(5):
+        cache.insert_or_append("key1", f"value{i}")
+    assert cache.get_turns("key1") == ["value3", "value4"]
+
+
+def test_get_history_token_budget(cache):
+    # every turn is estimated at 26 tokens
+    for i in range(5):
+        cache.insert_or_append("key1", f"{i}" * 100)
+    assert cache.get_history("key1", max_tokens=60) == "3" * 100 + "\n" + "4" * 100
+    assert cache.get_history("key1", max_tokens=10) is None
+    assert cache.get_history("nonexistent_key", max_tokens=60) is None
+
+
+def test_aget_history(cache):
+    cache.insert_or_append("key1", "value1")
+    cache.insert_or_append("key1", "value2")
+    assert asyncio.run(cache.aget_history("key1", max_tokens=3)) == "value2"
@@ -0,0 +1,112 @@
+import asyncio
+import os
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from src.cache.redis_cache import RedisCache
+
+
+@pytest.fixture
+def cache():
+    with patch("redis.StrictRedis") as redis_client, patch(
+        "redis.ConnectionPool"
+    ), patch.dict(os.environ, {"REDIS_CACHE_CONFIGURE": "false"}):
+        c = RedisCache()
+        c.initialize_redis()
+        c.redis_client = redis_client.return_value
+        yield c
+
+
+def test_insert_or_append_single_round_trip(cache):
+    pipeline = cache.redis_client.pipeline.return_value
+    cache.max_turns = 10
+    cache.ttl = 60
+    cache.insert_or_append("key1", "value1")
+
+    pipeline.rpush.assert_called_once_with("turns:key1", "value1")
+    pipeline.ltrim.assert_called_once_with("turns:key1", -10, -1)
+    pipeline.expire.assert_called_once_with("turns:key1", 60)
+    pipeline.execute.assert_called_once()
+    # the commands run as a MULTI/EXEC transaction
+    cache.redis_client.pipeline.assert_called_once_with(transaction=True)
+    cache.redis_client.get.assert_not_called()
+    cache.redis_client.set.assert_not_called()
+
+
+def test_insert_or_append_many(cache):
+    pipeline = cache.redis_client.pipeline.return_value
+    cache.insert_or_append_many([("key1", "value1"), ("key2", "value2")])
+
+    assert pipeline.rpush.call_count == 2
+    pipeline.execute.assert_called_once()
+
+
+def test_get(cache):
+    pipeline = cache.redis_client.pipeline.return_value
+    pipeline.execute.return_value = [["value1", "value2"], None]
+    assert cache.get("key1") == "value1\nvalue2"
+    pipeline.lrange.assert_called_with("turns:key1", 0, -1)
+    pipeline.getdel.assert_called_with("key1")
+    pipeline.execute.return_value = [[], None]
+    assert cache.get("key1") is None
+    pipeline.lpush.assert_not_called()
+
+
+def test_get_turns_moves_legacy_history(cache):
+    # the history string an earlier version stored under the bare key
+    pipeline = cache.redis_client.pipeline.return_value
+    pipeline.execute.side_effect = [[["value3"], "value1\nvalue2"], [1, True, True]]
+    cache.max_turns = 10
+    cache.ttl = 60
+
+    assert cache.get_turns("key1") == ["value1\nvalue2", "value3"]
+    pipeline.getdel.assert_called_once_with("key1")
+    pipeline.lpush.assert_called_once_with("turns:key1", "value1\nvalue2")
+    pipeline.ltrim.assert_called_once_with("turns:key1", -10, -1)
+    pipeline.expire.assert_called_once_with("turns:key1", 60)
+
+
+def test_aget_turns_moves_legacy_history(cache):
+    pipeline = MagicMock()
+    pipeline.execute = AsyncMock(side_effect=[[[], "value1"], [1]])
+    context = MagicMock()
+    context.__aenter__ = AsyncMock(return_value=pipeline)
+    context.__aexit__ = AsyncMock(return_value=False)
+    cache.async_redis_client = MagicMock()
+    cache.async_redis_client.pipeline.return_value = context
+
+    assert asyncio.run(cache.aget_turns("key1", last=2)) == ["value1"]
+    pipeline.lrange.assert_called_once_with("turns:key1", -2, -1)
+    pipeline.lpush.assert_called_once_with("turns:key1", "value1")
+
+
+def test_no_config_set_when_disabled():
+    with patch("redis.StrictRedis") as redis_client, patch(
+        "redis.ConnectionPool"
+    ), patch.dict(os.environ, {"REDIS_CACHE_CONFIGURE": "false"}):
+        RedisCache().initialize_redis()
+    redis_client.return_value.config_set.assert_not_called()
+
+
+def test_configure_server_only_sets_differing_values(cache):
+    cache.redis_client.config_get = MagicMock(
+        side_effect=lambda name: {
+            "maxmemory": {"maxmemory": str(500 * 1024**2)},
+            "maxmemory-policy": {"maxmemory-policy": "noeviction"},
+        }[name]
+    )
+    cache.configure_server({"maxmemory": "500mb", "maxmemory-policy": "allkeys-lru"})
+    cache.redis_client.config_set.assert_called_once_with(
+        "maxmemory-policy", "allkeys-lru"
+    )
+
+
+def test_initialize_configures_server_by_default():
+    with patch("redis.StrictRedis") as redis_client, patch(
+        "redis.ConnectionPool"
+    ), patch.dict(os.environ):
+        os.environ.pop("REDIS_CACHE_CONFIGURE", None)
+        redis_client.return_value.config_get.return_value = {}
+        RedisCache().initialize_redis()
+    assert redis_client.return_value.config_set.call_count == 2
@@ -0,0 +1,77 @@
+import pytest
+
+from src.cache.semantic_cache import SemanticCache
+
+
+@pytest.fixture
+def cache():
+    c = SemanticCache()
+    c.capacity = 3
+    c.threshold = 0.9
+    c.ttl = 60
+    c.clear()
+    return c
+
+
+def test_lookup_similar_query(cache):
+    cache.insert([1.0, 0.0, 0.0], "summary", "doc.txt", "v1")
+    # scaled and slightly rotated embeddings are still similar
+    assert cache.lookup([2.0, 0.1, 0.0], "v1") == ("summary", "doc.txt")
+    assert cache.stats()["hits"] == 1
+
+
+def test_lookup_dissimilar_query(cache):
+    cache.insert([1.0, 0.0, 0.0], "summary", "doc.txt", "v1")
+    assert cache.lookup([0.0, 1.0, 0.0], "v1") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_lookup_empty_cache(cache):
+    assert cache.lookup([1.0, 0.0, 0.0], None) is None
+
+
+def test_lookup_returns_most_similar(cache):
+    cache.insert([1.0, 0.0, 0.0], "first", "first.txt", "v1")
+    cache.insert([1.0, 0.3, 0.0], "second", "second.txt", "v1")
+    assert cache.lookup([1.0, 0.29, 0.0], "v1") == ("second", "second.txt")
+
+
+def test_index_version_change_invalidates(cache):
+    cache.insert([1.0, 0.0, 0.0], "summary", "doc.txt", "v1")
+    assert cache.lookup([1.0, 0.0, 0.0], "v2") is None
+    cache.insert([0.0, 1.0, 0.0], "new summary", "doc.txt", "v2")
+    assert cache.stats()["entries"] == 1
+    assert cache.lookup([1.0, 0.0, 0.0], "v2") is None
+
+
+def test_lookup_same_model(cache):
+    cache.insert([1.0, 0.0, 0.0], "granite", "doc.txt", "v1", "granite")
+    cache.insert([1.0, 0.1, 0.0], "llama", "doc.txt", "v1", "llama")
+    assert cache.lookup([1.0, 0.1, 0.0], "v1", "granite") == ("granite", "doc.txt")
+    assert cache.lookup([1.0, 0.0, 0.0], "v1", "llama") == ("llama", "doc.txt")
+    assert cache.lookup([1.0, 0.0, 0.0], "v1", "other") is None
+
+
+def test_lru_eviction(cache):
+    cache.insert([1.0, 0.0, 0.0], "x", "", "v1")
+    cache.insert([0.0, 1.0, 0.0], "y", "", "v1")
+    cache.insert([0.0, 0.0, 1.0], "z", "", "v1")
+    # touch x so that y becomes the least recently used entry
+    assert cache.lookup([1.0, 0.0, 0.0], "v1") == ("x", "")
+    cache.insert([1.0, 1.0, 1.0], "w", "", "v1")
+
+    assert cache.stats()["entries"] == 3
+    assert cache.lookup([0.0, 1.0, 0.0], "v1") is None
+    assert cache.lookup([1.0, 0.0, 0.0], "v1") == ("x", "")
+    assert cache.lookup([0.0, 0.0, 1.0], "v1") == ("z", "")
+
+
+def test_ttl_expiry(cache):
+    cache.ttl = -1
+    cache.insert([1.0, 0.0, 0.0], "summary", "doc.txt", "v1")
+    assert cache.lookup([1.0, 0.0, 0.0], "v1") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_singleton_pattern():
+    assert SemanticCache() is SemanticCache()
@@ -0,0 +1,99 @@
+import asyncio
+import threading
+
+import pytest
+from llama_index.token_counter.mock_embed_model import MockEmbedding
+
+from utils.embedding_cache import CachedEmbedding, QueryEmbeddingCache
+
+
+class CountingEmbedding(MockEmbedding):
+    """Mock embedding model counting the queries it embeds."""
+
+    calls: int = 0
+
+    def _get_query_embedding(self, query):
+        self.calls += 1
+        return [float(len(query))] * self.embed_dim
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    monkeypatch.delenv("OLS_QUERY_EMBEDDING_CACHE_PATH", raising=False)
+    monkeypatch.setenv("OLS_QUERY_EMBEDDING_CACHE_MAX_ENTRIES", "2")
+    c = QueryEmbeddingCache()
+    c.initialize_cache()
+    return c
+
+
+def test_query_embedded_once(cache):
+    inner = CountingEmbedding(embed_dim=4)
+    embed_model = CachedEmbedding(inner)
+
+    first = embed_model.get_query_embedding("How do I scale a deployment?")
+    second = embed_model.get_query_embedding("  How do I scale\na deployment? ")
+    assert first == second
+    assert inner.calls == 1
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 1, "hit_rate": 0.5}
+
+
+def test_shared_across_wrappers(cache):
+    inner = CountingEmbedding(embed_dim=4)
+    CachedEmbedding(inner).get_query_embedding("query")
+    asyncio.run(CachedEmbedding(inner).aget_query_embedding("query"))
+    assert inner.calls == 1
+
+
+def test_keyed_by_model(cache):
+    small = CountingEmbedding(embed_dim=2, model_name="small")
+    large = CountingEmbedding(embed_dim=4, model_name="large")
+    assert len(CachedEmbedding(small).get_query_embedding("query")) == 2
+    assert len(CachedEmbedding(large).get_query_embedding("query")) == 4
+    assert small.calls == large.calls == 1
+
+
+def test_lru_eviction(cache):
+    cache.put("model", "a", [1.0])
+    cache.put("model", "b", [2.0])
+    cache.get("model", "a")
+    cache.put("model", "c", [3.0])
+    assert cache.get("model", "b") is None
+    assert cache.get("model", "a") == [1.0]
+    assert cache.get("model", "c") == [3.0]
+
+
+def test_text_embeddings_not_cached(cache):
+    embed_model = CachedEmbedding(CountingEmbedding(embed_dim=4))
+    embed_model.get_text_embedding_batch(["a", "b"])
+    assert cache.stats()["entries"] == 0
+
+
+def test_save_and_load(cache, tmp_path, monkeypatch):
+    path = str(tmp_path / "embeddings.npz")
+    cache.put("small", "a", [1.0, 2.0])
+    cache.put("large", "b", [1.0, 2.0, 3.0])
+    cache.save(path)
+
+    monkeypatch.setenv("OLS_QUERY_EMBEDDING_CACHE_PATH", path)
+    cache.initialize_cache()
+    assert cache.get("small", "a") == [1.0, 2.0]
+    assert cache.get("large", "b") == [1.0, 2.0, 3.0]
+
+
+def test_constructor_loads_saved_cache(cache, tmp_path, monkeypatch):
+    path = str(tmp_path / "embeddings.npz")
+    cache.put("model", "a", [1.0, 2.0])
+    cache.save(path)
+
+    # a new process creating the singleton with a saved cache
+    monkeypatch.setenv("OLS_QUERY_EMBEDDING_CACHE_PATH", path)
+    monkeypatch.setattr(QueryEmbeddingCache, "_instance", None)
+    created = []
+    thread = threading.Thread(
+        target=lambda: created.append(QueryEmbeddingCache()), daemon=True
+    )
+    thread.start()
+    thread.join(timeout=5)
+
+    assert created, "creating the cache deadlocked"
+    assert created[0].get("model", "a") == [1.0, 2.0]
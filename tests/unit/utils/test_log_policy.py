@@ -0,0 +1,88 @@
+import logging
+
+import pytest
+
+from utils.log_policy import (
+    HISTORY,
+    PROMPT,
+    RESPONSE,
+    LogPolicy,
+    log_payload,
+    log_request,
+)
+
+
+@pytest.fixture
+def policy(monkeypatch):
+    monkeypatch.setenv("OLS_LOG_SAMPLE_PROMPTS", "0.5")
+    monkeypatch.setenv("OLS_LOG_SAMPLE_RESPONSES", "1")
+    monkeypatch.setenv("OLS_LOG_SAMPLE_HISTORY", "0")
+    monkeypatch.setenv("OLS_LOG_PAYLOAD_MAX_CHARS", "10")
+    monkeypatch.setenv("OLS_LOG_REQUEST_MAX_CHARS", "5")
+    policy = LogPolicy()
+    policy.initialize_policy()
+    yield policy
+    monkeypatch.undo()
+    policy.initialize_policy()
+
+
+def test_sampling_per_conversation(policy):
+    conversations = [f"conversation-{i}" for i in range(1000)]
+    sampled = [c for c in conversations if policy.sampled(PROMPT, c)]
+
+    assert 400 < len(sampled) < 600
+    # a conversation is always or never sampled
+    assert all(policy.sampled(PROMPT, c) for c in sampled)
+    assert all(policy.sampled(RESPONSE, c) for c in conversations)
+    assert not any(policy.sampled(HISTORY, c) for c in conversations)
+
+
+def test_truncate(policy):
+    assert policy.truncate("short") == "short"
+    assert policy.truncate("x" * 25) == "x" * 10 + "... [15 more characters]"
+
+    policy.max_chars = 0
+    assert policy.truncate("x" * 25) == "x" * 25
+
+
+def test_log_payload(policy, caplog):
+    logger = logging.getLogger("test_log_payload")
+    logger.setLevel(logging.INFO)
+
+    with caplog.at_level(logging.INFO, logger="test_log_payload"):
+        log_payload(logger, RESPONSE, "1234", "response", "x" * 25)
+        log_payload(logger, HISTORY, "1234", "history", "never logged")
+
+    assert [r.getMessage() for r in caplog.records] == [
+        "1234 response: xxxxxxxxxx... [15 more characters]"
+    ]
+    # the record points at the caller
+    assert caplog.records[0].filename == "test_log_policy.py"
+
+
+def test_log_payload_is_lazy(policy):
+    logger = logging.getLogger("test_log_payload_is_lazy")
+    logger.setLevel(logging.WARNING)
+
+    def payload():
+        raise AssertionError("the payload should not be built")
+
+    log_payload(logger, RESPONSE, "1234", "response", payload)
+
+    logger.setLevel(logging.INFO)
+    log_payload(logger, HISTORY, "1234", "history", payload)
+
+
+def test_log_request_is_not_sampled(policy, caplog):
+    logger = logging.getLogger("test_log_request")
+    logger.setLevel(logging.INFO)
+    policy.sample_rates[PROMPT] = 0
+
+    with caplog.at_level(logging.INFO, logger="test_log_request"):
+        log_request(logger, "1234", "Incoming request", "x" * 25)
+        log_payload(logger, PROMPT, "1234", "Request query", "x" * 25)
+
+    assert [r.getMessage() for r in caplog.records] == [
+        "1234 Incoming request: xxxxx... [20 more characters]"
+    ]
+    assert caplog.records[0].filename == "test_log_policy.py"
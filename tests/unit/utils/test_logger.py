@@ -0,0 +1,86 @@
+import json
+import logging
+import sys
+import time
+import uuid
+
+from utils.logger import JsonFormatter, Logger
+
+
+def wait_for_lines(path, count, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if path.exists():
+            lines = path.read_text().splitlines()
+            if len(lines) >= count:
+                return lines
+        time.sleep(0.01)
+    return path.read_text().splitlines() if path.exists() else []
+
+
+def test_handlers_set_up_once():
+    name = f"test-{uuid.uuid4()}"
+    for _ in range(5):
+        logger = Logger(name).logger
+
+    assert len(logger.handlers) == 1
+
+
+def test_async_file_logging(tmp_path, monkeypatch):
+    logfile = tmp_path / "ols.log"
+    monkeypatch.setenv("LOG_FILE_NAME", str(logfile))
+    name = f"test-{uuid.uuid4()}"
+
+    for _ in range(3):
+        Logger(name).logger.info("hello")
+
+    # every record is written once, by the background listener
+    lines = wait_for_lines(logfile, 3)
+    assert len(lines) == 3
+    assert all(line.endswith("INFO: hello") for line in lines)
+
+
+def test_sync_json_logging(tmp_path, monkeypatch):
+    logfile = tmp_path / "ols.log"
+    monkeypatch.setenv("LOG_FILE_NAME", str(logfile))
+    monkeypatch.setenv("LOG_FORMAT", "json")
+    monkeypatch.setenv("LOG_ASYNC", "False")
+    name = f"test-{uuid.uuid4()}"
+
+    Logger(name).logger.warning("hello %s", "world")
+
+    entry = json.loads(logfile.read_text())
+    assert entry["message"] == "hello world"
+    assert entry["level"] == "WARNING"
+    assert entry["logger"] == name
+    assert entry["file"] == "test_logger.py"
+
+
+def test_json_formatter_exception():
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = logging.LogRecord(
+            "test", logging.ERROR, __file__, 1, "failed", None, sys.exc_info()
+        )
+
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["message"] == "failed"
+    assert "ValueError: boom" in entry["exception"]
+
+
+def test_async_json_logging_exception(tmp_path, monkeypatch):
+    logfile = tmp_path / "ols.log"
+    monkeypatch.setenv("LOG_FILE_NAME", str(logfile))
+    monkeypatch.setenv("LOG_FORMAT", "json")
+    name = f"test-{uuid.uuid4()}"
+
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        Logger(name).logger.exception("failed %s", "task")
+
+    lines = wait_for_lines(logfile, 1)
+    entry = json.loads(lines[0])
+    assert entry["message"] == "failed task"
+    assert "ValueError: boom" in entry["exception"]
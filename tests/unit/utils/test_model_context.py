@@ -0,0 +1,151 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from genai.credentials import Credentials
+from genai.exceptions import GenAiException
+from genai.schemas import GenerateParams
+from genai.services.connection_manager import ConnectionManager
+from langchain.schema import Generation, LLMResult
+from llama_index.token_counter.mock_embed_model import MockEmbedding
+
+import utils.model_context
+from utils.embedding_cache import CachedEmbedding
+from utils.model_context import (
+    AsyncLangChainInterface,
+    get_embed_model,
+    get_local_embed_model,
+)
+from utils.predictor_registry import PredictorRegistry
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    loaded = []
+
+    def load(model_name, precision):
+        loaded.append((model_name, precision))
+        return MockEmbedding(embed_dim=4, model_name=model_name)
+
+    monkeypatch.setattr(utils.model_context, "local_embed_models", {})
+    monkeypatch.setattr(utils.model_context, "load_local_embed_model", load)
+    return loaded
+
+
+def test_local_embed_model_loaded_once(loads):
+    first = get_local_embed_model(precision="int8")
+    second = get_local_embed_model(precision="int8")
+    assert first is second
+    assert len(loads) == 1
+
+    get_local_embed_model(precision="fp32")
+    assert len(loads) == 2
+
+
+def test_get_embed_model_local(loads, monkeypatch):
+    monkeypatch.setenv("OLS_LOCAL_EMBED_MODEL_PRECISION", "INT8")
+    embed_model = get_embed_model()
+    assert isinstance(embed_model, CachedEmbedding)
+    assert embed_model.model_id == "local:BAAI/bge-base-en:int8"
+    assert get_embed_model().embed_model is embed_model.embed_model
+    assert loads == [("BAAI/bge-base-en", "int8")]
+
+
+def test_get_embed_model_unknown_precision(loads, monkeypatch):
+    monkeypatch.setenv("OLS_LOCAL_EMBED_MODEL_PRECISION", "int4")
+    with pytest.raises(ValueError):
+        get_embed_model()
+    assert loads == []
+
+
+@pytest.fixture
+def generate_client(monkeypatch):
+    # the SDK's async generate client, answering every prompt with its length
+    requests = []
+
+    def handler(request):
+        body = json.loads(request.content)
+        requests.append(body)
+        return httpx.Response(
+            200,
+            json={
+                "id": "request-1",
+                "model_id": body["model_id"],
+                "created_at": "2024-01-01T00:00:00.000Z",
+                "results": [
+                    {
+                        "generated_text": f"{len(prompt)} characters",
+                        "generated_token_count": 2,
+                        "input_token_count": 3,
+                        "stop_reason": "eos_token",
+                    }
+                    for prompt in body["inputs"]
+                ],
+            },
+        )
+
+    monkeypatch.setattr(
+        ConnectionManager,
+        "async_generate_client",
+        httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    )
+    return requests
+
+
+def predictor(**kwargs):
+    return AsyncLangChainInterface(
+        model="model",
+        params=GenerateParams(decoding_method="greedy", max_new_tokens=8),
+        credentials=Credentials("key", api_endpoint="http://bam.test"),
+        **kwargs,
+    )
+
+
+def test_predictor_generates_asynchronously(generate_client, monkeypatch):
+    # the blocking client is never used
+    monkeypatch.setattr(
+        AsyncLangChainInterface,
+        "_generate",
+        lambda *args, **kwargs: pytest.fail("blocking call"),
+    )
+
+    registry = PredictorRegistry()
+    registry.initialize_registry()
+    response = asyncio.run(predictor().apredict("hello", stop=["\n"]))
+
+    assert response == "5 characters"
+    assert registry.stats()["requests"] == 1
+    assert generate_client[0]["model_id"] == "model"
+    assert generate_client[0]["inputs"] == ["hello"]
+    assert generate_client[0]["parameters"]["stop_sequences"] == ["\n"]
+
+
+def test_predictor_error_raised(monkeypatch):
+    monkeypatch.setattr(
+        ConnectionManager,
+        "async_generate_client",
+        httpx.AsyncClient(
+            transport=httpx.MockTransport(
+                lambda request: httpx.Response(
+                    400, json={"status_code": 400, "error": "Bad", "message": "bad"}
+                )
+            )
+        ),
+    )
+    with pytest.raises(GenAiException):
+        asyncio.run(predictor().apredict("hello"))
+
+
+def test_streaming_predictor_falls_back_to_thread(generate_client, monkeypatch):
+    calls = []
+
+    def generate(self, prompts, stop=None, run_manager=None, **kwargs):
+        calls.append(prompts)
+        return LLMResult(generations=[[Generation(text="streamed")]])
+
+    monkeypatch.setattr(AsyncLangChainInterface, "_generate", generate)
+
+    assert asyncio.run(predictor(streaming=True).apredict("hello")) == "streamed"
+    assert calls == [["hello"]]
+    assert generate_client == []
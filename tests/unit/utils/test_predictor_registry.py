@@ -0,0 +1,122 @@
+import threading
+
+import pytest
+from genai.services.connection_manager import ConnectionManager
+from genai.utils.http_provider import HttpProvider
+
+import utils.model_context
+from tests.mock_classes.langchain_interface import mock_langchain_interface
+from utils.model_context import get_watsonx_predictor
+from utils.predictor_registry import PredictorRegistry
+
+
+@pytest.fixture
+def registry():
+    r = PredictorRegistry()
+    r.initialize_registry()
+    return r
+
+
+def test_predictor_created_once(registry):
+    created = []
+
+    def create():
+        created.append(object())
+        return created[-1]
+
+    predictor1 = registry.get(("model", 1, 256), create)
+    predictor2 = registry.get(("model", 1, 256), create)
+    assert predictor1 is predictor2
+    assert len(created) == 1
+
+    stats = registry.stats()
+    assert stats["hits"] == 1
+    assert stats["creations"] == 1
+    assert stats["predictors"] == 1
+    assert stats["requests"] == 0
+
+
+def test_get_watsonx_predictor_is_keyed_by_params(registry, monkeypatch):
+    ml = mock_langchain_interface("test response")
+    monkeypatch.setattr(utils.model_context, "AsyncLangChainInterface", ml)
+
+    predictor = get_watsonx_predictor(model="model", max_new_tokens=4)
+    assert get_watsonx_predictor(model="model", max_new_tokens=4) is predictor
+    assert get_watsonx_predictor(model="model") is not predictor
+    assert get_watsonx_predictor(model="other", max_new_tokens=4) is not predictor
+    assert registry.stats()["creations"] == 3
+
+
+def test_predictors_created_outside_the_lock(registry):
+    # creating a predictor waits for another key's predictor to be created
+    other_created = threading.Event()
+    created = []
+
+    def create_slow():
+        assert other_created.wait(timeout=5)
+        created.append("slow")
+        return "slow"
+
+    def create_other():
+        created.append("other")
+        other_created.set()
+        return "other"
+
+    slow = threading.Thread(target=registry.get, args=("slow", create_slow))
+    slow.start()
+    assert registry.get("other", create_other) == "other"
+    slow.join(timeout=5)
+    assert created == ["other", "slow"]
+
+
+def test_predictor_created_once_by_concurrent_requests(registry):
+    release = threading.Event()
+    created = []
+
+    def create():
+        release.wait(timeout=5)
+        created.append(object())
+        return created[-1]
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(registry.get("key", create)))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join(timeout=5)
+    assert len(created) == 1
+    assert results == created * 4
+
+
+def test_generate_client_created_once(registry, monkeypatch):
+    monkeypatch.setattr(ConnectionManager, "async_generate_client", None)
+    client = registry.generate_client()
+    assert registry.generate_client() is client
+    assert ConnectionManager.async_generate_client is client
+
+
+def test_pool_limits_set_through_transport_options(monkeypatch):
+    monkeypatch.setattr(HttpProvider, "default_http_transport_options", {})
+    monkeypatch.setenv("BAM_MAX_CONNECTIONS", "7")
+    PredictorRegistry().initialize_registry()
+
+    limits = HttpProvider.default_http_transport_options["limits"]
+    assert limits.max_connections == 7
+    # the SDK's own clients are left as they are
+    assert "transport" not in HttpProvider.default_http_client_options
+
+
+def test_requests_counted(registry):
+    with registry.track_request():
+        assert registry.stats()["active_requests"] == 1
+    with pytest.raises(RuntimeError):
+        with registry.track_request():
+            raise RuntimeError("request failed")
+
+    stats = registry.stats()
+    assert stats["requests"] == 2
+    assert stats["active_requests"] == 0
@@ -0,0 +1,66 @@
+import pytest
+
+import utils.prompt_budget
+from utils.prompt_budget import (
+    KEEP_END,
+    KEEP_START,
+    EstimateTokenizer,
+    PromptBudget,
+    PromptTokenStats,
+    PromptTooLongError,
+)
+
+TEMPLATE = "History:\n{history}\nRequest: {query}\n"
+
+
+@pytest.fixture
+def budget(monkeypatch):
+    monkeypatch.setattr(
+        utils.prompt_budget, "get_tokenizer", lambda model: EstimateTokenizer()
+    )
+    monkeypatch.setenv("OLS_MODEL_CONTEXT_WINDOW", "40")
+    PromptTokenStats().initialize_stats()
+    return PromptBudget("model", max_new_tokens=10)
+
+
+def test_prompt_fits_unchanged(budget):
+    fitted = budget.fit(
+        "yaml", TEMPLATE, truncatable={"history": KEEP_END}, history="hi", query="q"
+    )
+    assert fitted == {"history": "hi", "query": "q"}
+    stats = PromptTokenStats().stats()["yaml"]
+    assert stats["prompts"] == 1
+    assert stats["truncated"] == 0
+    assert stats["tokens"] == budget.count(TEMPLATE.format(history="hi", query="q"))
+
+
+def test_history_keeps_latest_turns(budget):
+    history = "\n".join(f"turn number {i}" for i in range(10))
+    fitted = budget.fit(
+        "yaml", TEMPLATE, truncatable={"history": KEEP_END}, history=history, query="q"
+    )
+    assert fitted["history"].endswith("turn number 9")
+    assert "turn number 0" not in fitted["history"]
+    prompt = TEMPLATE.format(**fitted)
+    assert budget.count(prompt) <= 30
+    assert PromptTokenStats().stats()["yaml"]["truncated"] == 1
+
+
+def test_fixed_part_too_long(budget):
+    with pytest.raises(PromptTooLongError):
+        budget.fit("yaml", TEMPLATE, history="", query="q" * 200)
+
+
+def test_truncate_cuts_long_line(budget):
+    assert budget.truncate("a" * 100, 2, KEEP_START) == "aaaaaaaa"
+    assert budget.truncate("a" * 99 + "b", 1, KEEP_END) == "aaab"
+    assert budget.truncate("anything", 0) == ""
+
+
+def test_openai_tokenizer_never_downloaded(monkeypatch):
+    import sys
+
+    # tiktoken downloads its encodings on first use
+    monkeypatch.setitem(sys.modules, "tiktoken", None)
+    monkeypatch.setitem(sys.modules, "transformers", None)
+    assert isinstance(utils.prompt_budget.load_tokenizer("gpt-4"), EstimateTokenizer)
@@ -0,0 +1,89 @@
+import asyncio
+import threading
+
+import pytest
+
+from utils.stage_executor import StageExecutor, run_blocking
+
+
+async def stage(value, delay=0):
+    await asyncio.sleep(delay)
+    return value
+
+
+def test_stages_run_concurrently():
+    async def run():
+        event = asyncio.Event()
+
+        async def waiting_stage():
+            # only completes if the other stage runs at the same time
+            await asyncio.wait_for(event.wait(), timeout=5)
+            return 1
+
+        async def setting_stage():
+            event.set()
+            return 2
+
+        async with StageExecutor("1234") as stages:
+            stages.submit("first", waiting_stage())
+            stages.submit("second", setting_stage())
+            assert await stages.result("first") == 1
+            assert await stages.result("second") == 2
+            assert set(stages.timings()) == {"first", "second"}
+
+    asyncio.run(run())
+
+
+def test_stage_exception_is_raised():
+    async def failing_stage():
+        raise ValueError("boom")
+
+    async def run():
+        async with StageExecutor("1234") as stages:
+            stages.submit("failing", failing_stage())
+            with pytest.raises(ValueError):
+                await stages.result("failing")
+
+    asyncio.run(run())
+
+
+def test_duplicate_stage_name():
+    async def run():
+        async with StageExecutor("1234") as stages:
+            stages.submit("stage", stage(1))
+            with pytest.raises(ValueError):
+                stages.submit("stage", stage(2))
+
+    asyncio.run(run())
+
+
+def test_cancel_stage():
+    async def run():
+        async with StageExecutor("1234") as stages:
+            task = stages.submit("stage", stage(1, delay=10))
+            stages.cancel("stage")
+            assert not stages.submitted("stage")
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            # cancelling an unknown stage is a no-op
+            stages.cancel("unknown")
+
+    asyncio.run(run())
+
+
+def test_exit_cancels_pending_stages():
+    async def run():
+        async with StageExecutor("1234") as stages:
+            task = stages.submit("stage", stage(1, delay=10))
+        assert not stages.submitted("stage")
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+
+
+def test_run_blocking():
+    async def run():
+        return await run_blocking(threading.current_thread)
+
+    assert asyncio.run(run()) is not threading.current_thread()
@@ -0,0 +1,101 @@
+import pytest
+
+from utils.warmup import SKIPPED, Warmup
+
+
+@pytest.fixture
+def warmup():
+    warmup = Warmup()
+    warmup.initialize_warmup()
+    yield warmup
+    warmup.initialize_warmup()
+
+
+def test_not_ready_before_run(warmup):
+    warmup.add("indexes", lambda: None)
+
+    assert not warmup.ready
+    assert warmup.status() == {
+        "ready": False,
+        "seconds": None,
+        "components": {"indexes": {"status": "pending", "required": False}},
+    }
+
+
+def test_run_records_every_component(warmup):
+    calls = []
+
+    def failing():
+        calls.append("failing")
+        raise RuntimeError("no index")
+
+    warmup.add("imports", lambda: calls.append("imports"))
+    warmup.add("indexes", failing)
+    warmup.add("query", lambda: SKIPPED)
+    warmup.add("templates", lambda: calls.append("templates"))
+    warmup.run()
+
+    # a failed optional component does not stop the warmup
+    assert calls == ["imports", "failing", "templates"]
+    assert warmup.ready
+    status = warmup.status()
+    assert status["seconds"] >= 0
+    components = status["components"]
+    assert components["imports"]["status"] == "ok"
+    assert components["indexes"]["status"] == "failed"
+    assert components["indexes"]["error"] == "no index"
+    assert components["query"]["status"] == SKIPPED
+    assert all(component["seconds"] >= 0 for component in components.values())
+
+
+def test_start_runs_in_background_once(warmup):
+    calls = []
+    warmup.add("imports", lambda: calls.append("imports"))
+
+    warmup.start()
+    warmup.start()
+    assert warmup.finished.wait(5)
+
+    assert calls == ["imports"]
+    assert warmup.thread.name == "ols-warmup"
+
+
+def test_failed_required_component_retried(warmup, monkeypatch):
+    attempts = []
+
+    def indexes():
+        attempts.append(len(attempts))
+        if len(attempts) < 3:
+            raise RuntimeError("no index")
+
+    warmup.retry_seconds = 0.01
+    warmup.add("indexes", indexes, required=True)
+    warmup.add("query", lambda: None)
+
+    warmup.run()
+    # no request can be served without the indexes
+    assert warmup.finished.is_set()
+    assert not warmup.ready
+    status = warmup.status()
+    assert status["components"]["indexes"]["status"] == "failed"
+    assert status["components"]["indexes"]["required"]
+
+    warmup.run_and_retry()
+    assert warmup.ready
+    assert warmup.status()["components"]["indexes"]["status"] == "ok"
+    # run again by run_and_retry, then retried once
+    assert len(attempts) == 3
+
+
+def test_retries_stop_with_the_warmup(warmup):
+    def indexes():
+        raise RuntimeError("no index")
+
+    warmup.add("indexes", indexes, required=True)
+    warmup.start()
+    assert warmup.finished.wait(5)
+    assert not warmup.ready
+
+    warmup.stopped.set()
+    warmup.thread.join(timeout=5)
+    assert not warmup.thread.is_alive()
@@ -0,0 +1,259 @@
+import json
+import os
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, List, Union
+
+import numpy as np
+from llama_index.embeddings.base import BaseEmbedding
+from llama_index.bridge.pydantic import PrivateAttr
+
+from src import constants
+
+
+class QueryEmbeddingCache:
+    """
+    Process-wide LRU cache of query embeddings.
+
+    Entries are keyed by the id of the embedding model and the normalized
+    query text, so the same question asked again, by another conversation
+    or through another retriever, is only embedded once. The cache can be
+    saved to and restored from a file to survive restarts.
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        """Implement Singleton pattern with thread safety."""
+        with cls._lock:
+            if not cls._instance:
+                cls._instance = super(QueryEmbeddingCache, cls).__new__(cls)
+                cls._instance.initialize_cache()
+        return cls._instance
+
+    def initialize_cache(self):
+        """
+        Initialize the QueryEmbeddingCache, restoring the saved entries if
+        OLS_QUERY_EMBEDDING_CACHE_PATH points to a saved cache.
+        """
+        self.capacity = int(
+            os.getenv(
+                "OLS_QUERY_EMBEDDING_CACHE_MAX_ENTRIES",
+                constants.QUERY_EMBEDDING_CACHE_MAX_ENTRIES,
+            )
+        )
+        self.path = os.getenv("OLS_QUERY_EMBEDDING_CACHE_PATH") or None
+        # guards the entries; not the class lock, which is held while the
+        # singleton is created and loads the saved entries
+        self.lock = threading.Lock()
+        self.clear()
+        if self.path and os.path.exists(self.path):
+            self.load(self.path)
+
+    def clear(self) -> None:
+        """
+        Drop every cached embedding and reset the statistics.
+
+        Returns:
+        - None
+        """
+        # (model id, normalized query) -> embedding, least recently used first
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, model_id: str, query: str) -> Union[List[float], None]:
+        """
+        Get the cached embedding of a query.
+
+        Args:
+        - model_id (str): The id of the embedding model.
+        - query (str): The query.
+
+        Returns:
+        - Union[List[float], None]: The embedding, or None if it is not cached.
+        """
+        key = (model_id, self.normalize(query))
+        with self.lock:
+            embedding = self.entries.get(key)
+            if embedding is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return embedding
+
+    def put(self, model_id: str, query: str, embedding: List[float]) -> None:
+        """
+        Cache the embedding of a query.
+
+        Args:
+        - model_id (str): The id of the embedding model.
+        - query (str): The query.
+        - embedding (List[float]): Its embedding.
+
+        Returns:
+        - None
+        """
+        if self.capacity <= 0:
+            return
+        key = (model_id, self.normalize(query))
+        with self.lock:
+            self.entries[key] = embedding
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        """
+        Report the cache usage.
+
+        Returns:
+        - dict: Number of entries, hits, misses and the hit rate.
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def save(self, path: Union[str, None] = None) -> None:
+        """
+        Write the cached embeddings to a file.
+
+        Args:
+        - path (str): The file, OLS_QUERY_EMBEDDING_CACHE_PATH by default.
+
+        Returns:
+        - None
+        """
+        path = path or self.path
+        if not path:
+            return
+        with self.lock:
+            entries = list(self.entries.items())
+
+        # one float32 matrix per model, as models differ in dimensions
+        queries = {}
+        vectors = {}
+        for (model_id, query), embedding in entries:
+            queries.setdefault(model_id, []).append(query)
+            vectors.setdefault(model_id, []).append(embedding)
+        models = list(queries)
+        arrays = {
+            f"vectors_{i}": np.asarray(vectors[model_id], dtype=np.float32)
+            for i, model_id in enumerate(models)
+        }
+        index = json.dumps([[model_id, queries[model_id]] for model_id in models])
+
+        with open(path + ".tmp", "wb") as f:
+            np.savez(f, index=np.array(index), **arrays)
+        os.replace(path + ".tmp", path)
+
+    def load(self, path: str) -> None:
+        """
+        Add the embeddings saved to a file to the cache.
+
+        Args:
+        - path (str): The file written by `save`.
+
+        Returns:
+        - None
+        """
+        with np.load(path) as data:
+            index = json.loads(str(data["index"]))
+            for i, (model_id, queries) in enumerate(index):
+                for query, embedding in zip(queries, data[f"vectors_{i}"]):
+                    self.put(model_id, query, embedding.tolist())
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """
+        Normalize the query text used as cache key: unicode compatibility
+        forms are folded and whitespace is collapsed. The case is kept, as
+        embedding models can be case sensitive.
+        """
+        return " ".join(unicodedata.normalize("NFKC", query).split())
+
+
+class CachedEmbedding(BaseEmbedding):
+    """
+    Embedding model looking query embeddings up in the `QueryEmbeddingCache`
+    before calling the wrapped model. Document embeddings are not cached.
+    """
+
+    # private, as pydantic would copy a wrapped model passed as a field
+    _embed_model: BaseEmbedding = PrivateAttr()
+    _model_id: Union[str, None] = PrivateAttr()
+
+    def __init__(
+        self,
+        embed_model: BaseEmbedding,
+        model_id: Union[str, None] = None,
+        **kwargs: Any,
+    ):
+        """
+        Initialize the CachedEmbedding.
+
+        Args:
+        - embed_model (BaseEmbedding): The model to cache the query embeddings of.
+        - model_id (str): The id of the model in the cache keys, derived from
+          its class and name by default. Variants of a model giving different
+          embeddings, e.g. quantized ones, need their own id.
+        """
+        self._embed_model = embed_model
+        self._model_id = model_id
+        super().__init__(
+            model_name=embed_model.model_name,
+            embed_batch_size=embed_model.embed_batch_size,
+            **kwargs,
+        )
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    @property
+    def embed_model(self) -> BaseEmbedding:
+        """The wrapped embedding model."""
+        return self._embed_model
+
+    @property
+    def model_id(self) -> str:
+        """The id of the wrapped model, the part of the cache key naming it."""
+        if self._model_id:
+            return self._model_id
+        model = self.embed_model
+        base_url = getattr(model, "base_url", None)
+        model_id = f"{type(model).__name__}:{model.model_name}"
+        return f"{model_id}@{base_url}" if base_url else model_id
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        cache = QueryEmbeddingCache()
+        embedding = cache.get(self.model_id, query)
+        if embedding is None:
+            embedding = self.embed_model.get_query_embedding(query)
+            cache.put(self.model_id, query, embedding)
+        return embedding
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        cache = QueryEmbeddingCache()
+        embedding = cache.get(self.model_id, query)
+        if embedding is None:
+            embedding = await self.embed_model.aget_query_embedding(query)
+            cache.put(self.model_id, query, embedding)
+        return embedding
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self.embed_model.get_text_embedding(text)
+
+    async def _aget_text_embedding(self, text: str) -> List[float]:
+        return await self.embed_model.aget_text_embedding(text)
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_model.get_text_embedding_batch(texts)
@@ -0,0 +1,156 @@
+import logging
+import os
+import threading
+import zlib
+from typing import Union
+
+from src import constants
+
+# categories of the payloads logged by the query helpers
+PROMPT = "prompt"
+RESPONSE = "response"
+HISTORY = "history"
+
+
+class LogPolicy:
+    """
+    Decides which prompts, LLM responses and conversation histories get
+    logged, and how much of them.
+
+    Each category has a sampling rate, `OLS_LOG_SAMPLE_PROMPTS`,
+    `OLS_LOG_SAMPLE_RESPONSES` and `OLS_LOG_SAMPLE_HISTORY`, between 0 (never
+    logged) and 1 (always logged). Sampling is decided per conversation, so
+    a sampled conversation logs all its payloads of the category. Logged
+    payloads are cut to `OLS_LOG_PAYLOAD_MAX_CHARS` characters, 0 for no limit.
+
+    Incoming requests are always logged, their query cut to
+    `OLS_LOG_REQUEST_MAX_CHARS` characters.
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        """Implement Singleton pattern with thread safety."""
+        with cls._lock:
+            if not cls._instance:
+                cls._instance = super(LogPolicy, cls).__new__(cls)
+                cls._instance.initialize_policy()
+        return cls._instance
+
+    def initialize_policy(self):
+        """
+        Initialize the LogPolicy from the environment.
+        """
+        self.sample_rates = {
+            PROMPT: float(
+                os.getenv("OLS_LOG_SAMPLE_PROMPTS", constants.LOG_SAMPLE_PROMPTS)
+            ),
+            RESPONSE: float(
+                os.getenv("OLS_LOG_SAMPLE_RESPONSES", constants.LOG_SAMPLE_RESPONSES)
+            ),
+            HISTORY: float(
+                os.getenv("OLS_LOG_SAMPLE_HISTORY", constants.LOG_SAMPLE_HISTORY)
+            ),
+        }
+        self.max_chars = int(
+            os.getenv("OLS_LOG_PAYLOAD_MAX_CHARS", constants.LOG_PAYLOAD_MAX_CHARS)
+        )
+        self.request_max_chars = int(
+            os.getenv("OLS_LOG_REQUEST_MAX_CHARS", constants.LOG_REQUEST_MAX_CHARS)
+        )
+
+    def sampled(self, category: str, conversation: str) -> bool:
+        """
+        Check whether the payloads of a category are logged for a conversation.
+
+        Args:
+        - category (str): The category of the payload.
+        - conversation (str): The identifier for the conversation.
+
+        Returns:
+        - bool: True when the payloads are logged.
+        """
+        rate = self.sample_rates.get(category, 1.0)
+        if rate >= 1:
+            return True
+        if rate <= 0:
+            return False
+        key = f"{category}:{conversation}".encode()
+        return zlib.crc32(key) / 2**32 < rate
+
+    def truncate(self, text: str, max_chars: Union[int, None] = None) -> str:
+        """
+        Cut a payload to the maximum number of characters.
+
+        Args:
+        - text (str): The payload.
+        - max_chars (int): The maximum number of characters, `max_chars` if None.
+
+        Returns:
+        - str: The payload, with the number of characters cut noted at its end.
+        """
+        if max_chars is None:
+            max_chars = self.max_chars
+        if not max_chars or len(text) <= max_chars:
+            return text
+        return f"{text[:max_chars]}... [{len(text) - max_chars} more characters]"
+
+
+def log_payload(logger, category, conversation, label, payload) -> None:
+    """
+    Log a prompt, LLM response or conversation history at INFO, if the
+    logger is enabled for INFO and the conversation is sampled.
+
+    Args:
+    - logger (logging.Logger): The logger.
+    - category (str): `PROMPT`, `RESPONSE` or `HISTORY`.
+    - conversation (str): The identifier for the conversation.
+    - label (str): What the payload is, e.g. "task query".
+    - payload: The payload, or a callable building it, called only when
+      the payload is logged.
+
+    Returns:
+    - None
+    """
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    policy = LogPolicy()
+    if not policy.sampled(category, conversation):
+        return
+    if callable(payload):
+        payload = payload()
+    # the record points at the caller, not at this function
+    logger.info(
+        "%s %s: %s",
+        conversation,
+        label,
+        policy.truncate(str(payload)),
+        stacklevel=2,
+    )
+
+
+def log_request(logger, conversation, label, query) -> None:
+    """
+    Log an incoming request at INFO, with its query cut to a few characters,
+    whatever the sampling of the prompts.
+
+    Args:
+    - logger (logging.Logger): The logger.
+    - conversation (str): The identifier for the conversation.
+    - label (str): What the request is, e.g. "Incoming request".
+    - query (str): The query of the request.
+
+    Returns:
+    - None
+    """
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    policy = LogPolicy()
+    logger.info(
+        "%s %s: %s",
+        conversation,
+        label,
+        policy.truncate(str(query), policy.request_max_chars),
+        stacklevel=2,
+    )
@@ -1,10 +1,85 @@
+import atexit
+import copy
+import json
 import logging
 import os
+import queue
 import sys
-from logging.handlers import RotatingFileHandler
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 import dotenv
 
+TEXT_LOG_FORMAT = "%(asctime)s [%(filename)s:%(lineno)d] %(levelname)s: %(message)s"
+
+# names of the loggers whose handlers are set up
+configured_loggers = set()
+# handlers writing the logs, shared by all the loggers with the same
+# configuration: (console level, log file, file level, format) -> handlers
+sinks = {}
+# queue handlers feeding the sinks from a background thread, by configuration
+queue_handlers = {}
+listeners = []
+handlers_lock = threading.Lock()
+dotenv_loaded = False
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats every record as a single line JSON object.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "file": record.filename,
+            "line": record.lineno,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RecordQueueHandler(QueueHandler):
+    """
+    Queues the records for the background writers, leaving them to the
+    formatters of the writing handlers.
+
+    The records are copied with their message merged with its arguments and
+    their traceback rendered to `exc_text`, so the listener thread neither
+    sees arguments changed after the logging call nor holds on to frames.
+    Unlike `QueueHandler`, the traceback is not merged into the message, so
+    `JsonFormatter` still writes it as its own "exception" field.
+    """
+
+    exception_formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self.exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def stop_listeners():
+    """
+    Stop the background log writers, writing out the queued records first.
+    """
+    with handlers_lock:
+        while listeners:
+            listeners.pop().stop()
+
+
+atexit.register(stop_listeners)
+
 
 class Logger:
     """
@@ -26,10 +101,14 @@ class Logger:
 
         logger = Logger(logfile=None).logger
 
-        # If want to pass the name of the function generating the message
-        # you may use the "inspect" library and generate the message as follows
+        # Pass the values of a message as arguments, so that it is only
+        # formatted when it is emitted; the name of the function generating
+        # the message is available to formatters as %(funcName)s
+
+        self.logger.debug("Loaded %s", name)
 
-        self.logger.debug(f"[{inspect.stack()[0][3]}] Message here.")
+        # Prompts, LLM responses and histories are logged with
+        # `utils.log_policy.log_payload`, which samples and truncates them
 
         # When using on a class that may already have another instance
 
@@ -58,6 +137,10 @@ class Logger:
           and `LOG_LEVEL_CONSOLE`.
         - To set logfile name set `LOG_FILE_NAME`
         - To override logfile maximum size set `LOG_FILE_SIZE`
+        - Set `LOG_FORMAT` to `json` to write every record as a JSON object
+        - Records are written by a background thread, set `LOG_ASYNC` to
+          false to write them on the logging thread
+        - The handlers of a logger are set up by its first `Logger` only
         """
         msg = """
         ############################################################################
@@ -69,7 +152,10 @@ class Logger:
             print(msg)
 
         # Load the dotenv configuration in case config class has not been used
-        dotenv.load_dotenv()
+        global dotenv_loaded
+        if not dotenv_loaded:
+            dotenv.load_dotenv()
+            dotenv_loaded = True
 
         self.logger_name = logger_name
         self.log_level = os.getenv("LOG_LEVEL", log_level)
@@ -78,30 +164,69 @@ class Logger:
         self.logfile = _logfile if _logfile else logfile
         self.logfile_maxSize = int(os.getenv("LOG_FILE_SIZE", (1048576 * 100)))
         self.logfile_backupCount = 3
+        self.log_format = os.getenv("LOG_FORMAT", "text").lower()
+        self.log_async = os.getenv("LOG_ASYNC", "True").lower() == "true"
 
         self.set_handlers()
 
     def set_handlers(self):
         """
-        A simple logger function that logs messages at a specified level.
+        Sets up the handlers of the logger, once per logger name.
 
-        :param level:   The logging level (e.g. 'DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
-        :param message: The message to log
+        The console and file handlers are shared by all the loggers with the
+        same configuration. With `LOG_ASYNC` the loggers only put their
+        records on a queue, which a `QueueListener` thread empties into the
+        handlers, so the logging thread never waits for the log I/O.
         """
         self.logger = logging.getLogger(self.logger_name)
-        self.logger.setLevel(self.log_level)
 
-        formatter = logging.Formatter(
-            "%(asctime)s [%(filename)s:%(lineno)d] %(levelname)s: %(message)s"
-        )
+        with handlers_lock:
+            if self.logger_name in configured_loggers:
+                return
+            configured_loggers.add(self.logger_name)
+
+            self.logger.setLevel(self.log_level)
+            key = (
+                self.log_level_console,
+                self.logfile,
+                self.log_level,
+                self.log_format,
+            )
+            if key not in sinks:
+                sinks[key] = self.create_handlers()
+            if not self.log_async:
+                for handler in sinks[key]:
+                    self.logger.addHandler(handler)
+                return
+
+            if key not in queue_handlers:
+                records = queue.SimpleQueue()
+                listener = QueueListener(
+                    records, *sinks[key], respect_handler_level=True
+                )
+                listener.start()
+                listeners.append(listener)
+                queue_handlers[key] = RecordQueueHandler(records)
+            self.logger.addHandler(queue_handlers[key])
+
+    def create_handlers(self):
+        """
+        Creates the console handler, and the file handler if a log file is set.
+
+        Returns:
+        - list: The handlers.
+        """
+        if self.log_format == "json":
+            formatter = JsonFormatter()
+        else:
+            formatter = logging.Formatter(TEXT_LOG_FORMAT)
 
         # console logging handler
         console_handler = logging.StreamHandler()
         console_handler.setLevel(self.log_level_console)
         console_handler.setStream(sys.stdout)
         console_handler.setFormatter(formatter)
-
-        self.logger.addHandler(console_handler)
+        handlers = [console_handler]
 
         # file logging handler (if not disabled)
         if self.logfile is not None:
@@ -112,5 +237,6 @@ class Logger:
             )
             file_handler.setLevel(self.log_level)
             file_handler.setFormatter(formatter)
+            handlers.append(file_handler)
 
-            self.logger.addHandler(file_handler)
+        return handlers
@@ -1,16 +1,100 @@
 import os
+import threading
 
 from genai.credentials import Credentials
+from genai.exceptions import GenAiException
+from genai.extensions.common.utils import create_generation_info_from_response
 from genai.extensions.langchain import LangChainInterface
+from genai.extensions.langchain.utils import create_llm_output, update_token_usage
 from genai.schemas import GenerateParams
+from genai.schemas.responses import GenerateResponse
+from genai.services import ServiceInterface
+from genai.utils.general import to_model_instance
+from langchain.schema import LLMResult
+from langchain.schema.output import GenerationChunk
 from llama_index import ServiceContext
-from llama_index.embeddings import TextEmbeddingsInference
+from llama_index.embeddings import (
+    BaseEmbedding,
+    HuggingFaceEmbedding,
+    OptimumEmbedding,
+    TextEmbeddingsInference,
+)
+from llama_index.utils import get_cache_dir
+
+from src import constants
+from utils.embedding_cache import CachedEmbedding
+from utils.predictor_registry import PredictorRegistry
+
+# local embedding models loaded so far, by model name and precision
+local_embed_models = {}
+local_embed_models_lock = threading.Lock()
+
+
+class AsyncLangChainInterface(LangChainInterface):
+    """
+    LangChainInterface generating asynchronously with the async API of the
+    genai SDK, instead of running the blocking client on a thread.
+
+    The requests go through the SDK's long-lived async generate client,
+    which keeps its connections alive and retries rate-limited requests,
+    see `PredictorRegistry.generate_client`.
+    Streaming generations still run the blocking client on the shared
+    executor.
+    """
+
+    async def _agenerate(self, prompts, stop=None, run_manager=None, **kwargs):
+        params = to_model_instance(self.params, GenerateParams)
+        if params.stream or self.streaming or kwargs:
+            return await super()._agenerate(prompts, stop, run_manager, **kwargs)
+        params.stop_sequences = stop or params.stop_sequences
+
+        registry = PredictorRegistry()
+        registry.generate_client()
+        service = ServiceInterface(
+            service_url=self.credentials.api_endpoint,
+            api_key=self.credentials.api_key,
+        )
+        with registry.track_request():
+            response = await service.async_generate(
+                model=self.model, inputs=prompts, params=params
+            )
+        if not response.is_success:
+            raise GenAiException(response)
+
+        raw_response = response.json()
+        for prompt, result in zip(prompts, raw_response["results"]):
+            result["input_text"] = prompt
+        generate_response = GenerateResponse(**raw_response)
+
+        final_result = LLMResult(
+            generations=[], llm_output=create_llm_output(model=self.model)
+        )
+        for result in generate_response.results:
+            generation_info = create_generation_info_from_response(
+                generate_response, result=result
+            )
+            update_token_usage(
+                target=final_result.llm_output["token_usage"],
+                source=generation_info["token_usage"],
+            )
+            final_result.generations.append(
+                [
+                    GenerationChunk(
+                        text=result.generated_text or "",
+                        generation_info=generation_info,
+                    )
+                ]
+            )
+        return final_result
 
 
 def get_watsonx_predictor(model, min_new_tokens=1, max_new_tokens=256, **kwargs):
     """
     Get a predictor for WatsonX.
 
+    Predictors are long-lived: the same instance is returned for the same
+    model, generation parameters and credentials, see `PredictorRegistry`.
+
     Args:
         model (str): The model to use.
         min_new_tokens (int): Minimum number of new tokens in the generated output.
@@ -18,24 +102,28 @@ def get_watsonx_predictor(model, min_new_tokens=1, max_new_tokens=256, **kwargs)
         verbose (bool): Whether to print verbose output.
 
     Returns:
-        LangChainInterface: WatsonX predictor.
+        AsyncLangChainInterface: WatsonX predictor.
     """
     verbose = kwargs.get("verbose", False)
 
     api_key = os.getenv("BAM_API_KEY", "BOGUS_VALUE")
     api_url = os.getenv("BAM_URL", "http://bogus.url")
-    creds = Credentials(api_key, api_endpoint=api_url)
 
-    params = GenerateParams(
-        decoding_method="greedy",
-        min_new_tokens=min_new_tokens,
-        max_new_tokens=max_new_tokens,
-    )
+    def create_predictor():
+        creds = Credentials(api_key, api_endpoint=api_url)
 
-    predictor = LangChainInterface(
-        model=model, params=params, credentials=creds, verbose=verbose
-    )
-    return predictor
+        params = GenerateParams(
+            decoding_method="greedy",
+            min_new_tokens=min_new_tokens,
+            max_new_tokens=max_new_tokens,
+        )
+
+        return AsyncLangChainInterface(
+            model=model, params=params, credentials=creds, verbose=verbose
+        )
+
+    key = (model, min_new_tokens, max_new_tokens, verbose, api_key, api_url)
+    return PredictorRegistry().get(key, create_predictor)
 
 
 def get_watsonx_context(model, url="local", tei_embedding_model=None, **kwargs):
@@ -51,13 +139,7 @@ def get_watsonx_context(model, url="local", tei_embedding_model=None, **kwargs):
     Returns:
         ServiceContext: WatsonX service context.
     """
-    if url != "local":
-        embed_model = TextEmbeddingsInference(
-            model_name=tei_embedding_model,
-            base_url=url,
-        )
-    else:
-        embed_model = "local:BAAI/bge-base-en"
+    embed_model = get_embed_model(url=url, tei_embedding_model=tei_embedding_model)
 
     predictor = get_watsonx_predictor(model)
 
@@ -66,3 +148,130 @@ def get_watsonx_context(model, url="local", tei_embedding_model=None, **kwargs):
     )
 
     return service_context
+
+
+def get_embed_model(url="local", tei_embedding_model=None):
+    """
+    Get the embedding model used to embed documents and queries.
+
+    Query embeddings go through the process-wide `QueryEmbeddingCache`, so
+    every retriever reuses the embedding of a query seen before. The local
+    model is loaded once per process, see `get_local_embed_model`.
+
+    Args:
+        url (str): URL of the TEI embedding server. Default is "local".
+        tei_embedding_model (str): TEI embedding model name.
+
+    Returns:
+        CachedEmbedding: The TEI embedding client or the local embedding
+        model, behind the query embedding cache.
+    """
+    if url != "local":
+        embed_model = TextEmbeddingsInference(
+            model_name=tei_embedding_model,
+            base_url=url,
+        )
+        return CachedEmbedding(embed_model)
+    precision = local_embed_model_precision()
+    return CachedEmbedding(
+        get_local_embed_model(precision=precision),
+        model_id=f"local:{constants.LOCAL_EMBED_MODEL}:{precision}",
+    )
+
+
+def local_embed_model_precision() -> str:
+    """
+    Get the variant of the local embedding model to run, from the
+    `OLS_LOCAL_EMBED_MODEL_PRECISION` environment variable.
+
+    Returns:
+        str: "fp32" for the original model, "int8" for the model with
+        dynamically quantized linear layers or "onnx" for the model exported
+        to ONNX Runtime.
+    """
+    precision = os.getenv(
+        "OLS_LOCAL_EMBED_MODEL_PRECISION", constants.LOCAL_EMBED_MODEL_PRECISION
+    ).lower()
+    if precision not in constants.LOCAL_EMBED_MODEL_PRECISIONS:
+        raise ValueError(f"Unknown local embedding model precision: {precision}")
+    return precision
+
+
+def get_local_embed_model(model_name=constants.LOCAL_EMBED_MODEL, precision="fp32"):
+    """
+    Get the local embedding model, loading it on first use only.
+
+    Loading the model reads and initializes hundreds of megabytes of
+    weights; the loaded model is shared by every service context of the
+    process.
+
+    Args:
+        model_name (str): The Hugging Face name of the model.
+        precision (str): The variant of the model, see `local_embed_model_precision`.
+
+    Returns:
+        BaseEmbedding: The loaded model.
+    """
+    key = (model_name, precision)
+    with local_embed_models_lock:
+        if key not in local_embed_models:
+            local_embed_models[key] = load_local_embed_model(model_name, precision)
+        return local_embed_models[key]
+
+
+def load_local_embed_model(model_name, precision) -> BaseEmbedding:
+    """
+    Load a local embedding model for CPU inference.
+
+    Args:
+        model_name (str): The Hugging Face name of the model.
+        precision (str): The variant of the model, see `local_embed_model_precision`.
+
+    Returns:
+        BaseEmbedding: The loaded model.
+    """
+    cache_folder = os.path.join(get_cache_dir(), "models")
+    os.makedirs(cache_folder, exist_ok=True)
+
+    if precision == "int8":
+        import torch
+        from transformers import AutoModel
+
+        model = torch.quantization.quantize_dynamic(
+            AutoModel.from_pretrained(model_name, cache_dir=cache_folder),
+            {torch.nn.Linear},
+            dtype=torch.qint8,
+        )
+        return HuggingFaceEmbedding(
+            model_name=model_name, model=model, cache_folder=cache_folder, device="cpu"
+        )
+
+    if precision == "onnx":
+        folder_name = os.getenv(
+            "OLS_LOCAL_EMBED_MODEL_ONNX_DIR", constants.LOCAL_EMBED_MODEL_ONNX_DIR
+        )
+        if not os.path.isdir(folder_name):
+            OptimumEmbedding.create_and_save_optimum_model(model_name, folder_name)
+        return OptimumEmbedding(folder_name=folder_name, device="cpu")
+
+    return HuggingFaceEmbedding(model_name=model_name, cache_folder=cache_folder)
+
+
+def get_embed_context():
+    """
+    Get a service context holding only the embedding model, configured from
+    the `TEI_SERVER_URL` environment variable.
+
+    This is the context the persisted indexes are loaded with; the LLM is
+    supplied separately by each query engine.
+
+    Returns:
+        ServiceContext: Embedding-only service context.
+    """
+    embed_model = get_embed_model(
+        url=os.getenv("TEI_SERVER_URL") or "local",
+        tei_embedding_model=constants.TEI_EMBEDDING_MODEL,
+    )
+    return ServiceContext.from_defaults(
+        chunk_size=1024, llm=None, embed_model=embed_model
+    )
@@ -0,0 +1,130 @@
+import os
+import threading
+from contextlib import contextmanager
+
+import httpx
+from genai.services.connection_manager import ConnectionManager
+from genai.utils.http_provider import HttpProvider
+
+
+class PredictorRegistry:
+    """
+    Process-wide registry of long-lived LLM predictors.
+
+    Predictors are keyed by model and generation parameters, created on first
+    use and then reused by every request. Predictors of different keys are
+    created concurrently, and a predictor is created once even when several
+    requests need it at the same time. Their async requests all go through
+    the long-lived async generate client of the genai SDK, which keeps its
+    connections alive; the pool is sized through the transport options of
+    the SDK's `HttpProvider`.
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        """Implement Singleton pattern with thread safety."""
+        with cls._lock:
+            if not cls._instance:
+                cls._instance = super(PredictorRegistry, cls).__new__(cls)
+                cls._instance.initialize_registry()
+        return cls._instance
+
+    def initialize_registry(self):
+        """
+        Initialize the PredictorRegistry, dropping any predictor created so far.
+        """
+        self.predictors = {}
+        # key -> lock held while its predictor is created
+        self.creating = {}
+        self.hits = 0
+        self.creations = 0
+        # generate requests sent, and those awaiting their response
+        self.requests = 0
+        self.active_requests = 0
+        HttpProvider.default_http_transport_options = {
+            **HttpProvider.default_http_transport_options,
+            "limits": httpx.Limits(
+                max_connections=int(os.getenv("BAM_MAX_CONNECTIONS", "100")),
+                max_keepalive_connections=int(
+                    os.getenv("BAM_MAX_KEEPALIVE_CONNECTIONS", "20")
+                ),
+            ),
+        }
+
+    def get(self, key, create):
+        """
+        Get the predictor registered under the given key, creating it if needed.
+
+        Args:
+        - key (tuple): Hashable model and generation parameters of the predictor.
+        - create: Callable creating the predictor when it is not registered yet.
+
+        Returns:
+        - The registered predictor.
+        """
+        with self._lock:
+            predictor = self.predictors.get(key)
+            if predictor is not None:
+                self.hits += 1
+                return predictor
+            key_lock = self.creating.setdefault(key, threading.Lock())
+
+        # created outside of the registry lock, once per key
+        with key_lock:
+            with self._lock:
+                predictor = self.predictors.get(key)
+                if predictor is not None:
+                    self.hits += 1
+                    return predictor
+            predictor = create()
+            with self._lock:
+                self.predictors[key] = predictor
+                self.creating.pop(key, None)
+                self.creations += 1
+            return predictor
+
+    def generate_client(self) -> httpx.AsyncClient:
+        """
+        Get the async client the genai SDK sends generate requests with,
+        creating it with the pool limits on first use only.
+
+        Returns:
+        - httpx.AsyncClient: The shared client.
+        """
+        with self._lock:
+            if ConnectionManager.async_generate_client is None:
+                ConnectionManager.make_generate_client()
+            return ConnectionManager.async_generate_client
+
+    @contextmanager
+    def track_request(self):
+        """
+        Count a generate request for the stats, while it is awaited.
+        """
+        with self._lock:
+            self.requests += 1
+            self.active_requests += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.active_requests -= 1
+
+    def stats(self) -> dict:
+        """
+        Report the registry and generate request usage.
+
+        Returns:
+        - dict: Number of registry hits, created predictors, generate requests
+          sent and generate requests awaiting their response.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "creations": self.creations,
+                "predictors": len(self.predictors),
+                "requests": self.requests,
+                "active_requests": self.active_requests,
+            }
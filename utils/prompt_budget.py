@@ -0,0 +1,305 @@
+import os
+import threading
+from typing import Dict, List
+
+from src import constants
+from utils.logger import Logger
+
+# which part of a truncated section is kept
+KEEP_START = "start"
+KEEP_END = "end"
+
+# tokenizers loaded so far, by model
+tokenizers = {}
+tokenizers_lock = threading.Lock()
+
+
+class PromptTooLongError(ValueError):
+    """The fixed part of a prompt alone does not fit the model context."""
+
+
+class EstimateTokenizer:
+    """
+    Tokenizer splitting texts into pieces of about four characters, the
+    fallback when the tokenizer of a model is not available locally.
+    """
+
+    chars_per_token = 4
+
+    def encode(self, text: str) -> List[str]:
+        step = self.chars_per_token
+        return [text[i : i + step] for i in range(0, len(text), step)]
+
+    def decode(self, tokens: List[str]) -> str:
+        return "".join(tokens)
+
+
+class HuggingFaceTokenizer:
+    """
+    Adapter counting the tokens of a Hugging Face tokenizer without the
+    special tokens it adds around every text.
+    """
+
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+
+    def encode(self, text: str) -> List[int]:
+        return self.tokenizer.encode(text, add_special_tokens=False)
+
+    def decode(self, tokens: List[int]) -> str:
+        return self.tokenizer.decode(tokens)
+
+
+def get_tokenizer(model: str):
+    """
+    Get the tokenizer of a model, loading it on first use only.
+
+    Models use the Hugging Face tokenizer of `MODEL_TOKENIZERS[model]` (the
+    model id itself by default) if it is in the local Hugging Face cache:
+    prompts are never delayed by a download. `EstimateTokenizer` is used
+    when it is not available.
+
+    Args:
+    - model (str): The model id.
+
+    Returns:
+    - A tokenizer with `encode` and `decode` methods.
+    """
+    with tokenizers_lock:
+        if model not in tokenizers:
+            tokenizers[model] = load_tokenizer(model)
+        return tokenizers[model]
+
+
+def load_tokenizer(model: str):
+    """
+    Load the tokenizer of a model, see `get_tokenizer`.
+
+    Args:
+    - model (str): The model id.
+
+    Returns:
+    - A tokenizer with `encode` and `decode` methods.
+    """
+    logger = Logger("prompt_budget").logger
+    try:
+        from transformers import AutoTokenizer
+
+        return HuggingFaceTokenizer(
+            AutoTokenizer.from_pretrained(
+                constants.MODEL_TOKENIZERS.get(model, model), local_files_only=True
+            )
+        )
+    except Exception as e:
+        logger.info(f"No tokenizer available for {model}, estimating tokens: {e}")
+        return EstimateTokenizer()
+
+
+def context_window(model: str) -> int:
+    """
+    Get the number of tokens a model accepts, prompt and generated tokens
+    together; `OLS_MODEL_CONTEXT_WINDOW` overrides the known values.
+
+    Args:
+    - model (str): The model id.
+
+    Returns:
+    - int: The size of the context window in tokens.
+    """
+    window = os.getenv("OLS_MODEL_CONTEXT_WINDOW")
+    if window:
+        return int(window)
+    return constants.MODEL_CONTEXT_WINDOWS.get(
+        model, constants.DEFAULT_MODEL_CONTEXT_WINDOW
+    )
+
+
+class PromptTokenStats:
+    """
+    Process-wide record of the prompt sizes sent by every stage.
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        """Implement Singleton pattern with thread safety."""
+        with cls._lock:
+            if not cls._instance:
+                cls._instance = super(PromptTokenStats, cls).__new__(cls)
+                cls._instance.initialize_stats()
+        return cls._instance
+
+    def initialize_stats(self):
+        """
+        Initialize the PromptTokenStats, forgetting the prompts recorded so far.
+        """
+        # stage -> prompts, total and largest number of tokens, truncated prompts
+        self.stages = {}
+
+    def record(self, stage: str, tokens: int, truncated: bool) -> None:
+        """
+        Record a prompt.
+
+        Args:
+        - stage (str): The stage sending the prompt.
+        - tokens (int): The number of tokens of the prompt.
+        - truncated (bool): Whether sections of the prompt were truncated.
+
+        Returns:
+        - None
+        """
+        with self._lock:
+            stats = self.stages.setdefault(
+                stage, {"prompts": 0, "tokens": 0, "max_tokens": 0, "truncated": 0}
+            )
+            stats["prompts"] += 1
+            stats["tokens"] += tokens
+            stats["max_tokens"] = max(stats["max_tokens"], tokens)
+            stats["truncated"] += int(truncated)
+
+    def stats(self) -> dict:
+        """
+        Report the recorded prompt sizes.
+
+        Returns:
+        - dict: Stage mapped to its number of prompts, total, average and
+          largest number of tokens, and number of truncated prompts.
+        """
+        with self._lock:
+            return {
+                stage: {**stats, "average_tokens": stats["tokens"] // stats["prompts"]}
+                for stage, stats in self.stages.items()
+            }
+
+
+class PromptBudget:
+    """
+    Fits prompts into the context window of their target model.
+
+    The tokens of a prompt are counted with the tokenizer of the model. The
+    fixed part of the template and the `max_new_tokens` to generate are
+    reserved first, then the variable sections, such as the conversation
+    history or the retrieved context, are truncated to the tokens left, in
+    the given order. Every fitted prompt is recorded in `PromptTokenStats`.
+    """
+
+    def __init__(self, model: str, max_new_tokens: int = 256):
+        """
+        Initialize the PromptBudget.
+
+        Args:
+        - model (str): The model the prompt is sent to.
+        - max_new_tokens (int): The number of tokens the model may generate.
+        """
+        self.model = model
+        self.tokenizer = get_tokenizer(model)
+        self.max_prompt_tokens = context_window(model) - max_new_tokens
+
+    def count(self, text: str) -> int:
+        """
+        Count the tokens of a text for the model.
+
+        Args:
+        - text (str): The text.
+
+        Returns:
+        - int: The number of tokens.
+        """
+        return len(self.tokenizer.encode(text))
+
+    def fit(
+        self,
+        stage: str,
+        template: str,
+        truncatable: Dict[str, str] = None,
+        **variables,
+    ) -> dict:
+        """
+        Fit the variables of a prompt template into the context window.
+
+        Args:
+        - stage (str): The stage sending the prompt, for the statistics.
+        - template (str): The prompt template, in `str.format` syntax.
+        - truncatable (Dict[str, str]): The variables that can be truncated,
+          in the order they get tokens, mapped to the part of them to keep:
+          `KEEP_START` or `KEEP_END` (e.g. the latest turns of a history).
+        - **variables: The values of the template variables.
+
+        Returns:
+        - dict: The variables, with the truncatable ones truncated to fit.
+
+        Raises:
+        - PromptTooLongError: When the prompt does not fit even with every
+          truncatable variable left empty.
+        """
+        truncatable = truncatable or {}
+        fixed = template.format(
+            **{
+                name: "" if name in truncatable else (value or "")
+                for name, value in variables.items()
+            }
+        )
+        available = self.max_prompt_tokens - self.count(fixed)
+        if available < 0:
+            raise PromptTooLongError(
+                f"{stage} prompt needs {self.max_prompt_tokens - available} tokens, "
+                f"{self.model} accepts {self.max_prompt_tokens}"
+            )
+
+        fitted = dict(variables)
+        truncated = False
+        for name, keep in truncatable.items():
+            value = variables.get(name) or ""
+            fitted[name] = self.truncate(value, available, keep)
+            truncated = truncated or fitted[name] != value
+            if fitted[name]:
+                available -= self.count(fitted[name])
+
+        tokens = self.count(
+            template.format(**{name: value or "" for name, value in fitted.items()})
+        )
+        PromptTokenStats().record(stage, tokens, truncated)
+        return fitted
+
+    def truncate(self, text: str, max_tokens: int, keep: str = KEEP_START) -> str:
+        """
+        Truncate a text to a number of tokens, dropping whole lines first.
+
+        Args:
+        - text (str): The text.
+        - max_tokens (int): The maximum number of tokens.
+        - keep (str): `KEEP_START` to keep the beginning of the text,
+          `KEEP_END` to keep its end.
+
+        Returns:
+        - str: The truncated text, possibly empty.
+        """
+        if max_tokens <= 0:
+            return ""
+        if self.count(text) <= max_tokens:
+            return text
+
+        lines = text.split("\n")
+        if keep == KEEP_END:
+            lines.reverse()
+        kept = []
+        used = 0
+        for line in lines:
+            tokens = self.count(line + "\n")
+            if used + tokens > max_tokens:
+                if not kept:
+                    # the first line alone is too long, cut it
+                    encoded = self.tokenizer.encode(line)
+                    part = (
+                        encoded[:max_tokens]
+                        if keep == KEEP_START
+                        else encoded[-max_tokens:]
+                    )
+                    kept.append(self.tokenizer.decode(part))
+                break
+            kept.append(line)
+            used += tokens
+        if keep == KEEP_END:
+            kept.reverse()
+        return "\n".join(kept)
@@ -0,0 +1,193 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from src import constants
+
+from .logger import Logger
+
+# shared by all requests so the number of threads stays bounded
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+    Get the process-wide thread pool used for blocking calls.
+
+    Blocking retrieval, embedding and streaming LLM calls are offloaded to
+    this pool so they never hold up the event loop; the other LLM calls use
+    the async API of the genai SDK and take no thread. Its size can be set
+    with the `OLS_STAGE_WORKERS` environment variable.
+
+    Returns:
+        ThreadPoolExecutor: The shared executor.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=int(
+                    os.getenv("OLS_STAGE_WORKERS", constants.STAGE_WORKERS)
+                ),
+                thread_name_prefix="ols-stage",
+            )
+    return _executor
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """
+    Run a blocking callable on the shared executor and await its result.
+
+    Args:
+        fn: The blocking callable.
+        *args, **kwargs: Arguments passed to `fn`.
+
+    Returns:
+        The value returned by `fn`.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), partial(fn, *args, **kwargs))
+
+
+async def iterate_blocking(iterator):
+    """
+    Consume a blocking iterator from async code, one item at a time.
+
+    Every `next()` call runs on the shared executor, so a slow producer such
+    as a streaming LLM response never holds up the event loop.
+
+    Args:
+        iterator: The blocking iterator.
+
+    Yields:
+        The items produced by the iterator.
+    """
+    exhausted = object()
+    while True:
+        item = await run_blocking(next, iterator, exhausted)
+        if item is exhausted:
+            return
+        yield item
+
+
+class StageExecutor:
+    """
+    Runs the independent stages of a single request concurrently.
+
+    Stages are coroutines submitted by name and awaited by name, so the caller
+    keeps the control flow of the request while the LLM calls overlap.
+    Leaving the `async with` block cancels every stage still in flight.
+
+    Usage:
+
+        async with StageExecutor(conversation) as stages:
+            stages.submit("validation", validator.avalidate_question(conversation, query))
+            stages.submit("retrieval", summarizer.aretrieve(conversation, query))
+            if (await stages.result("validation"))[0] == constants.INVALID:
+                stages.cancel("retrieval")
+    """
+
+    def __init__(self, conversation, logger=None):
+        """
+        Initializes the StageExecutor instance.
+
+        Args:
+        - conversation (str): The identifier for the conversation, used in logs.
+        - logger: Logger to use, a new "stage_executor" logger when not set.
+        """
+        self.conversation = conversation
+        self.logger = logger if logger else Logger("stage_executor").logger
+        self.tasks = {}
+        self.durations = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        for name in list(self.tasks):
+            self.cancel(name)
+        return False
+
+    def submit(self, name, coroutine) -> asyncio.Task:
+        """
+        Start a stage in the background.
+
+        Args:
+        - name (str): Unique name of the stage within the request.
+        - coroutine: The coroutine running the stage.
+
+        Returns:
+        - asyncio.Task: The task running the stage.
+        """
+        if name in self.tasks:
+            coroutine.close()
+            raise ValueError(f"Stage {name} was already submitted")
+
+        async def timed():
+            start = time.perf_counter()
+            try:
+                return await coroutine
+            finally:
+                self.durations[name] = time.perf_counter() - start
+
+        self.logger.info(f"{self.conversation} Starting stage {name}")
+        task = asyncio.create_task(timed())
+        # a stage cancelled before it started never awaits its coroutine
+        task.add_done_callback(lambda _: coroutine.close())
+        self.tasks[name] = task
+        return task
+
+    def submitted(self, name) -> bool:
+        """
+        Check whether a stage has been submitted.
+
+        Args:
+        - name (str): Name of the stage.
+
+        Returns:
+        - bool: True if the stage has been submitted and not cancelled.
+        """
+        return name in self.tasks
+
+    async def result(self, name):
+        """
+        Wait for a stage and return its result, re-raising its exception.
+
+        Args:
+        - name (str): Name of the stage.
+
+        Returns:
+        - The value returned by the stage.
+        """
+        return await self.tasks[name]
+
+    def cancel(self, name) -> None:
+        """
+        Cancel a stage whose result is no longer needed.
+
+        A blocking call the stage offloaded to the executor keeps running to
+        completion, but its result is dropped.
+
+        Args:
+        - name (str): Name of the stage, ignored if it was never submitted.
+
+        Returns:
+        - None
+        """
+        task = self.tasks.pop(name, None)
+        if task is not None and not task.done():
+            task.cancel()
+            self.logger.info(f"{self.conversation} Cancelled stage {name}")
+
+    def timings(self) -> dict:
+        """
+        Report how long each finished stage took.
+
+        Returns:
+        - dict: Stage name mapped to its duration in seconds.
+        """
+        return {name: round(duration, 3) for name, duration in self.durations.items()}
@@ -0,0 +1,195 @@
+import os
+import threading
+import time
+from typing import Callable, List, Tuple
+
+from src import constants
+
+from .logger import Logger
+
+# returned by a component with nothing to warm up in this configuration
+SKIPPED = "skipped"
+
+
+class Warmup:
+    """
+    Process-wide warmup of the components the requests need, such as the
+    vector indexes or the embedding model, run once at startup.
+
+    Components run one after the other in a background thread, so the
+    app serves health checks while they load; the app is ready once they
+    all ran. A failed component does not stop the warmup: it is reported
+    and the component is loaded again by the first request needing it.
+    The app is not ready while a required component, without which no
+    request can be answered, has failed: required components are retried
+    every `OLS_WARMUP_RETRY_SECONDS` until they succeed.
+
+    Usage:
+
+        warmup = Warmup()
+        warmup.add("indexes", IndexRegistry().load_all, required=True)
+        warmup.start()
+        ...
+        if warmup.ready:
+            ...
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        """Implement Singleton pattern with thread safety."""
+        with cls._lock:
+            if not cls._instance:
+                cls._instance = super(Warmup, cls).__new__(cls)
+                cls._instance.initialize_warmup()
+        return cls._instance
+
+    def initialize_warmup(self):
+        """
+        Initialize the Warmup, without any component, stopping the retries
+        of a previous warmup.
+        """
+        if hasattr(self, "stopped"):
+            self.stopped.set()
+        self.logger = Logger("warmup").logger
+        self.retry_seconds = float(
+            os.getenv("OLS_WARMUP_RETRY_SECONDS", constants.WARMUP_RETRY_SECONDS)
+        )
+        # name, component and whether it is required
+        self.components = []
+        # component name -> status, duration in seconds and error
+        self.results = {}
+        self.thread = None
+        self.finished = threading.Event()
+        self.stopped = threading.Event()
+        self.seconds = None
+
+    def add(self, name: str, component: Callable, required: bool = False) -> None:
+        """
+        Add a component to warm up.
+
+        Args:
+        - name (str): The name of the component, reported by `status`.
+        - component (Callable): Called without arguments to warm the
+          component up; returns `SKIPPED` when there is nothing to do.
+        - required (bool): Whether the app is not ready while the component
+          failed.
+
+        Returns:
+        - None
+        """
+        self.components.append((name, component, required))
+
+    def start(self) -> None:
+        """
+        Run the warmup in a background thread, if it has not been started.
+
+        Returns:
+        - None
+        """
+        with self._lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(
+                target=self.run_and_retry, name="ols-warmup", daemon=True
+            )
+        self.thread.start()
+
+    def run(self) -> None:
+        """
+        Run every component, recording its status and duration.
+
+        Returns:
+        - None
+        """
+        started = time.perf_counter()
+        for name, component, _ in self.components:
+            self.warm(name, component)
+        self.seconds = round(time.perf_counter() - started, 3)
+        self.finished.set()
+        self.logger.info(f"Warmup finished in {self.seconds}s")
+
+    def run_and_retry(self) -> None:
+        """
+        Run every component, then retry the failed required ones until they
+        succeed or the warmup is stopped.
+
+        Returns:
+        - None
+        """
+        self.run()
+        while True:
+            failed = self.failed_required()
+            if not failed or self.stopped.wait(self.retry_seconds):
+                return
+            for name, component in failed:
+                self.warm(name, component)
+
+    def warm(self, name: str, component: Callable) -> None:
+        """
+        Run a component, recording its status and duration.
+
+        Args:
+        - name (str): The name of the component.
+        - component (Callable): The component.
+
+        Returns:
+        - None
+        """
+        start = time.perf_counter()
+        try:
+            status = SKIPPED if component() == SKIPPED else "ok"
+            error = None
+        except Exception as e:
+            status, error = "failed", str(e)
+            self.logger.error(f"Warmup of {name} failed: {e}")
+        result = {
+            "status": status,
+            "seconds": round(time.perf_counter() - start, 3),
+        }
+        if error:
+            result["error"] = error
+        self.results[name] = result
+        self.logger.info(f"Warmup of {name}: {result}")
+
+    def failed_required(self) -> List[Tuple[str, Callable]]:
+        """
+        Get the required components whose last run failed.
+
+        Returns:
+        - List[Tuple[str, Callable]]: Their names and the components.
+        """
+        return [
+            (name, component)
+            for name, component, required in self.components
+            if required and self.results.get(name, {}).get("status") == "failed"
+        ]
+
+    @property
+    def ready(self) -> bool:
+        """
+        Whether every component ran, and no required component failed.
+        """
+        return self.finished.is_set() and not self.failed_required()
+
+    def status(self) -> dict:
+        """
+        Report the progress of the warmup.
+
+        Returns:
+        - dict: Whether the app is ready, the duration in seconds of the
+          warmup when it finished, and the status and duration of every
+          component that ran, the others being "pending".
+        """
+        components = {}
+        for name, _, required in self.components:
+            components[name] = {
+                **self.results.get(name, {"status": "pending"}),
+                "required": required,
+            }
+        return {
+            "ready": self.ready,
+            "seconds": self.seconds,
+            "components": components,
+        }